@@ -1,19 +1,33 @@
-import os
-import pickle
+import argparse
 import time
-import urllib
-import urllib.parse
-import pymysql
 import logging
-import re
 from typing import Dict, Optional, Callable, List
-from datetime import datetime, timedelta
 from selenium.webdriver import Chrome
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from xhs_text import convert_xhs_url, note_key, explore_url, parse_xhs_time
+from xhs_dedup import NoteIndex, KnownRun, query_existing_urls
+from xhs_writer import BufferedWriter, ARTIST_SPIDER_LOG
+from xhs_db import ConnectionPool, DBService, DB_CONFIG
+from xhs_extract import fetch_note_cards, fetch_note_snapshot, build_note_fields
+from xhs_wait import ReadyWaiter, FeedLoaded, DetailReady
+from xhs_capture import NetworkCapture, enable_capture
+from xhs_scheduler import BrandScheduler
+from xhs_metrics import Metrics, timed
+from xhs_checkpoint import Checkpoint, BrandProgress
+from xhs_lean import LeanMode, TrafficMeter, apply_lean_options
+from xhs_browser import SIDEBAR, attach_options, load_stealth, session_logged_in, startup_mode, use_profile
+from xhs_session import SessionStore, SessionKeeper, USABLE, preflight
+from xhs_governor import Governor, PAGE, DETAIL
+from xhs_images import ImageStage
+
+SESSION_ACCOUNT = 'xhs_artist'  # 会话存储中的账号（xhs_session）
+# 限速器的就绪等待基础上限：滚动后等待新内容 23.5s，详情页加载后等待字段渲染 2s（xhs_governor）
+GOVERNOR_TIMEOUTS = {'page_timeout': 23.5, 'detail_timeout': 2}
+
 # 艺术家采集配置
 ARTIST_SPIDER_SETTING = {
     'full_collect': 1,  # 全量采集
@@ -22,121 +36,132 @@ ARTIST_SPIDER_SETTING = {
 }
 
 
-def convert_xhs_url(original_url):
-    """转换小红书URL格式"""
-    parsed_url = urllib.parse.urlparse(original_url)
-    new_query = parsed_url.query.replace('&amp;', '&')
-
-    path_parts = parsed_url.path.split('/')
-    if len(path_parts) >= 5 and path_parts[1] == 'user' and path_parts[2] == 'profile':
-        note_id = path_parts[4]
-        new_path = f'/explore/{note_id}'
-    else:
-        new_path = parsed_url.path
-
-    new_parsed = parsed_url._replace(path=new_path, query=new_query)
-    return urllib.parse.urlunparse(new_parsed)
-
-
-def parse_xhs_time(time_str: str) -> int:
-    """解析小红书时间格式"""
-    clean_str = time_str.replace('编辑于 ', '').strip()
-    parts = re.split(r'\s+(?=[\u4e00-\u9fa5]{2,5}$)', clean_str)
-    time_part = parts[0]
-
-    now = datetime.now()
-    current_year = now.year
-
-    try:
-        # 处理相对时间
-        if '天前' in time_part:
-            days = int(re.search(r'\d+', time_part).group())
-            return int((now - timedelta(days=days)).timestamp())
-        if '昨天' in time_part:
-            date = now - timedelta(days=1)
-            time_str = re.sub(r'昨天', date.strftime('%Y-%m-%d'), time_part)
-        elif '今天' in time_part:
-            time_str = re.sub(r'今天', now.strftime('%Y-%m-%d'), time_part)
-        elif '分钟前' in time_part:
-            minutes = int(re.search(r'\d+', time_part).group())
-            return int((now - timedelta(minutes=minutes)).timestamp())
-        elif '小时前' in time_part:
-            hours = int(re.search(r'\d+', time_part).group())
-            return int((now - timedelta(hours=hours)).timestamp())
-        else:
-            time_str = time_part
-
-        # 处理绝对时间
-        time_formats = [
-            (r'(\d{1,2})-(\d{1,2}) (\d{1,2}):(\d{2})', "%m-%d %H:%M"),
-            (r'(\d{4})-(\d{1,2})-(\d{1,2}) (\d{1,2}):(\d{2})', "%Y-%m-%d %H:%M"),
-            (r'(\d{1,2})-(\d{1,2})', "%m-%d"),
-        ]
-
-        for pattern, time_format in time_formats:
-            if re.match(pattern, time_str):
-                dt = datetime.strptime(time_str, time_format)
-                if dt.year == 1900:
-                    dt = dt.replace(year=current_year)
-                    if dt > now + timedelta(days=60):
-                        dt = dt.replace(year=current_year - 1)
-                return int(dt.timestamp())
-
-        return 0
-    except Exception as e:
-        logging.warning(f"时间解析失败: {clean_str} ({str(e)})")
-        return 0
-
-
 class ArtistXHSCrawler:
     def __init__(self, url_checker: Optional[Callable] = None,
-                 insert_callback: Optional[Callable] = None):
-        options = webdriver.ChromeOptions()
-        # 移除无头模式设置，以支持验证码处理
-        # options.add_argument("--headless")
-        options.add_experimental_option("excludeSwitches", ['enable-automation'])
-        options.add_argument("--disable-blink-features=AutomationControlled")
-
-        print("初始化浏览器...")
-        self.driver = webdriver.Chrome(options=options)
-
-        print("加载stealth.min.js...")
-        with open('./stealth.min.js', 'r') as f:
-            stealth_script = f.read()
-        self.driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': stealth_script})
+                 insert_callback: Optional[Callable] = None,
+                 batch_url_checker: Optional[Callable] = None,
+                 detail_tabs: int = 1,
+                 wait_floor: float = 0.5,
+                 capture: bool = False,
+                 known_stop: int = 10,
+                 max_scroll: int = 1,
+                 driver=None,
+                 checkpoint: str = '',
+                 lean: bool = False,
+                 traffic: str = '',
+                 user_data_dir: str = '',
+                 attach: str = '',
+                 governor: Optional[Governor] = None,
+                 flush_callback: Optional[Callable] = None):
+        """driver 不为空时直接使用（如 xhs_fixture.FakeDriver 离线回放），不启动浏览器；
+        max_scroll 为每位艺术家主页的滚动上限（默认只滚动一次），调大后由 known_stop 在遇到已采集作品时提前停止；
+        checkpoint 为断点文件路径（xhs_checkpoint），为空不记录品牌断点；
+        flush_callback 等待已交给 insert_callback 的记录提交（如 ArtistDatabaseManager.flush），
+        品牌断点只记已提交的作品，为空时视为写入回调返回即已提交；
+        lean 为精简模式（无头、拦截图片/视频/字体，xhs_lean），traffic 为流量统计文件，为空不统计；
+        user_data_dir 为持久化用户目录，attach 为已运行 Chrome 的调试地址（xhs_browser），沿用其中的登录状态；
+        governor 为限速器（xhs_governor），进程池中多个浏览器共用一个，为空时自建"""
+        self.metrics = Metrics('artist')  # 各阶段耗时（按品牌/整次运行汇总）
+        self.metrics.startup = startup_mode(user_data_dir, attach)
+        self.reuse_session = bool(user_data_dir or attach)
+        if driver is None:
+            if attach:
+                options = attach_options(attach)
+            else:
+                options = webdriver.ChromeOptions()
+                # 移除无头模式设置，以支持验证码处理（精简模式为无头，出现验证码时需改回常规模式）
+                # options.add_argument("--headless")
+                if lean:
+                    apply_lean_options(options)
+                if user_data_dir:
+                    use_profile(options, user_data_dir)
+                options.add_experimental_option("excludeSwitches", ['enable-automation'])
+                options.add_argument("--disable-blink-features=AutomationControlled")
+            if capture or traffic:
+                enable_capture(options)
+
+            with self.metrics.span('browser_start'):
+                print("附着到已运行的浏览器..." if attach else "初始化浏览器...")
+                driver = webdriver.Chrome(options=options)
+
+                print("加载stealth.min.js...")
+                driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': load_stealth()})
+        self.driver = driver
 
         self.seen_links = set()
         self.artwork_data = []
         self.url_checker = url_checker
+        self.batch_url_checker = batch_url_checker
         self.insert_callback = insert_callback
         self.main_window = None
-        self.all_links = set()
+        # 以下按 12 字节笔记ID（note_key）为键，同一笔记换 xsec_token 出现时不会重复计入
+        self.all_links = {}  # 笔记ID -> 打开详情用的链接（已采集的笔记不保留链接）
+        self.existing_links = set()  # 批量去重判定为已存在的笔记ID
         self.collected_quick_data = []
-
+        self.detail_tabs = max(1, int(detail_tabs))  # 同时在途的详情标签页数
+        self.tab_open_interval = 1.0  # 多标签模式下相邻标签的打开间隔（秒）
+        # 限速器：主页/详情的请求节奏和就绪等待上限，按成功/超时自动调整
+        self.governor = governor or Governor(**GOVERNOR_TIMEOUTS)
+        # 就绪等待：条件满足即返回，原固定 sleep 时长作为超时上限
+        self.waiter = ReadyWaiter(floor=wait_floor, metrics=self.metrics)
+        self.known_stop = known_stop  # 滚动中连续遇到多少条已采集作品即停止，0 为不提前停止
+        self.max_scroll = max(1, max_scroll)
+        self.checkpoint = checkpoint
+        self.flush_callback = flush_callback
+        self.progress = None  # 当前品牌的断点（全量采集时）
+        # 可选：从笔记列表/详情接口的响应中直接解析数据，取不到时仍走 DOM 提取
+        self.capture = NetworkCapture(self.driver) if capture else None
+        self.lean = LeanMode(self.driver) if lean else None
+        if self.lean:
+            self.lean.cover()
+        self.traffic = TrafficMeter(self.driver, traffic, lean, capture=self.capture) if traffic else None
+        # 登录会话：启动时按存储判断是否注入 Cookie，采集中在艺术家间隙续存
+        self.sessions = SessionStore()
+        self.keeper = SessionKeeper(self.sessions, SESSION_ACCOUNT, logged_in=lambda d: bool(d.find_elements(*SIDEBAR)))
+
+    @timed('login')
     def login(self):
         """登录小红书"""
+        # 附着的浏览器已停在登录后的页面：直接沿用
+        if self.reuse_session and session_logged_in(self.driver):
+            self.main_window = self.driver.current_window_handle
+            print('沿用已登录的浏览器会话')
+            return
         self.driver.get('https://www.xiaohongshu.com/explore')
         self.main_window = self.driver.current_window_handle
 
-        # 尝试加载cookie
-        if os.path.exists("xhs_artist_cookie.pkl"):
+        # 用户目录中已有登录状态时不再加载cookie和刷新
+        if self.reuse_session:
             try:
-                cookies = pickle.load(open("xhs_artist_cookie.pkl", "rb"))
-                for cookie in cookies:
+                WebDriverWait(self.driver, 5).until(EC.presence_of_element_located(SIDEBAR))
+                print('用户目录中已是登录状态')
+                return
+            except Exception:
+                pass
+
+        # 尝试加载cookie（会话存储中已过期/失效时直接手动登录）
+        status = self.sessions.status(SESSION_ACCOUNT)
+        if status in USABLE:
+            try:
+                for cookie in self.sessions.cookies(SESSION_ACCOUNT):
                     self.driver.add_cookie(cookie)
                 self.driver.refresh()
                 WebDriverWait(self.driver, 15).until(
                     EC.presence_of_element_located((By.CLASS_NAME, 'user.side-bar-component'))
                 )
+                self.sessions.save(SESSION_ACCOUNT, self.driver.get_cookies())
                 return
             except Exception as e:
                 print(f"Cookie加载失败: {str(e)}")
+                self.sessions.invalidate(SESSION_ACCOUNT)
+        else:
+            print(f"会话不可用（{status}），请手动登录")
 
         # 手动登录
         WebDriverWait(self.driver, 300).until(
             EC.presence_of_element_located((By.CLASS_NAME, 'user.side-bar-component'))
         )
-        pickle.dump(self.driver.get_cookies(), open("xhs_artist_cookie.pkl", "wb"))
+        self.sessions.save(SESSION_ACCOUNT, self.driver.get_cookies())
         print('登录成功')
 
     def extract_artworks(self) -> List[Dict]:
@@ -153,7 +178,8 @@ class ArtistXHSCrawler:
                     link_element = item.find_element(By.CSS_SELECTOR, 'a.cover.mask.ld')
                     artwork_url = link_element.get_attribute('href')
 
-                    if artwork_url in self.seen_links:
+                    key = note_key(artwork_url)
+                    if key in self.seen_links:
                         continue
                     if self.url_checker and self.url_checker(artwork_url):
                         continue
@@ -165,161 +191,198 @@ class ArtistXHSCrawler:
                         'images': [],
                         'content': ''
                     })
-                    self.seen_links.add(artwork_url)
+                    self.seen_links.add(key)
                 except Exception as e:
                     logging.error(f"提取艺术品异常: {str(e)}")
         except Exception as e:
             logging.error(f"页面加载异常: {str(e)}")
         return artworks
 
+    @timed('detail')
     def process_single_artwork(self, origin_url: str) -> Optional[Dict]:
         """处理单个艺术品详情"""
         artwork_url = convert_xhs_url(origin_url)
         print(f"打开艺术品URL: {origin_url} -> {artwork_url}")
 
+        new_window = None  # 尚未打开详情页时（如限速等待中收到停止）不关闭主窗口
         try:
             # 在新标签页打开
             self.driver.switch_to.window(self.main_window)
+            self.governor.acquire(DETAIL)
             self.driver.execute_script(f"window.open('{artwork_url}');")
             new_window = [w for w in self.driver.window_handles if w != self.main_window][0]
             self.driver.switch_to.window(new_window)
+            if self.lean:
+                self.lean.cover()
 
             # 等待页面加载
             WebDriverWait(self.driver, 15).until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, ".note-container"))
             )
-            time.sleep(2)
-
-            # 提取发布时间
-            try:
-                time_element = self.driver.find_element(By.CSS_SELECTOR, '.bottom-container .date')
-                raw_time = time_element.text.strip()
-                auth_time = parse_xhs_time(raw_time)
-                print(f"艺术品发布时间: {raw_time} -> {auth_time}")
-            except Exception as te:
-                logging.warning(f"时间提取失败: {str(te)}")
-                auth_time = 0
-
-            # 提取点赞数
-            try:
-                like_element = self.driver.find_element(
-                    By.CSS_SELECTOR, '.interact-container .like-active .count'
-                )
-                like_text = like_element.text.strip()
-
-                if '万' in like_text:
-                    like_count = int(float(like_text.replace('万', '')) * 10000)
-                elif 'k' in like_text.lower():
-                    like_count = int(float(like_text.lower().replace('k', '')) * 1000)
-                else:
-                    like_count = int(like_text) if like_text.isdigit() else 0
-                print(f"艺术品点赞数: {like_count}")
-            except Exception as le:
-                logging.warning(f"点赞数提取失败: {str(le)}")
-                like_count = 0
-
-            # 提取图片
-            img_urls = []
-            try:
-                # 视频封面
-                video_element = self.driver.find_element(By.CSS_SELECTOR, '.player-container')
-                if video_element:
-                    poster = self.driver.find_element(By.CSS_SELECTOR, 'xg-poster.xgplayer-poster')
-                    style = poster.get_attribute('style')
-                    cover_url = style.split('url("')[1].split('")')[0].replace('&quot;', '')
-                    img_urls = [cover_url]
-            except:
-                # 图片作品
-                try:
-                    swiper = self.driver.find_element(By.CLASS_NAME, 'swiper-wrapper')
-                    for img in swiper.find_elements(By.TAG_NAME, 'img'):
-                        src = img.get_attribute('src')
-                        if src and src.startswith('http'):
-                            img_urls.append(src)
-                except Exception as ie:
-                    logging.warning(f"图片提取失败: {str(ie)}")
-
-            # 提取内容
-            content = ''
-            try:
-                text_element = self.driver.find_element(By.CSS_SELECTOR, '.note-content .desc')
-                content = text_element.text.replace('\n', ' ').strip()[:2000]
-            except Exception as te:
-                logging.warning(f"内容提取失败: {str(te)}")
-
-            # 提取标题
-            title = ''
-            try:
-                title_element = self.driver.find_element(By.ID, 'detail-title')
-                title = title_element.text.strip()
-            except Exception as titile_e:
-                logging.warning(f"标题提取失败: {str(titile_e)}")
-
-            base_url = artwork_url.split('?')[0]
-            return {
-                'images': img_urls,
-                'content': content,
-                'url': base_url,
-                'title': title,
-                'auth_time': auth_time,
-                'like_count': like_count,
-            }
+            ready = self.waiter.wait('detail', DetailReady(self.driver), self.governor.timeout(DETAIL))
+            self.governor.report(DETAIL, ready, "详情页未就绪")
+            return self._scrape_artwork(artwork_url)
 
         except Exception as e:
             logging.error(f"艺术品处理失败 {artwork_url}: {str(e)}", exc_info=True)
+            self.governor.failure(DETAIL, "详情页打开失败")
             return None
         finally:
             try:
-                self.driver.close()
+                if new_window:
+                    self.driver.close()
                 self.driver.switch_to.window(self.main_window)
             except Exception as close_e:
                 logging.warning(f"窗口关闭异常: {str(close_e)}")
 
-    def extract_current_links(self) -> set:
-        """提取当前页面的所有链接"""
-        current_links = set()
-        try:
-            items = self.driver.find_elements(By.CSS_SELECTOR, '.note-item')
-            for item in items:
+    @timed('detail_batch')
+    def process_artworks_batch(self, origin_urls: List[str]) -> List[Optional[Dict]]:
+        """多标签并发处理一批作品：一起打开、并行加载，再逐个切换提取
+
+        每个标签页最多等到打开后限速器给出的详情等待上限，详情就绪即提前提取，各标签的等待相互重叠
+        """
+        settle = self.governor.timeout(DETAIL)
+        tabs = []
+        self.driver.switch_to.window(self.main_window)
+        for origin_url in origin_urls:
+            artwork_url = convert_xhs_url(origin_url)
+            print(f"打开艺术品URL: {origin_url} -> {artwork_url}")
+            try:
+                self.governor.acquire(DETAIL)
+                before = set(self.driver.window_handles)
+                self.driver.execute_script("window.open(arguments[0]);", artwork_url)
+                handle = (set(self.driver.window_handles) - before).pop()
+                tabs.append((artwork_url, handle, time.time()))
+            except Exception as e:
+                logging.error(f"打开标签页失败 {artwork_url}: {str(e)}")
+                tabs.append((artwork_url, None, 0))
+            time.sleep(self.tab_open_interval)
+
+        results = []
+        for artwork_url, handle, opened_at in tabs:
+            if handle is None:
+                results.append(None)
+                continue
+            try:
+                self.driver.switch_to.window(handle)
+                if self.lean:
+                    self.lean.cover()
+                WebDriverWait(self.driver, 15).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, ".note-container"))
+                )
+                # 已就绪的标签立即提取，否则最多等到打开后 settle 秒
+                remaining = opened_at + settle - time.time()
+                ready = self.waiter.wait('detail', DetailReady(self.driver), remaining, floor=0)
+                self.governor.report(DETAIL, ready, "详情页未就绪")
+                results.append(self._scrape_artwork(artwork_url))
+            except Exception as e:
+                logging.error(f"艺术品处理失败 {artwork_url}: {str(e)}", exc_info=True)
+                self.governor.failure(DETAIL, "详情页打开失败")
+                results.append(None)
+            finally:
                 try:
-                    link_element = item.find_element(
-                        By.CSS_SELECTOR, 'a.cover.mask.ld[href^="/user/profile/"]'
-                    )
-                    raw_url = link_element.get_attribute('href')
-                    clean_url = raw_url.replace('&amp;', '&')
-                    current_links.add(clean_url)
-                except Exception as e:
-                    continue
+                    self.driver.close()
+                except Exception as close_e:
+                    logging.warning(f"窗口关闭异常: {str(close_e)}")
+        self.driver.switch_to.window(self.main_window)
+        return results
+
+    @timed('extract')
+    def _scrape_artwork(self, artwork_url: str) -> Dict:
+        """从当前标签页提取作品详情"""
+        if self.capture:
+            record = self.capture.note_record(artwork_url)
+            if record:
+                print(f"艺术品接口数据: 时间 {record['auth_time']}，点赞 {record['like_count']}，"
+                      f"图片 {len(record['images'])} 张")
+                return record
+        # 一次往返取回详情页快照，字段解析在本地完成
+        snapshot = fetch_note_snapshot(self.driver)
+        fields, missing = build_note_fields(snapshot, parse_xhs_time)
+        for name in missing:
+            logging.warning(f"{name}提取失败: 页面中未找到对应元素")
+        print(f"艺术品发布时间: {fields['raw_time']} -> {fields['auth_time']}")
+        print(f"艺术品点赞数: {fields['like_count']}")
+
+        base_url = artwork_url.split('?')[0]
+        return {
+            'images': fields['images'],
+            'content': fields['content'],
+            'url': base_url,
+            'title': fields['title'],
+            'auth_time': fields['auth_time'],
+            'like_count': fields['like_count'],
+        }
+
+    def extract_current_links(self, cards=None) -> dict:
+        """提取当前页面的所有链接（单次 execute_script 批量提取），按页面顺序返回 {笔记ID: 链接}"""
+        current_links = {}
+        try:
+            if cards is None:
+                cards = fetch_note_cards(self.driver)
+            for card in cards:
+                key = note_key(card['href']) if card['profile_link'] else b''
+                if key:
+                    current_links.setdefault(key, card['href'])
         except Exception as e:
             logging.warning(f"提取链接时遇到异常: {str(e)}")
         return current_links
 
+    @timed('scroll')
     def smart_scroll(self, spd_setting: int):
-        """智能滚动加载更多内容，最多滚动5次"""
+        """智能滚动加载更多内容，最多滚动 max_scroll 次"""
         total_scroll = 0
         no_new_count = 0
         max_no_new = 3  # 连续3次无新内容则停止
         last_height = 0
-        max_scroll = 1  # 最大滚动次数为5
+        max_scroll = self.max_scroll
+        known_run = KnownRun(self.known_stop)
+        start_ts = time.time()
 
         while no_new_count < max_no_new and total_scroll < max_scroll:
-            current_links = self.extract_current_links()
-            converted_new_links = {
-                convert_xhs_url(link).split('?')[0]
-                for link in (current_links - self.all_links)
-            }
-            new_links = converted_new_links - self.all_links
-
-            # 快速模式处理
-            if spd_setting == ARTIST_SPIDER_SETTING['partial_collect'] and new_links:
-                self.process_quick_data(new_links)
-
-            self.all_links.update(current_links)
-            logging.info(f"当前总链接数：{len(self.all_links)} 新增：{len(new_links)}")
-
-            # 滚动页面
+            if self.capture:
+                self.capture.poll()  # 收集上一次滚动加载的笔记列表接口响应
+            try:
+                cards = fetch_note_cards(self.driver)
+            except Exception as e:
+                logging.warning(f"提取链接时遇到异常: {str(e)}")
+                cards = []
+            current_links = self.extract_current_links(cards)
+            new_keys = [key for key in current_links if key not in self.all_links]
+
+            # 本次滚动的新笔记一次性批量去重
+            existing = {note_key(url) for url in self.check_existing(explore_url(key) for key in new_keys)}
+            self.existing_links.update(existing)
+            # 已采集的笔记只记ID，不保留链接
+            for key in new_keys:
+                self.all_links[key] = '' if key in existing else current_links[key]
+            if self.progress:
+                self.progress.save_links(self.all_links, self.existing_links)
+
+            # 快速模式即时处理（复用本次滚动已提取的卡片）
+            fresh = {key for key in new_keys if key not in existing}
+            if spd_setting == ARTIST_SPIDER_SETTING['partial_collect'] and fresh:
+                self.process_quick_data(fresh, cards)
+
+            logging.info(f"当前总链接数：{len(self.all_links)} 新增：{len(new_keys)}")
+
+            # 主页按时间倒序：连续 known_stop 条已采集作品之后不会再有新笔记，提前结束滚动
+            if known_run.update(key in existing for key in new_keys):
+                saved = max_scroll - total_scroll
+                per_scroll = (time.time() - start_ts) / total_scroll if total_scroll else self.governor.timeout(PAGE)
+                logging.info(f"连续 {known_run.run} 条已采集作品，提前停止滚动：已滚动 {total_scroll} 次，"
+                             f"节省 {saved} 次滚动 / 约 {saved * per_scroll:.0f}s")
+                break
+
+            # 滚动页面，等待新卡片出现且页面高度稳定（最长为限速器给出的滚动等待上限）
+            self.governor.acquire(PAGE)
+            feed_loaded = FeedLoaded(self.driver)
             self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(23.5)
+            if self.waiter.wait('scroll', feed_loaded, self.governor.timeout(PAGE)):
+                self.governor.success(PAGE)
+            elif not self.all_links:
+                # 到底后的超时是正常的；一条作品都没有加载出来才算被限流/空页面
+                self.governor.failure(PAGE, "主页没有加载出作品")
 
             # 检查是否滚动到底部
             new_height = self.driver.execute_script("return document.body.scrollHeight")
@@ -334,6 +397,9 @@ class ArtistXHSCrawler:
 
     def crawl_artist(self, artist: Dict):
         """采集单个艺术家，无论是否采集过都最多滚动3次"""
+        self.metrics.begin_brand(artist['brand_name'])
+        if self.traffic:
+            self.traffic.begin_brand()
         try:
 
             spd_setting = artist.get('rednote_spd_setting_for_artist', ARTIST_SPIDER_SETTING['no_collect'])
@@ -353,19 +419,47 @@ class ArtistXHSCrawler:
             logging.info(f"艺术家[{artist['brand_name']}]开始采集，最多滚动5次")
 
             # 开始采集
-            self.driver.get(artist['rednote_url'])
-            self.smart_scroll(spd_setting)
+            # 全量采集记录品牌断点；上次中断时恢复已收集的链接，滚动已完成则直接处理剩余笔记
+            if self.checkpoint and spd_setting == ARTIST_SPIDER_SETTING['full_collect']:
+                self.progress = BrandProgress(self.checkpoint, artist['id'], commit=self.flush_callback)
+                if self.progress.load():
+                    self.all_links.update(self.progress.links)
+                    self.existing_links.update(self.progress.existing)
+                    # 上次中断前已提交、但还没记入断点的作品：按数据库再判定一次，不重复写入
+                    unsettled = [key for key in self.progress.links
+                                 if key not in self.progress.existing and key not in self.progress.processed]
+                    self.existing_links.update(note_key(url) for url in
+                                               self.check_existing(explore_url(key) for key in unsettled))
+                    logging.info(f"艺术家[{artist['brand_name']}]从断点继续：已收集链接 {len(self.progress.links)}，"
+                                 f"已处理 {len(self.progress.processed)}，滚动{'已' if self.progress.scrolled else '未'}完成")
+
+            if not (self.progress and self.progress.scrolled):
+                self.governor.acquire(PAGE)
+                with self.metrics.span('page_load'):
+                    self.driver.get(artist['rednote_url'])
+                self.smart_scroll(spd_setting)
+                if self.progress:
+                    self.progress.save_links(self.all_links, self.existing_links, scrolled=True)
 
             # 全量采集模式处理
             if spd_setting == ARTIST_SPIDER_SETTING['full_collect']:
-                for artwork_url in self.all_links:
-                    base_url = convert_xhs_url(artwork_url).split('?')[0]
-                    if self.url_checker and self.url_checker(base_url):
-                        logging.info(f"已处理过，跳过: {base_url}")
+                pending = []
+                for key, artwork_url in self.all_links.items():
+                    if key in self.existing_links or (self.progress and key in self.progress.processed):
+                        logging.info(f"已处理过，跳过: {explore_url(key)}")
                         continue
-
-                    detail = self.process_single_artwork(artwork_url)
-                    if detail:
+                    pending.append(artwork_url)
+
+                # 每批最多 detail_tabs 个标签页同时加载
+                for start in range(0, len(pending), self.detail_tabs):
+                    batch = pending[start:start + self.detail_tabs]
+                    if len(batch) == 1:
+                        details = [self.process_single_artwork(batch[0])]
+                    else:
+                        details = self.process_artworks_batch(batch)
+                    for detail in details:
+                        if not detail:
+                            continue
                         detail.update({
                             'artist_id': artist['id'],
                             'artist_name': artist['brand_name'],
@@ -373,7 +467,10 @@ class ArtistXHSCrawler:
                         })
                         if self.insert_callback:
                             try:
-                                self.insert_callback(detail)
+                                with self.metrics.span('insert'):
+                                    self.insert_callback(detail)
+                                if self.progress:
+                                    self.progress.note_written(note_key(detail['url']))
                             except Exception as e:
                                 logging.error(f"数据库插入失败: {str(e)}")
 
@@ -388,91 +485,120 @@ class ArtistXHSCrawler:
                     })
                     if self.insert_callback:
                         try:
-                            self.insert_callback(quick_data)
+                            with self.metrics.span('insert'):
+                                self.insert_callback(quick_data)
                         except Exception as e:
                             logging.error(f"数据库插入失败: {str(e)}")
                 logging.info(f"快速采集数据入库成功: {len(self.collected_quick_data)} 条")
 
-            # 清理缓存
-            self.all_links.clear()
-            self.collected_quick_data.clear()
+            # 缓冲中的作品提交后才删除品牌断点
+            if self.progress and self.progress.commit_written():
+                self.progress.clear()
             return True
         except Exception as e:
             logging.error(f"艺术家采集失败 {artist['rednote_url']}: {str(e)}")
             return False
+        finally:
+            # 成功、跳过或失败都清掉本艺术家的链接和去重缓存，不影响下一个艺术家（断点已另存在文件中）
+            self.reset_brand()
+            self.progress = None
+            if self.traffic:
+                self.traffic.end_brand(self.metrics)
+            self.metrics.end_brand()
+            self.keeper.tick(self.driver)
+
+    def reset_brand(self):
+        """清理单个艺术家的采集缓存"""
+        self.all_links.clear()
+        self.existing_links.clear()
+        self.seen_links.clear()
+        self.collected_quick_data.clear()
+        if self.capture:
+            self.capture.reset()
+
+    @timed('dedup')
+    def check_existing(self, urls) -> set:
+        """批量去重：优先一次批量查询，未提供批量接口时退回逐条检查"""
+        urls = set(urls)
+        if not urls:
+            return set()
+        if self.batch_url_checker:
+            return set(self.batch_url_checker(urls))
+        if self.url_checker:
+            return {url for url in urls if self.url_checker(url)}
+        return set()
 
     def get_collected_count(self, artist_id: int) -> int:
         """查询已采集数量"""
         if self.url_checker and hasattr(self.url_checker, '__self__'):
             db = self.url_checker.__self__
             try:
-                with db.connection.cursor() as cursor:
-                    sql = "SELECT COUNT(*) AS count FROM artist_spider_log WHERE brand_id = %s"
-                    cursor.execute(sql, (artist_id,))
-                    result = cursor.fetchone()
-                    return result['count'] if result else 0
+                return db.count_collected(artist_id)
             except Exception as e:
                 logging.error(f"查询已采集数量失败: {str(e)}")
                 return 0
         return 0
 
-    def process_quick_data(self, new_links: set):
-        """处理快速采集数据"""
-        current_items = self.driver.find_elements(By.CSS_SELECTOR, '.note-item')
-        for item in current_items:
+    def process_quick_data(self, new_keys: set, cards=None):
+        """处理快速采集数据（复用本次滚动已提取的卡片，new_keys 为已完成去重的笔记ID，处理过的会从中移除）"""
+        if cards is None:
+            cards = fetch_note_cards(self.driver)
+        for card in cards:
             try:
-                link = item.find_element(By.CSS_SELECTOR, 'a.cover.mask.ld').get_attribute('href')
-                clean_url = convert_xhs_url(link).split('?')[0]
-
-                if self.url_checker and self.url_checker(clean_url):
-                    logging.info(f"已存在，跳过快速采集: {clean_url}")
-                    continue
-
-                if clean_url not in new_links:
+                key = note_key(card['href'])
+                if key not in new_keys:
                     continue
+                new_keys.discard(key)  # 同一笔记的多张卡片只处理一次
+                clean_url = explore_url(key)
 
                 # 提取首图
-                try:
-                    img = item.find_element(By.CSS_SELECTOR, 'img[src*="xhscdn.com"]')
-                    cover_url = img.get_attribute('src').split('?')[0]
-                except Exception as e:
-                    logging.warning(f"首图提取失败: {str(e)}")
-                    cover_url = ""
+                cover_url = card['cover'].split('?')[0]
+                if not cover_url:
+                    logging.warning(f"首图提取失败: {clean_url}")
 
                 # 提取标题
-                try:
-                    title = item.find_element(By.CSS_SELECTOR, '.title > span').text[:600]
-                except Exception as e:
+                if card['title'] is None:
                     title = "无标题"
-                    logging.warning(f"标题提取失败: {str(e)}")
+                    logging.warning(f"标题提取失败: {clean_url}")
+                else:
+                    title = card['title'][:600]
 
-                self.collected_quick_data.append({
+                quick_data = {
                     'url': clean_url,
                     'images': [cover_url] if cover_url else [],
                     'title': title,
                     'content': ''
-                })
+                }
+                # 列表接口里有完整标题和准确点赞数时优先使用
+                feed = self.capture.feed_note(card['note_id']) if self.capture else None
+                if feed:
+                    quick_data['title'] = feed['title'][:600] or title
+                    if feed['cover'] and not cover_url:
+                        quick_data['images'] = [feed['cover']]
+                    quick_data['like_count'] = feed['like_count']
+                self.collected_quick_data.append(quick_data)
             except Exception as e:
                 logging.error(f"快速采集异常: {str(e)}")
 
 
 class ArtistDatabaseManager:
     def __init__(self):
-        self.connection = pymysql.connect(
-            host='111.229.182.88',
-            port=3306,
-            user='root',
-            password='s*xNvd%v@',
-            database='sukitime',
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor
-        )
+        # 连接池 + 数据库线程：运行中的写入和回查都在数据库线程执行，断线自动重连
+        self.pool = ConnectionPool(**DB_CONFIG)
+        self.connection = self.pool.acquire()  # 主线程：启动时读取艺术家、加载索引和排期
+        self.service = DBService(self.pool)
+        # 已采集作品ID的内存索引，替代逐条 SELECT 去重
+        self.note_index = NoteIndex('artist_spider_log')
+        self.note_index.load(self.connection)
+        # 缓冲写入，按行数/时间阈值批量提交（在数据库线程）
+        self.writer = BufferedWriter(self.service.connection, ARTIST_SPIDER_LOG)
+        self.service.on_idle(self.writer.flush_due)
 
     def fetch_artists(self) -> list:
         """获取需要采集的艺术家列表"""
         with self.connection.cursor() as cursor:
             sql = """
-                SELECT id, brand_name, rednote_url, rednote_spd_setting_for_artist 
+                SELECT id, brand_name, rednote_url, rednote_spd_setting_for_artist, spider_index, last_gather_time
                 FROM brand 
                 WHERE is_delete = 0 
                 AND is_bjd_artist = 1 
@@ -484,54 +610,98 @@ class ArtistDatabaseManager:
             return cursor.fetchall()
 
     def update_last_gather_time(self, artist_id: int):
-        """更新最后采集时间"""
-        with self.connection.cursor() as cursor:
+        """更新最后采集时间（入队即返回，数据库线程先提交缓冲中的作品，全部提交后才更新）"""
+        self.service.post(self._update_last_gather_time, artist_id, retry=True)
+
+    def _update_last_gather_time(self, artist_id: int):
+        if not self.writer.commit():
+            raise RuntimeError("缓冲中的记录未能提交，不更新采集时间")
+        with self.service.connection.cursor() as cursor:
             sql = "UPDATE brand SET last_gather_time = NOW() WHERE id = %s"
             cursor.execute(sql, (artist_id,))
-            self.connection.commit()
+            self.service.connection.commit()
 
     def is_url_exists(self, url: str) -> bool:
-        """检查URL是否已存在"""
-        with self.connection.cursor() as cursor:
+        """检查URL是否已存在（先查内存索引，无法判定时回查数据库）"""
+        exists = self.note_index.lookup(url)
+        if exists is not None:
+            return exists
+        return self.service.call(self._url_exists, url, retry=True)
+
+    def _url_exists(self, url: str) -> bool:
+        with self.service.connection.cursor() as cursor:
             sql = "SELECT 1 FROM artist_spider_log WHERE url = %s LIMIT 1"
             cursor.execute(sql, (url,))
             return bool(cursor.fetchone())
 
+    def count_collected(self, brand_id: int) -> int:
+        """查询该品牌已采集数量"""
+        return self.service.call(self._count_collected, brand_id, retry=True)
+
+    def _count_collected(self, brand_id: int) -> int:
+        with self.service.connection.cursor() as cursor:
+            sql = "SELECT COUNT(*) AS count FROM artist_spider_log WHERE brand_id = %s"
+            cursor.execute(sql, (brand_id,))
+            result = cursor.fetchone()
+            return result['count'] if result else 0
+
+    def existing_urls(self, urls) -> set:
+        """批量判断哪些 URL 已存在（先查内存索引，其余合并为一次 IN 查询）"""
+        existing, unknown = self.note_index.split_known(urls)
+        if unknown:
+            existing.update(self.service.call(query_existing_urls, self.service.connection,
+                                              'artist_spider_log', unknown, retry=True))
+        return existing
+
     def insert_artist_data(self, data: Dict):
-        """插入艺术家作品数据"""
-        with self.connection.cursor() as cursor:
-            sql = """
-                INSERT INTO artist_spider_log (
-                    msg_type, status, origin_type, title, 
-                    content, url, images, brand_id, 
-                    brand_name, created_at, updated_at, 
-                    full_get, auth_time, likes
-                ) VALUES (
-                    %s, %s, %s, %s, 
-                    %s, %s, %s, %s, 
-                    %s, %s, %s,
-                    %s, %s, %s
-                )
-            """
-            cursor.execute(sql, (
-                0, 0, 'xhs',
-                data.get('title', ''),
-                data.get('content', ''),
-                data.get('url', ''),
-                ','.join(data.get('images', [])),
-                data.get('artist_id', 0),
-                data.get('artist_name', ''),
-                int(time.time()),
-                int(time.time()),
-                data.get('full_get', 0),
-                data.get('auth_time', 0),
-                data.get('like_count', 0)
-            ))
-            self.connection.commit()
+        """插入艺术家作品数据（入队即返回，数据库线程中进入缓冲区，达到阈值后批量提交）"""
+        self.note_index.add(data.get('url', ''))
+        self.service.post(self.writer.add, data)
+
+    def flush(self) -> bool:
+        """等待队列中的写入完成并提交缓冲区，全部提交时返回 True"""
+        return self.service.call(self.writer.commit)
+
+    def close(self):
+        """执行完剩余的写入后停止数据库线程并关闭连接"""
+        self.service.close()
+        logging.info(self.service.summary())
+        self.pool.release(self.connection)
+        self.pool.close()
 
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="小红书艺术家作品采集")
+    parser.add_argument('--workers', type=int, default=1, help="并行浏览器进程数，大于 1 时启用进程池")
+    parser.add_argument('--tabs', type=int, default=1, help="每个浏览器同时加载的详情标签页数")
+    parser.add_argument('--wait-floor', type=float, default=0.5, help="就绪等待的最短秒数")
+    parser.add_argument('--known-stop', type=int, default=10,
+                        help="滚动中连续遇到多少条已采集作品即停止滚动，0 为不提前停止")
+    parser.add_argument('--max-scroll', type=int, default=1,
+                        help="每位艺术家主页的最大滚动次数，调大后遇到连续已采集作品即提前停止（--known-stop）")
+    parser.add_argument('--capture', action='store_true', help="从网络接口响应中解析作品数据（取不到时仍走页面提取）")
+    parser.add_argument('--no-schedule', action='store_true', help="不按发帖频率排期，按 spider_index/上次采集时间顺序全部采集")
+    parser.add_argument('--max-stale-days', type=float, default=14, help="距上次采集超过该天数的艺术家强制采集")
+    parser.add_argument('--min-expected', type=float, default=0.5, help="预计新作品数低于该值的艺术家本轮推迟")
+    parser.add_argument('--dry-run', action='store_true', help="只输出采集计划，不启动浏览器")
+    parser.add_argument('--metrics-out', default='artist_metrics.json',
+                        help="阶段耗时导出文件，.prom 为 Prometheus 文本格式，其余为 JSON；为空不导出")
+    parser.add_argument('--checkpoint', default='artist_checkpoint.json', help="采集断点文件，为空不记录断点")
+    parser.add_argument('--resume', action='store_true', help="从上次中断的位置继续（跳过已完成的艺术家和已处理的作品）")
+    parser.add_argument('--lean', action='store_true',
+                        help="精简模式：无头运行，拦截图片/视频/字体（需已保存 Cookie，无法处理验证码）")
+    parser.add_argument('--traffic', default='',
+                        help="按艺术家记录网络流量和加载耗时到指定文件（如 artist_traffic.json），用于精简模式与常规模式对比；默认不统计")
+    parser.add_argument('--user-data-dir', default='',
+                        help="持久化浏览器用户目录（如 artist_profile），保留登录状态和缓存，重启后跳过 Cookie 登录")
+    parser.add_argument('--attach', default='',
+                        help="附着到已运行的调试端口 Chrome（如 127.0.0.1:9222），进程池/流水线用逗号分隔多个地址")
+    parser.add_argument('--image-cache', default='',
+                        help="写入后把作品图片下载到该目录（按内容寻址，如 xhs_images），为空不下载")
+    parser.add_argument('--image-concurrency', type=int, default=8, help="图片同时下载数")
+    args = parser.parse_args()
+
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(levelname)s - %(message)s',
@@ -540,40 +710,107 @@ def main():
             logging.StreamHandler()
         ]
     )
+    scheduler = None
+    if not args.no_schedule:
+        scheduler = BrandScheduler('artist_spider_log', 'rednote_spd_setting_for_artist',
+                                   max_stale_days=args.max_stale_days, min_expected=args.min_expected)
+
+    # 启动浏览器前离线检查登录会话：无头且需要手动登录时直接退出
+    interactive = not args.lean or bool(args.user_data_dir or args.attach)
+    if not args.dry_run and not preflight(SessionStore(), SESSION_ACCOUNT, interactive):
+        return
+
+    if args.workers > 1 and not args.dry_run:
+        from xhs_pool import run_pool
+        # 图片由主进程在写入后统一下载
+        images = ImageStage(args.image_cache, args.image_concurrency) if args.image_cache else None
+        try:
+            run_pool('artist', args.workers, {'detail_tabs': args.tabs, 'wait_floor': args.wait_floor,
+                                              'capture': args.capture, 'known_stop': args.known_stop,
+                                              'max_scroll': args.max_scroll,
+                                              'lean': args.lean, 'traffic': args.traffic,
+                                              'user_data_dir': args.user_data_dir, 'attach': args.attach,
+                                              'governor': Governor(**GOVERNOR_TIMEOUTS)},
+                     scheduler=scheduler, metrics_out=args.metrics_out,
+                     checkpoint=args.checkpoint, resume=args.resume, image_stage=images)
+        finally:
+            if images:
+                images.close()
+        return
 
     print("初始化数据库连接...")
     db = ArtistDatabaseManager()
+    artists = db.fetch_artists()
+    logging.info(f"找到 {len(artists)} 位需要采集的艺术家")
+    checkpoint = Checkpoint(args.checkpoint)
+    resumed = checkpoint.resume(artists) if args.resume else None
+    if resumed is not None:
+        artists = resumed
+    elif scheduler:
+        artists = scheduler.schedule(db.connection, artists)
+    if args.dry_run:
+        db.close()
+        return
+    if resumed is None:
+        checkpoint.start(artists)
+    # 可选：写入后在后台下载作品图片到本地缓存（xhs_images）
+    images = ImageStage(args.image_cache, args.image_concurrency) if args.image_cache else None
 
     print("初始化爬虫...")
     crawler = ArtistXHSCrawler(
         url_checker=db.is_url_exists,
-        insert_callback=db.insert_artist_data
+        insert_callback=images.wrap(db.insert_artist_data) if images else db.insert_artist_data,
+        batch_url_checker=db.existing_urls,
+        flush_callback=db.flush,
+        detail_tabs=args.tabs,
+        wait_floor=args.wait_floor,
+        capture=args.capture,
+        known_stop=args.known_stop,
+        max_scroll=args.max_scroll,
+        checkpoint=args.checkpoint,
+        lean=args.lean,
+        traffic=args.traffic,
+        user_data_dir=args.user_data_dir,
+        attach=args.attach.split(',')[0].strip()
     )
 
     try:
         print("准备登录小红书...")
         crawler.login()
 
-        artists = db.fetch_artists()
-        logging.info(f"找到 {len(artists)} 位需要采集的艺术家")
 
         for artist in artists:
             try:
                 logging.info(f"开始采集艺术家: {artist['brand_name']}")
 
-                if crawler.crawl_artist(artist):
+                # 缓冲中的作品提交后才更新采集时间、记入运行断点
+                if crawler.crawl_artist(artist) and db.flush():
                     db.update_last_gather_time(artist['id'])
                     logging.info(f"已更新采集时间: {artist['brand_name']}")
+                    checkpoint.brand_done(artist['id'])
 
                 crawler.artwork_data.clear()
                 crawler.all_links.clear()
             except Exception as e:
                 logging.error(f"艺术家处理异常 {artist['brand_name']}: {str(e)}")
                 continue
+        checkpoint.finish()
 
     finally:
+        if images:
+            images.close()
+        db.flush()
+        logging.info(crawler.waiter.summary())
+        logging.info(crawler.governor.summary())
+        if crawler.capture:
+            logging.info(crawler.capture.summary())
+        if crawler.traffic:
+            logging.info(crawler.traffic.summary())
+        logging.info(crawler.metrics.summary())
+        crawler.metrics.export(args.metrics_out)
         crawler.driver.quit()
-        db.connection.close()
+        logging.info(db.note_index.summary())
+        db.close()
         logging.info("艺术家采集任务完成")
 
 
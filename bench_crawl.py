@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+端到端采集压测（本地模拟站点 + 无头 Chrome + 本地数据库）
+- 在后台启动 xhs_sim_site，逐个主页调用 XHSCrawler.crawl_author / ArtistXHSCrawler.crawl_artist
+- 默认写入 SQLite（pymysql DictCursor 风格的包装，去重索引和缓冲写入走与线上相同的代码）；
+  --mysql 可改用本地 MySQL，不连接生产库
+- --prefill 预先写入每个主页较早的一部分笔记，模拟增量采集（已采集判定 / 提前停止滚动）
+- 输出每个主页和总体的 笔记/分钟，以及滚动、详情、去重、写入各阶段耗时
+- --fake 不启动 Chrome：先经 HTTP 读取模拟站点的主页、分页接口和详情页，交给 xhs_fixture.FakeDriver 回放，
+  没有 Chrome 的环境下也能跑通 crawl_author / crawl_artist 的完整流程（耗时只反映爬虫自身的开销）
+
+用法：python bench_crawl.py [--profiles 3] [--notes 60] [--latency-ms 50] [--mode 1] [--tabs 2] [--artist] [--lean] [--fake]
+"""
+
+import argparse
+import json
+import logging
+import sqlite3
+import sys
+import time
+import urllib.request
+from typing import Callable, Dict, List
+
+import pymysql
+from selenium import webdriver
+
+from xhs_capture import FEED_API, enable_capture
+from xhs_fixture import FakeDriver
+from xhs_dedup import NoteIndex, query_existing_urls
+from xhs_lean import apply_lean_options
+from xhs_sim_site import add_site_arguments, config_from_args, start_server
+from xhs_text import EXPLORE_URL
+from xhs_writer import BufferedWriter, SPIDER_LOG, ARTIST_SPIDER_LOG
+
+TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    msg_type INTEGER, status INTEGER, origin_type TEXT, title TEXT, content TEXT,
+    url TEXT, images TEXT, brand_id INTEGER, brand_name TEXT, auth_time INTEGER,
+    created_at INTEGER, updated_at INTEGER, likes INTEGER, full_get INTEGER
+)
+"""
+
+
+# ===================== 本地数据库 =====================
+
+class SQLiteCursor:
+    """sqlite3 游标包装：%s 占位符、字典行、with 语句"""
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self.cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cursor.close()
+
+    def execute(self, sql: str, params=None):
+        return self.cursor.execute(sql.replace('%s', '?'), tuple(params or ()))
+
+    def executemany(self, sql: str, rows):
+        return self.cursor.executemany(sql.replace('%s', '?'), rows)
+
+    def _row(self, row):
+        return dict(zip([d[0] for d in self.cursor.description], row)) if row is not None else None
+
+    def fetchone(self):
+        return self._row(self.cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self.cursor.fetchall()]
+
+    def fetchmany(self, size: int):
+        return [self._row(row) for row in self.cursor.fetchmany(size)]
+
+
+class SQLiteConnection:
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path)
+
+    def cursor(self) -> SQLiteCursor:
+        return SQLiteCursor(self.connection.cursor())
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def close(self):
+        self.connection.close()
+
+
+def connect_mysql(dsn: str):
+    """user:password@host:port/database"""
+    auth, _, location = dsn.rpartition('@')
+    user, _, password = auth.partition(':')
+    address, _, database = location.partition('/')
+    host, _, port = address.partition(':')
+    return pymysql.connect(host=host, port=int(port or 3306), user=user, password=password, database=database,
+                           charset='utf8mb4', cursorclass=pymysql.cursors.DictCursor)
+
+
+class BenchDatabase:
+    """与 DatabaseManager / ArtistDatabaseManager 相同的去重与写入路径，表建在本地库中"""
+
+    def __init__(self, connection, artist: bool, sqlite: bool):
+        self.connection = connection
+        self.schema = ARTIST_SPIDER_LOG if artist else SPIDER_LOG
+        if sqlite:
+            with connection.cursor() as cursor:
+                cursor.execute(TABLE_SQL.format(table=self.schema.table))
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.schema.table}_url ON {self.schema.table} (url)")
+            connection.commit()
+        self.note_index = NoteIndex(self.schema.table)
+        self.writer = BufferedWriter(connection, self.schema)
+        self.artist = artist
+
+    def load_index(self):
+        self.note_index.load(self.connection)
+
+    def is_url_exists(self, url: str) -> bool:
+        exists = self.note_index.lookup(url)
+        if exists is None:
+            exists = bool(query_existing_urls(self.connection, self.schema.table, [url]))
+        return exists
+
+    def existing_urls(self, urls) -> set:
+        existing, unknown = self.note_index.split_known(urls)
+        existing.update(query_existing_urls(self.connection, self.schema.table, unknown))
+        return existing
+
+    def count_collected(self, brand_id: int) -> int:
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) AS count FROM {self.schema.table} WHERE brand_id = %s", (brand_id,))
+            result = cursor.fetchone()
+            return result['count'] if result else 0
+
+    def insert(self, data: Dict):
+        self.writer.add(data)
+        self.note_index.add(data.get('url', ''))
+
+    def flush(self):
+        self.writer.flush()
+
+    def inserted(self, brand_id: int) -> int:
+        self.flush()
+        return self.count_collected(brand_id)
+
+
+# ===================== 阶段计时 =====================
+
+class PhaseTimer:
+    """替换实例上的方法，累计每个阶段的调用次数和耗时"""
+
+    def __init__(self):
+        self.totals: Dict[str, List[float]] = {}
+
+    def wrap(self, phase: str, func: Callable) -> Callable:
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record = self.totals.setdefault(phase, [0, 0.0])
+                record[0] += 1
+                record[1] += time.perf_counter() - start
+        return timed
+
+    def patch(self, obj, phase: str, name: str):
+        if hasattr(obj, name):
+            setattr(obj, name, self.wrap(phase, getattr(obj, name)))
+
+    def report(self, wall: float) -> str:
+        lines = [f"{'阶段':<8} {'次数':>6} {'总耗时(s)':>10} {'平均(ms)':>10} {'占比':>7}"]
+        for phase, (count, total) in self.totals.items():
+            lines.append(f"{phase:<8} {count:>6} {total:>10.2f} {total / count * 1000:>10.1f} "
+                         f"{total / wall * 100 if wall else 0:>6.1f}%")
+        return '\n'.join(lines)
+
+
+# ===================== 压测 =====================
+
+def make_driver(headless: bool, capture: bool, lean: bool = False):
+    options = webdriver.ChromeOptions()
+    if lean:
+        apply_lean_options(options)
+    elif headless:
+        options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    if capture:
+        enable_capture(options)
+    return webdriver.Chrome(options=options)
+
+
+def make_fake_driver(site, base_url: str) -> FakeDriver:
+    """经 HTTP 读取模拟站点的全部页面交给 FakeDriver：主页第一屏 + 每次滚动追加的一页卡片 + 详情页"""
+    def fetch(path: str) -> str:
+        with urllib.request.urlopen(base_url + path) as response:
+            return response.read().decode('utf-8')
+
+    profiles, notes = {}, {}
+    for user_id in site.user_ids:
+        pages = [fetch(site.profile_path(user_id))]
+        cursor, has_more = site.config.page_size, site.config.page_size < len(site.profile_notes[user_id])
+        while has_more:
+            feed = json.loads(fetch(f"{FEED_API}?num={site.config.page_size}&cursor={cursor}&user_id={user_id}"))
+            pages.append(feed['data']['html'])
+            cursor, has_more = int(feed['data']['cursor']), feed['data']['has_more']
+        profiles[base_url + site.profile_path(user_id)] = pages
+        for note_id in site.profile_notes[user_id]:
+            notes[note_id] = fetch(f"/explore/{note_id}")
+    return FakeDriver(profiles, notes)
+
+
+def prefill(db: BenchDatabase, site, profiles: List[Dict], ratio: float):
+    """把每个主页较早的 ratio 部分笔记写入库中（模拟上次采集的结果）"""
+    if ratio <= 0:
+        return
+    for profile in profiles:
+        ids = site.profile_notes[profile['user_id']]
+        for note_id in ids[len(ids) - int(len(ids) * ratio):]:
+            db.insert({'url': EXPLORE_URL + note_id, 'title': 'prefill', 'images': [],
+                       'brand_id': profile['id'], 'brand_name': profile['brand_name'],
+                       'artist_id': profile['id'], 'artist_name': profile['brand_name']})
+    db.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟站点端到端采集压测")
+    add_site_arguments(parser)
+    parser.add_argument('--mode', type=int, default=1, choices=[1, 2], help="采集模式：1 全量 / 2 快速")
+    parser.add_argument('--artist', action='store_true', help="使用艺术家爬虫（ArtistXHSCrawler.crawl_artist）")
+    parser.add_argument('--tabs', type=int, default=1, help="同时加载的详情标签页数")
+    parser.add_argument('--wait-floor', type=float, default=0.5, help="就绪等待的最短秒数")
+    parser.add_argument('--known-stop', type=int, default=10, help="连续多少条已采集笔记即停止滚动，0 为不提前停止")
+    parser.add_argument('--max-scroll', type=int, default=None, help="最大滚动次数（默认沿用 crawl_author 的规则 / 艺术家滚动一次）")
+    parser.add_argument('--capture', action='store_true', help="从网络接口响应中解析笔记数据")
+    parser.add_argument('--no-headless', action='store_true', help="显示浏览器窗口")
+    parser.add_argument('--lean', action='store_true', help="精简模式（拦截图片/视频/字体）")
+    parser.add_argument('--traffic', default='bench_traffic.json',
+                        help="按主页记录流量，先不加 --lean 跑一次作为基线；为空不统计")
+    parser.add_argument('--pace', action='store_true',
+                        help="启用限速器的请求节奏（默认只用其就绪等待上限，测量不限速时的吞吐）")
+    parser.add_argument('--prefill', type=float, default=0.0, help="预先写入每个主页较早笔记的比例（0~1）")
+    parser.add_argument('--db', default=':memory:', help="SQLite 数据库文件")
+    parser.add_argument('--mysql', default=None, help="改用本地 MySQL：user:password@host:port/database")
+    parser.add_argument('--fake', action='store_true',
+                        help="不启动 Chrome，用 FakeDriver 回放模拟站点的页面（不支持 --capture / --lean / 流量统计）")
+    args = parser.parse_args()
+    if args.fake:
+        args.capture, args.lean, args.traffic = False, False, ''
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('bench_crawl.log', encoding='utf-8'),
+            logging.StreamHandler(stream=open(sys.stdout.fileno(), 'w', encoding='utf-8', errors='replace'))
+        ]
+    )
+
+    server, site, base_url = start_server(config_from_args(args))
+    logging.info(f"模拟站点: {base_url}，{args.profiles} 个主页 × {args.notes} 篇笔记")
+
+    connection = connect_mysql(args.mysql) if args.mysql else SQLiteConnection(args.db)
+    db = BenchDatabase(connection, args.artist, sqlite=not args.mysql)
+    setting_key = 'rednote_spd_setting_for_artist' if args.artist else 'rednote_spd_setting'
+    profiles = [{'id': 900000 + i, 'brand_name': f"模拟主页{i}", 'user_id': user_id,
+                 'rednote_url': base_url + site.profile_path(user_id), setting_key: args.mode}
+                for i, user_id in enumerate(site.user_ids)]
+    prefill(db, site, profiles, args.prefill)
+    db.load_index()
+
+    timer = PhaseTimer()
+    if args.fake:
+        driver = make_fake_driver(site, base_url)
+    else:
+        driver = make_driver(not args.no_headless, args.capture or bool(args.traffic), args.lean)
+    options = dict(url_checker=db.is_url_exists, insert_callback=timer.wrap('写入', db.insert),
+                   batch_url_checker=timer.wrap('去重', db.existing_urls), detail_tabs=args.tabs,
+                   wait_floor=args.wait_floor, capture=args.capture, known_stop=args.known_stop,
+                   lean=args.lean, traffic=args.traffic,
+                   driver=driver)
+    if args.artist:
+        from artis_rednote_spd import ArtistXHSCrawler
+        crawler = ArtistXHSCrawler(max_scroll=args.max_scroll or 1, **options)
+        crawl = crawler.crawl_artist
+        timer.patch(crawler, '详情', 'process_single_artwork')
+        timer.patch(crawler, '详情', 'process_artworks_batch')
+    else:
+        from xhs import XHSCrawler
+        crawler = XHSCrawler(**options)
+        crawl = (lambda brand: crawler.crawl_author(brand, max_scroll=args.max_scroll))
+        timer.patch(crawler, '详情', 'process_single_note')
+        timer.patch(crawler, '详情', 'process_notes_batch')
+    timer.patch(crawler, '滚动', 'smart_scroll')
+    crawler.governor.paced = args.pace
+
+    rows = []
+    wall_start = time.perf_counter()
+    try:
+        # 不登录真实站点：从模拟站点首页开始
+        crawler.driver.get(base_url + '/')
+        crawler.main_window = crawler.driver.current_window_handle
+        for profile in profiles:
+            before = db.inserted(profile['id'])
+            start = time.perf_counter()
+            crawl(profile)
+            elapsed = time.perf_counter() - start
+            inserted = db.inserted(profile['id']) - before
+            rows.append((profile['brand_name'], inserted, elapsed))
+            logging.info(f"[{profile['brand_name']}] 写入 {inserted} 条，用时 {elapsed:.1f}s")
+    finally:
+        db.flush()
+        wall = time.perf_counter() - wall_start
+        crawler.driver.quit()
+        server.shutdown()
+
+    print(f"\n{'主页':<12} {'新笔记':>6} {'用时(s)':>8} {'笔记/分钟':>10}")
+    for name, inserted, elapsed in rows:
+        print(f"{name:<12} {inserted:>6} {elapsed:>8.1f} {inserted / elapsed * 60 if elapsed else 0:>10.1f}")
+    total = sum(row[1] for row in rows)
+    print(f"{'合计':<12} {total:>6} {wall:>8.1f} {total / wall * 60 if wall else 0:>10.1f}\n")
+    print(timer.report(wall))
+    print(crawler.waiter.summary())
+    print(crawler.governor.summary())
+    print(crawler.metrics.summary())
+    if crawler.traffic:
+        print(crawler.traffic.summary())
+    print(db.note_index.summary())
+    if crawler.capture:
+        print(crawler.capture.summary())
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+离线提取基准（录制页面回放，不需要浏览器和登录）
+- 用 fixtures/ 中录制的主页和笔记 HTML 驱动 XHSCrawler / ArtistXHSCrawler
+- 先按 manifest.json 中的期望值校验 extract_current_links / process_quick_data / process_single_note
+- 再逐页统计提取耗时和 WebDriver 调用次数（列表页同时给出旧的逐卡片 find_element 方式作对比）
+- --latency-ms 为每次 WebDriver 调用附加的往返延迟，用于估算真实 chromedriver 下的耗时
+
+用法：python bench_extract.py [--fixtures fixtures] [--repeat 20] [--latency-ms 0] [--artist]
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import time
+from typing import Callable, Dict, List
+
+from selenium.webdriver.common.by import By
+
+from bench_roundtrips import legacy_extract
+from xhs_fixture import FakeDriver, load_manifest
+from xhs_governor import Governor
+from xhs_text import note_key, explore_url
+
+
+def make_crawler(driver: FakeDriver, artist: bool):
+    """创建使用 FakeDriver 的爬虫，关闭等待下限、限速和标签间隔，只测提取本身"""
+    governor = Governor(page_timeout=0, detail_timeout=0, paced=False)
+    if artist:
+        from artis_rednote_spd import ArtistXHSCrawler
+        crawler = ArtistXHSCrawler(driver=driver, wait_floor=0, governor=governor)
+    else:
+        from xhs import XHSCrawler
+        crawler = XHSCrawler(driver=driver, wait_floor=0, governor=governor)
+    crawler.tab_open_interval = 0
+    return crawler
+
+
+def open_profile(crawler, url: str):
+    crawler.all_links.clear()
+    crawler.existing_links.clear()
+    crawler.collected_quick_data.clear()
+    crawler.driver.get(url)
+    crawler.main_window = crawler.driver.current_window_handle
+
+
+def note_detail(crawler, url: str):
+    if hasattr(crawler, 'process_single_note'):
+        return crawler.process_single_note(url)
+    return crawler.process_single_artwork(url)
+
+
+# ===================== 校验 =====================
+
+def check(crawler, manifest: Dict, artist: bool) -> List[str]:
+    """按期望值校验提取结果，返回不一致项"""
+    errors = []
+    for url, profile in manifest['profiles'].items():
+        open_profile(crawler, url)
+        if artist:
+            crawler.smart_scroll(2)  # 艺术家采集固定只滚动一次
+        else:
+            crawler.smart_scroll(2, len(profile['pages']) + 1)
+        got = [key.hex() for key in crawler.all_links]
+        expected = profile.get('expected_links', [])
+        # 艺术家采集只滚动一次，只比对已加载的部分
+        if not got or got != expected[:len(got)]:
+            errors.append(f"{url} 链接: 期望 {expected}，实际 {got}")
+        quick = {note_key(row['url']).hex(): row for row in crawler.collected_quick_data}
+        for note_id, fields in profile.get('expected_quick', {}).items():
+            row = quick.get(note_id)
+            if row is None:
+                errors.append(f"{note_id} 快速采集: 缺少记录")
+                continue
+            for name, value in fields.items():
+                if row.get(name) != value:
+                    errors.append(f"{note_id} 快速采集 {name}: 期望 {value!r}，实际 {row.get(name)!r}")
+
+        links = dict(crawler.all_links)
+        for note_id, note in manifest['notes'].items():
+            href = links.get(bytes.fromhex(note_id)) or explore_url(bytes.fromhex(note_id))
+            record = note_detail(crawler, href)
+            if record is None:
+                errors.append(f"{note_id} 详情: 提取失败")
+                continue
+            for name, value in note.get('expected', {}).items():
+                actual = bool(record['auth_time']) if name == 'has_time' else record.get(name)
+                if actual != value:
+                    errors.append(f"{note_id} 详情 {name}: 期望 {value!r}，实际 {actual!r}")
+    return errors
+
+
+# ===================== 计时 =====================
+
+def measure(driver: FakeDriver, func: Callable, repeat: int):
+    """返回 (单次 WebDriver 调用数, 最快一次耗时 ms)"""
+    best = float('inf')
+    calls = 0
+    for _ in range(repeat):
+        driver.reset_counts()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+        calls = driver.command_count
+    return calls, best * 1000
+
+
+def run_bench(crawler, manifest: Dict, repeat: int) -> List[tuple]:
+    driver = crawler.driver
+    rows = []
+    for url in manifest['profiles']:
+        name = url.rstrip('/').rsplit('/', 1)[-1][:8]
+        open_profile(crawler, url)
+
+        def batched():
+            links = crawler.extract_current_links()
+            crawler.process_quick_data(set(links))
+            crawler.collected_quick_data.clear()
+
+        cards = len(driver.find_elements(By.CSS_SELECTOR, '.note-item'))
+        rows.append((f"主页 {name} 逐卡片(旧)", cards) + measure(driver, lambda: legacy_extract(driver), repeat))
+        rows.append((f"主页 {name} 批量", cards) + measure(driver, batched, repeat))
+
+        links = crawler.extract_current_links()
+        for note_id, note in manifest['notes'].items():
+            href = links.get(bytes.fromhex(note_id)) or explore_url(bytes.fromhex(note_id))
+            rows.append((f"详情 {note['file']}", 1) + measure(driver, lambda: note_detail(crawler, href), repeat))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线提取基准（录制页面回放）")
+    parser.add_argument('--fixtures', default='fixtures', help="录制页面目录（含 manifest.json）")
+    parser.add_argument('--repeat', type=int, default=20, help="每项重复次数（取最快一次）")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="每次 WebDriver 调用附加的往返延迟（毫秒）")
+    parser.add_argument('--artist', action='store_true', help="使用艺术家爬虫（ArtistXHSCrawler）")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    manifest = load_manifest(args.fixtures)
+    driver = FakeDriver.from_fixtures(args.fixtures)
+    crawler = make_crawler(driver, args.artist)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        errors = check(crawler, manifest, args.artist)
+    if errors:
+        print("提取结果与录制期望不一致：")
+        for error in errors:
+            print(f"  {error}")
+        raise SystemExit(1)
+    print(f"校验通过：主页 {len(manifest['profiles'])} 个，详情 {len(manifest['notes'])} 个")
+
+    driver.latency = args.latency_ms / 1000
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = run_bench(crawler, manifest, args.repeat)
+    print(f"{'页面':<28} {'卡片':>6} {'调用数':>8} {'耗时(ms)':>10}")
+    for name, cards, calls, ms in rows:
+        print(f"{name:<28} {cards:>6} {calls:>8} {ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+图片下载阶段压测（本地模拟站点，不需要浏览器）
+- 在后台启动 xhs_sim_site，按采集结果的形式（每条记录一个 images 列表）把全部笔记的图片交给 ImageStage
+- 每条记录提交 --repeat 次，模拟同一笔记被多条记录/多次采集引用：同一 URL 只下载一次
+- 第二轮用同一缓存目录重跑，全部命中 URL 索引，不发出请求
+- 输出每轮的 张/秒、下载量、命中与连接复用
+
+用法：python bench_images.py [--profiles 3] [--notes 60] [--concurrency 8] [--root bench_images_cache]
+"""
+
+import argparse
+import logging
+import shutil
+import sys
+import time
+
+from xhs_images import ImageCache, ImageStage
+from xhs_sim_site import add_site_arguments, config_from_args, start_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟站点图片下载压测")
+    add_site_arguments(parser)
+    parser.add_argument('--concurrency', type=int, default=8, help="同时下载数")
+    parser.add_argument('--repeat', type=int, default=2, help="每条记录提交的次数")
+    parser.add_argument('--rounds', type=int, default=2, help="使用同一缓存目录运行的轮数")
+    parser.add_argument('--root', default='bench_images_cache', help="缓存目录（开始前清空）")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        stream=sys.stdout)
+
+    server, site, base_url = start_server(config_from_args(args))
+    records = [{'url': f"{base_url}/explore/{note_id}", 'images': site.note(note_id)['images']}
+               for user_id in site.user_ids for note_id in site.profile_notes[user_id]]
+    urls = sum(len(record['images']) for record in records)
+    logging.info(f"模拟站点: {base_url}，{len(records)} 条记录，{urls} 张图片，每条提交 {args.repeat} 次")
+    shutil.rmtree(args.root, ignore_errors=True)
+
+    try:
+        for round_no in range(1, args.rounds + 1):
+            inserted = []
+            stage = ImageStage(args.root, concurrency=args.concurrency)
+            insert = stage.wrap(inserted.append)
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                for record in records:
+                    insert(record)
+            stage.close()
+            elapsed = time.perf_counter() - start
+            print(f"第 {round_no} 轮：{urls} 张 / {elapsed:.2f}s（{urls / elapsed if elapsed else 0:.0f} 张/秒），"
+                  f"写入回调 {len(inserted)} 次")
+    finally:
+        server.shutdown()
+
+    cache = ImageCache(args.root)
+    missing = [url for record in records for url in record['images'] if not cache.lookup(url)]
+    print(cache.summary())
+    print(f"校验：{'全部图片都能从缓存读取' if not missing else f'{len(missing)} 张缺失，如 {missing[0]}'}")
+    cache.close()
+
+
+if __name__ == '__main__':
+    main()
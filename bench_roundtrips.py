@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+列表页提取往返次数基准
+- 对同一个主页，每次滚动分别用旧的逐卡片 find_element 方式和新的批量脚本提取一次
+- 统计每次滚动的 WebDriver 命令数（即到 chromedriver 的 HTTP 往返）与耗时
+
+用法：python bench_roundtrips.py <主页URL> [--scrolls 5] [--wait 3]
+"""
+
+import argparse
+import time
+
+from selenium.webdriver.common.by import By
+
+from xhs import XHSCrawler
+from xhs_extract import fetch_note_cards
+
+
+class CommandCounter:
+    """挂在 driver.execute 上统计命令数；WebElement 的调用也经过 driver.execute"""
+
+    def __init__(self, driver):
+        self.count = 0
+        self._execute = driver.execute
+        driver.execute = self._counted_execute
+
+    def _counted_execute(self, driver_command, params=None):
+        self.count += 1
+        return self._execute(driver_command, params)
+
+
+def legacy_extract(driver):
+    """旧实现：extract_current_links + process_quick_data 的逐卡片调用链"""
+    links = set()
+    for item in driver.find_elements(By.CSS_SELECTOR, '.note-item'):
+        try:
+            link = item.find_element(By.CSS_SELECTOR, 'a.cover.mask.ld[href^="/user/profile/"]')
+            links.add(link.get_attribute('href').replace('&amp;', '&'))
+        except Exception:
+            continue
+    for item in driver.find_elements(By.CSS_SELECTOR, '.note-item'):
+        try:
+            item.find_element(By.CSS_SELECTOR, 'a.cover.mask.ld').get_attribute('href')
+            item.find_element(By.CSS_SELECTOR, 'img[src*="xhscdn.com"]').get_attribute('src')
+            item.find_element(By.CSS_SELECTOR, '.title > span').text
+        except Exception:
+            continue
+    return links
+
+
+def batched_extract(driver):
+    """新实现：一次 execute_script 取回全部卡片"""
+    return {card['href'] for card in fetch_note_cards(driver) if card['profile_link']}
+
+
+def measure(counter, func, driver):
+    before = counter.count
+    start = time.perf_counter()
+    links = func(driver)
+    return counter.count - before, time.perf_counter() - start, len(links)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列表页提取往返次数基准")
+    parser.add_argument('url', help="小红书主页 URL")
+    parser.add_argument('--scrolls', type=int, default=5, help="滚动次数")
+    parser.add_argument('--wait', type=float, default=3.0, help="每次滚动后的等待秒数")
+    args = parser.parse_args()
+
+    crawler = XHSCrawler()
+    try:
+        crawler.login()
+        crawler.driver.get(args.url)
+        time.sleep(args.wait)
+        counter = CommandCounter(crawler.driver)
+
+        print(f"{'滚动':>4} {'卡片':>6} {'旧往返':>8} {'旧耗时(s)':>10} {'新往返':>8} {'新耗时(s)':>10}")
+        totals = [0, 0.0, 0, 0.0]
+        for i in range(args.scrolls + 1):
+            old_calls, old_time, n = measure(counter, legacy_extract, crawler.driver)
+            new_calls, new_time, _ = measure(counter, batched_extract, crawler.driver)
+            totals[0] += old_calls
+            totals[1] += old_time
+            totals[2] += new_calls
+            totals[3] += new_time
+            print(f"{i:>4} {n:>6} {old_calls:>8} {old_time:>10.3f} {new_calls:>8} {new_time:>10.3f}")
+            crawler.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            time.sleep(args.wait)
+
+        rounds = args.scrolls + 1
+        print(f"平均每次滚动：旧 {totals[0] / rounds:.1f} 次往返 / {totals[1] / rounds:.3f}s，"
+              f"新 {totals[2] / rounds:.1f} 次往返 / {totals[3] / rounds:.3f}s")
+    finally:
+        crawler.driver.quit()
+
+
+if __name__ == "__main__":
+    main()
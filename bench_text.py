@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+文本归一化微基准
+- URL：取 artist_crawler.log 中出现过的全部笔记/主页链接，并按日志中的用户ID拼出主页内笔记链接
+- 时间/点赞：日志里没有原始文本，按日志行时间戳生成页面上对应的显示格式，按笔记ID生成点赞文本
+- 对比旧实现（每次解析 URL、每次编译正则、每条取一次当前时间）与 xhs_text，先校验结果一致再计时
+
+用法：python bench_text.py [--log artist_crawler.log] [--repeat 5]
+"""
+
+import argparse
+import logging
+import re
+import time
+import urllib.parse
+from datetime import datetime, timedelta
+
+from xhs_text import convert_xhs_url, note_base_urls, parse_xhs_times, parse_like_counts
+
+URL_RE = re.compile(r'https://www\.xiaohongshu\.com/[^\s:]+')
+LOG_TS_RE = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})')
+PROFILE_RE = re.compile(r'/user/profile/([0-9a-f]{24})(?:[?:]|$)')
+NOTE_ID_RE = re.compile(r'/explore/([0-9a-f]{24})')
+LOCATIONS = ['广东', '上海', '浙江', '北京', '四川', '江苏']
+
+
+# ===================== 旧实现 =====================
+
+def legacy_convert_xhs_url(original_url):
+    parsed_url = urllib.parse.urlparse(original_url)
+    new_query = parsed_url.query.replace('&amp;', '&')
+    path_parts = parsed_url.path.split('/')
+    if len(path_parts) >= 5 and path_parts[1] == 'user' and path_parts[2] == 'profile':
+        new_path = f'/explore/{path_parts[4]}'
+    else:
+        new_path = parsed_url.path
+    return urllib.parse.urlunparse(parsed_url._replace(path=new_path, query=new_query))
+
+
+def legacy_parse_xhs_time(time_str: str) -> int:
+    from datetime import datetime, timedelta
+    import re
+
+    clean_str = time_str.replace('编辑于 ', '').strip()
+    time_part = re.split(r'\s+(?=[\u4e00-\u9fa5]{2,5}$)', clean_str)[0]
+    now = datetime.now()
+    current_year = now.year
+    try:
+        if '天前' in time_part:
+            days = int(re.search(r'\d+', time_part).group())
+            return int((now - timedelta(days=days)).timestamp())
+        if '昨天' in time_part:
+            time_str = re.sub(r'昨天', (now - timedelta(days=1)).strftime('%Y-%m-%d'), time_part)
+        elif '今天' in time_part:
+            time_str = re.sub(r'今天', now.strftime('%Y-%m-%d'), time_part)
+        elif '分钟前' in time_part:
+            minutes = int(re.search(r'\d+', time_part).group())
+            return int((now - timedelta(minutes=minutes)).timestamp())
+        elif '小时前' in time_part:
+            hours = int(re.search(r'\d+', time_part).group())
+            return int((now - timedelta(hours=hours)).timestamp())
+        else:
+            time_str = time_part
+        time_formats = [
+            (r'(\d{1,2})-(\d{1,2}) (\d{1,2}):(\d{2})', "%m-%d %H:%M"),
+            (r'(\d{4})-(\d{1,2})-(\d{1,2}) (\d{1,2}):(\d{2})', "%Y-%m-%d %H:%M"),
+            (r'(\d{1,2})-(\d{1,2})', "%m-%d"),
+        ]
+        for pattern, time_format in time_formats:
+            if re.match(pattern, time_str):
+                dt = datetime.strptime(time_str, time_format)
+                if dt.year == 1900:
+                    dt = dt.replace(year=current_year)
+                    if dt > now + timedelta(days=60):
+                        dt = dt.replace(year=current_year - 1)
+                return int(dt.timestamp())
+        return 0
+    except Exception:
+        return 0
+
+
+def legacy_parse_like_count(like_text: str) -> int:
+    like_text = (like_text or '').strip()
+    try:
+        if '万' in like_text:
+            return int(float(like_text.replace('万', '')) * 10000)
+        if 'k' in like_text.lower():
+            return int(float(like_text.lower().replace('k', '')) * 1000)
+    except ValueError:
+        return 0
+    return int(like_text) if like_text.isdigit() else 0
+
+
+# ===================== 语料 =====================
+
+def display_time(ts: datetime, now: datetime) -> str:
+    """按页面规则把时间渲染成显示文本"""
+    age = now - ts
+    if age < timedelta(hours=1):
+        return f"{max(1, age.seconds // 60)}分钟前"
+    if age < timedelta(days=1):
+        return f"{age.seconds // 3600}小时前"
+    if age < timedelta(days=2):
+        return ts.strftime('昨天 %H:%M')
+    if age < timedelta(days=7):
+        return f"{age.days}天前"
+    if ts.year == now.year:
+        return ts.strftime('%m-%d')
+    return ts.strftime('%Y-%m-%d %H:%M')
+
+
+def display_like(note_id: str) -> str:
+    n = int(note_id[-6:], 16)
+    kind = n % 5
+    if kind == 0:
+        return '赞'
+    if kind == 1:
+        return f"{n % 10000 / 10:.1f}万"
+    if kind == 2:
+        return f"{n % 1000 / 100:.1f}k"
+    return str(n % 9999)
+
+
+def load_corpus(log_path: str):
+    urls, stamps, user_ids, note_ids = [], [], [], []
+    with open(log_path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            match = LOG_TS_RE.match(line)
+            if match:
+                stamps.append(datetime.strptime(match.group(1), '%Y-%m-%d %H:%M:%S'))
+            for url in URL_RE.findall(line):
+                urls.append(url)
+                user = PROFILE_RE.search(url)
+                if user:
+                    user_ids.append(user.group(1))
+                note = NOTE_ID_RE.search(url)
+                if note:
+                    note_ids.append(note.group(1))
+    # 主页卡片上的笔记链接：/user/profile/<用户ID>/<笔记ID>?xsec_token=...&amp;xsec_source=pc_user
+    user_ids = user_ids or ['5d419e07000000001001e0ba']
+    for i, note_id in enumerate(note_ids):
+        urls.append(f"https://www.xiaohongshu.com/user/profile/{user_ids[i % len(user_ids)]}/{note_id}"
+                    f"?xsec_token=AB{note_id[:8]}&amp;xsec_source=pc_user")
+
+    now = max(stamps)
+    times = []
+    for i, ts in enumerate(stamps):
+        text = display_time(ts, now)
+        if i % 3 == 0:
+            text += ' ' + LOCATIONS[i % len(LOCATIONS)]
+        if i % 7 == 0:
+            text = '编辑于 ' + text
+        times.append(text)
+    likes = [display_like(note_id) for note_id in note_ids]
+    return urls, times, likes
+
+
+# ===================== 计时 =====================
+
+def bench(func, data, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(data)
+        best = min(best, time.perf_counter() - start)
+    return best / max(1, len(data)) * 1e6
+
+
+def check(name: str, old, new, tolerance: int = 0):
+    diff = [(i, a, b) for i, (a, b) in enumerate(zip(old, new)) if abs(a - b) > tolerance] \
+        if tolerance else [(i, a, b) for i, (a, b) in enumerate(zip(old, new)) if a != b]
+    if diff:
+        i, a, b = diff[0]
+        raise SystemExit(f"{name} 结果不一致：{len(diff)} 条，例如第 {i} 条 旧={a!r} 新={b!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文本归一化微基准")
+    parser.add_argument('--log', default='artist_crawler.log', help="语料来源日志")
+    parser.add_argument('--repeat', type=int, default=5, help="每项重复次数（取最快一次）")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    urls, times, likes = load_corpus(args.log)
+    print(f"语料：URL {len(urls)} 条，时间 {len(times)} 条，点赞 {len(likes)} 条")
+
+    # 相对时间依赖当前时间，旧实现逐条取 now，允许 2 秒误差
+    check('URL', [legacy_convert_xhs_url(u) for u in urls], [convert_xhs_url(u) for u in urls])
+    check('URL(去参数)', [legacy_convert_xhs_url(u).split('?')[0] for u in urls], note_base_urls(urls))
+    check('时间', [legacy_parse_xhs_time(t) for t in times], parse_xhs_times(times), tolerance=2)
+    check('点赞', [legacy_parse_like_count(t) for t in likes], parse_like_counts(likes))
+
+    cases = [
+        ('URL 转换', urls,
+         lambda d: [legacy_convert_xhs_url(u) for u in d], lambda d: [convert_xhs_url(u) for u in d]),
+        ('URL 去参数', urls,
+         lambda d: [legacy_convert_xhs_url(u).split('?')[0] for u in d], note_base_urls),
+        ('发布时间', times, lambda d: [legacy_parse_xhs_time(t) for t in d], parse_xhs_times),
+        ('点赞数', likes, lambda d: [legacy_parse_like_count(t) for t in d], parse_like_counts),
+    ]
+    print(f"{'项目':<10} {'条数':>8} {'旧(µs/条)':>12} {'新(µs/条)':>12} {'加速':>8}")
+    for name, data, old, new in cases:
+        old_us = bench(old, data, args.repeat)
+        new_us = bench(new, data, args.repeat)
+        print(f"{name:<10} {len(data):>8} {old_us:>12.2f} {new_us:>12.2f} {old_us / new_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
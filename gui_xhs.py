@@ -1,18 +1,14 @@
 # -*- coding: utf-8 -*-
 """
 小红书采集 GUI 版
-- 运行中实时修改采集速度（滚动/详情等待）
+- 采集节奏由自适应限速器调整（xhs_governor：成功时加速，超时/空页面时退避），界面显示当前速率
 - 显示采集用时（HH:MM:SS）
 - 显示品牌处理进度百分比
-- 显示 sleep 等待读条（滚动等待 & 详情等待）
+- 显示等待读条（滚动等待 & 详情等待 & 限速等待；内容就绪即提前结束，限速器给出最长等待）
 """
 
 import os
-import pickle
 import time
-import urllib
-import urllib.parse
-import pymysql
 import logging
 import threading
 from typing import Dict, Optional, Callable
@@ -24,102 +20,54 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from xhs_text import convert_xhs_url, note_key, explore_url, parse_xhs_time
+from xhs_dedup import NoteIndex, KnownRun, query_existing_urls
+from xhs_writer import BufferedWriter, SPIDER_LOG
+from xhs_db import ConnectionPool, DBService, DB_CONFIG
+from xhs_extract import fetch_note_cards, fetch_note_snapshot, build_note_fields
+from xhs_wait import ReadyWaiter, FeedLoaded, DetailReady
+from xhs_capture import NetworkCapture, enable_capture
+from xhs_lean import LeanMode, TrafficMeter, apply_lean_options
+from xhs_browser import (SIDEBAR, STEALTH_PATH, attach_options, load_stealth, session_logged_in, startup_mode,
+                         use_profile)
+from xhs_session import SessionStore, SessionKeeper, USABLE, preflight
+from xhs_governor import Governor, PAGE, DETAIL
+from xhs_scheduler import BrandScheduler
+from xhs_metrics import Metrics, timed
+from xhs_checkpoint import Checkpoint, BrandProgress
+
 # ====== Tkinter GUI ======
 import tkinter as tk
 from tkinter import ttk, messagebox
 
+CHECKPOINT_FILE = 'gui_xhs_checkpoint.json'  # 采集断点（品牌顺序、当前品牌的链接和已处理笔记）
+TRAFFIC_FILE = 'gui_xhs_traffic.json'  # 精简模式下按品牌记录网络流量和加载耗时
+PROFILE_DIR = 'gui_xhs_profile'  # 持久化浏览器用户目录
+SESSION_ACCOUNT = 'xhs'  # 会话存储中的账号（与品牌采集共用，xhs_session）
+# 限速器的就绪等待基础上限：滚动 10.5s、详情 5s（原 GUI 等待配置的默认值）
+GOVERNOR_TIMEOUTS = {'page_timeout': 10.5, 'detail_timeout': 5.0}
 
-# ===================== 工具函数 =====================
-
-def convert_xhs_url(original_url):
-    parsed_url = urllib.parse.urlparse(original_url)
-    new_query = parsed_url.query.replace('&amp;', '&')
-
-    path_parts = parsed_url.path.split('/')
-    if len(path_parts) >= 5 and path_parts[1] == 'user' and path_parts[2] == 'profile':
-        note_id = path_parts[4]
-        new_path = f'/explore/{note_id}'
-    else:
-        new_path = parsed_url.path
-
-    new_parsed = parsed_url._replace(
-        path=new_path,
-        query=new_query
-    )
-    return urllib.parse.urlunparse(new_parsed)
-
-
-def parse_xhs_time(time_str: str) -> int:
-    """解析小红书时间格式（含 天前/小时前/分钟前/昨天/今天 及常见日期格式）"""
-    from datetime import datetime, timedelta
-    import re
-
-    clean_str = time_str.replace('编辑于 ', '').strip()
-    parts = re.split(r'\s+(?=[\u4e00-\u9fa5]{2,5}$)', clean_str)
-    time_part = parts[0]
-
-    now = datetime.now()
-    current_year = now.year
-
-    try:
-        if '天前' in time_part:
-            days = int(re.search(r'\d+', time_part).group())
-            return int((now - timedelta(days=days)).timestamp())
-
-        if '昨天' in time_part:
-            date = now - timedelta(days=1)
-            time_str2 = re.sub(r'昨天', date.strftime('%Y-%m-%d'), time_part)
-        elif '今天' in time_part:
-            time_str2 = re.sub(r'今天', now.strftime('%Y-%m-%d'), time_part)
-        elif '分钟前' in time_part:
-            minutes = int(re.search(r'\d+', time_part).group())
-            return int((now - timedelta(minutes=minutes)).timestamp())
-        elif '小时前' in time_part:
-            hours = int(re.search(r'\d+', time_part).group())
-            return int((now - timedelta(hours=hours)).timestamp())
-        else:
-            time_str2 = time_part
-
-        time_formats = [
-            (r'(\d{1,2})-(\d{1,2}) (\d{1,2}):(\d{2})', "%m-%d %H:%M"),
-            (r'(\d{4})-(\d{1,2})-(\d{1,2}) (\d{1,2}):(\d{2})', "%Y-%m-%d %H:%M"),
-            (r'(\d{1,2})-(\d{1,2})', "%m-%d"),
-        ]
-
-        for pattern, time_format in time_formats:
-            if re.match(pattern, time_str2):
-                dt = datetime.strptime(time_str2, time_format)
-                if dt.year == 1900:
-                    dt = dt.replace(year=current_year)
-                    if dt > now + timedelta(days=60):
-                        dt = dt.replace(year=current_year - 1)
-                return int(dt.timestamp())
-
-        return 0
-    except Exception as e:
-        logging.warning(f"时间解析失败: {clean_str} ({str(e)})")
-        return 0
 
-
-# ===================== 数据库管理 =====================
+# ===================== 工具函数 =====================
 
 class DatabaseManager:
-    def __init__(self):
-        # 按你的原配置初始化（如需可改为从 GUI 配）
-        self.connection = pymysql.connect(
-            host='111.229.182.88',
-            port=3306,
-            user='root',
-            password='s*xNvd%v@',
-            database='sukitime',
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor
-        )
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        # 连接池 + 数据库线程：运行中的写入和回查都在数据库线程执行，断线自动重连
+        self.logger = logger or logging.getLogger(__name__)
+        self.pool = ConnectionPool(logger=logger, **DB_CONFIG)
+        self.connection = self.pool.acquire()  # 采集线程：启动时读取品牌、加载索引和排期
+        self.service = DBService(self.pool, logger=logger)
+        # 已采集笔记ID的内存索引，替代逐条 SELECT 去重
+        self.note_index = NoteIndex('spider_log', logger=logger)
+        self.note_index.load(self.connection)
+        # 缓冲写入，按行数/时间阈值批量提交（在数据库线程）
+        self.writer = BufferedWriter(self.service.connection, SPIDER_LOG, logger=logger)
+        self.service.on_idle(self.writer.flush_due)
 
     def fetch_brand_urls(self) -> list:
         with self.connection.cursor() as cursor:
             sql = """
-                SELECT id, brand_name, rednote_url, rednote_spd_setting 
+                SELECT id, brand_name, rednote_url, rednote_spd_setting, spider_index, last_gather_time
                 FROM brand 
                 WHERE rednote_url != '' AND is_delete = 0 AND is_brand = 1
                 ORDER BY spider_index DESC, last_gather_time ASC
@@ -128,75 +76,68 @@ class DatabaseManager:
             return cursor.fetchall()
 
     def update_last_gather_time(self, brand_id: int):
-        with self.connection.cursor() as cursor:
+        # 品牌边界：入队即返回，数据库线程先提交缓冲中的笔记，全部提交后才更新采集时间
+        self.service.post(self._update_last_gather_time, brand_id, retry=True)
+
+    def _update_last_gather_time(self, brand_id: int):
+        if not self.writer.commit():
+            raise RuntimeError("缓冲中的记录未能提交，不更新采集时间")
+        with self.service.connection.cursor() as cursor:
             sql = "UPDATE brand SET last_gather_time = NOW() WHERE id = %s"
             cursor.execute(sql, (brand_id,))
-            self.connection.commit()
+            self.service.connection.commit()
 
     def is_url_exists(self, url: str) -> bool:
-        with self.connection.cursor() as cursor:
+        exists = self.note_index.lookup(url)
+        if exists is not None:
+            return exists
+        return self.service.call(self._url_exists, url, retry=True)
+
+    def _url_exists(self, url: str) -> bool:
+        with self.service.connection.cursor() as cursor:
             sql = "SELECT 1 FROM spider_log WHERE url = %s LIMIT 1"
             cursor.execute(sql, (url,))
             return bool(cursor.fetchone())
 
+    def count_collected(self, brand_id: int) -> int:
+        return self.service.call(self._count_collected, brand_id, retry=True)
+
+    def _count_collected(self, brand_id: int) -> int:
+        with self.service.connection.cursor() as cursor:
+            sql = "SELECT COUNT(*) AS count FROM spider_log WHERE brand_id = %s"
+            cursor.execute(sql, (brand_id,))
+            result = cursor.fetchone()
+            return result['count'] if result else 0
+
+    def existing_urls(self, urls) -> set:
+        """批量判断哪些 URL 已存在（先查内存索引，其余合并为一次 IN 查询）"""
+        existing, unknown = self.note_index.split_known(urls)
+        if unknown:
+            existing.update(self.service.call(query_existing_urls, self.service.connection, 'spider_log',
+                                              unknown, retry=True))
+        return existing
+
     def insert_one(self, data: Dict):
-        """单条插入优化"""
-        with self.connection.cursor() as cursor:
-            sql = """
-                INSERT INTO spider_log (
-                    msg_type, status, origin_type, title, 
-                    content, url, images, brand_id, 
-                    brand_name, auth_time, created_at, updated_at, likes
-                ) VALUES (
-                    %s, %s, %s, %s, 
-                    %s, %s, %s, %s, 
-                    %s, %s, %s, %s, %s
-                )
-            """
-            cursor.execute(sql, (
-                0, 0, 'xhs',
-                data['title'],
-                data['content'],
-                data['url'],
-                ','.join(data['images']),
-                data['brand_id'],
-                data['brand_name'],
-                data.get('auth_time', 0),
-                int(time.time()),
-                int(time.time()),
-                data.get('like_count', 0)  # 使用 like_count
-            ))
-            self.connection.commit()
+        """单条写入（入队即返回，数据库线程中进入缓冲区，达到阈值后批量提交）"""
+        self.note_index.add(data['url'])
+        self.service.post(self.writer.add, data)
 
     def batch_insert(self, data: list):
-        """批量插入优化"""
-        with self.connection.cursor() as cursor:
-            sql = """
-                INSERT INTO spider_log (
-                    msg_type, status, origin_type, title, 
-                    content, url, images, brand_id, 
-                    brand_name, created_at, updated_at
-                ) VALUES (
-                    %s, %s, %s, %s, 
-                    %s, %s, %s, %s, 
-                    %s, %s, %s
-                )
-            """
-            batch = []
-            for item in data:
-                batch.append((
-                    0, 0, 'xhs',
-                    item['title'],
-                    item['content'],
-                    item['url'],
-                    ','.join(item['images']),
-                    item['brand_id'],
-                    item['brand_name'],
-                    int(time.time()),
-                    int(time.time())
-                ))
-            cursor.executemany(sql, batch)
-            self.connection.commit()
+        """批量插入（写入全部字段，立即提交）"""
+        for item in data:
+            self.insert_one(item)
+        self.flush()
+
+    def flush(self) -> bool:
+        """等待队列中的写入完成并提交缓冲区，全部提交时返回 True"""
+        return self.service.call(self.writer.commit)
+
+    def close(self):
+        """执行完剩余的写入后停止数据库线程并关闭连接"""
+        self.service.close()
+        self.logger.info(self.service.summary())
+        self.pool.release(self.connection)
+        self.pool.close()
 
 
 # ===================== 爬虫核心 =====================
@@ -207,56 +148,103 @@ class XHSCrawler:
         url_checker: Optional[Callable] = None,
         insert_callback: Optional[Callable] = None,
         *,
-        # 运行中“动态读取”sleep 的函数
-        get_scroll_sleep: Optional[Callable[[], float]] = None,
-        get_detail_sleep: Optional[Callable[[], float]] = None,
+        # 批量去重：传入 URL 集合，返回其中已存在的部分
+        batch_url_checker: Optional[Callable] = None,
+        # 限速器（xhs_governor），为空时按 GOVERNOR_TIMEOUTS 自建
+        governor: Optional[Governor] = None,
+        # 等待已交给 insert_callback 的记录提交（如 DatabaseManager.flush），品牌断点只记已提交的笔记
+        flush_callback: Optional[Callable] = None,
         # sleep 进度回调(phase, elapsed, total)
         on_sleep: Optional[Callable[[str, float, float], None]] = None,
         max_scroll_default: int = 20,
+        detail_tabs: int = 1,
+        wait_floor: float = 0.5,
+        capture: bool = False,
+        known_stop: int = 10,
+        checkpoint: str = '',  # 断点文件路径（xhs_checkpoint），为空不记录品牌断点
         headless: bool = False,
-        logger: Optional[logging.Logger] = None
+        lean: bool = False,  # 精简模式：无头、拦截图片/视频/字体（xhs_lean），包含 headless
+        traffic: str = '',  # 流量统计文件，为空不统计
+        user_data_dir: str = '',  # 持久化用户目录（xhs_browser），保留登录状态和缓存
+        attach: str = '',  # 附着到已运行 Chrome 的调试地址，如 127.0.0.1:9222
+        logger: Optional[logging.Logger] = None,
+        driver=None  # 不为空时直接使用（如 xhs_fixture.FakeDriver 离线回放），不启动浏览器
     ):
         self.url_checker = url_checker
+        self.batch_url_checker = batch_url_checker
         self.insert_callback = insert_callback
-        self.get_scroll_sleep = get_scroll_sleep or (lambda: 10.5)
-        self.get_detail_sleep = get_detail_sleep or (lambda: 5.0)
         self.on_sleep = on_sleep
         self.max_scroll_default = int(max_scroll_default)
+        self.detail_tabs = max(1, int(detail_tabs))  # 同时在途的详情标签页数
+        self.tab_open_interval = 1.0  # 多标签模式下相邻标签的打开间隔（秒）
+        # 就绪等待：条件满足即返回，限速器给出的滚动/详情等待作为超时上限
+        self.metrics = Metrics('gui', logger)  # 各阶段耗时（按品牌/整次运行汇总）
+        self.metrics.startup = startup_mode(user_data_dir, attach)
+        self.reuse_session = bool(user_data_dir or attach)
+        self.waiter = ReadyWaiter(floor=wait_floor, metrics=self.metrics)
+        self.known_stop = known_stop  # 滚动中连续遇到多少条已采集笔记即停止，0 为不提前停止
         self.logger = logger or logging.getLogger(__name__)
+        # 限速器：主页/详情的请求节奏和就绪等待上限，按成功/超时自动调整
+        self.governor = governor or Governor(logger=self.logger, **GOVERNOR_TIMEOUTS)
+        self.checkpoint = checkpoint
+        self.flush_callback = flush_callback
+        self.progress = None  # 当前品牌的断点（全量采集时）
 
         self.stop_requested = False
 
-        options = webdriver.ChromeOptions()
-        if headless:
-            options.add_argument("--headless=new")
-        options.add_experimental_option("excludeSwitches", ['enable-automation'])
-        options.add_argument("--disable-blink-features=AutomationControlled")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-
-        self.logger.info("准备初始化浏览器")
-        self.driver: Chrome = webdriver.Chrome(options=options)
-
-        # 尝试注入 stealth
-        stealth_path = './stealth.min.js'
-        if os.path.exists(stealth_path):
-            self.logger.info("加载 stealth.min.js")
-            try:
-                with open(stealth_path, 'r', encoding='utf-8') as f:
-                    stealth_script = f.read()
-                self.driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': stealth_script})
-                self.logger.info("已注入 stealth 脚本")
-            except Exception as e:
-                self.logger.warning(f"stealth 注入失败：{e}")
-        else:
-            self.logger.warning("未找到 stealth.min.js，跳过注入")
-
-        self.logger.info("浏览器运行成功")
+        if driver is None:
+            if attach:
+                # 附着时启动参数不生效（无头/精简模式参数由启动 Chrome 的命令决定）
+                options = attach_options(attach)
+            else:
+                options = webdriver.ChromeOptions()
+                if lean:
+                    apply_lean_options(options)
+                elif headless:
+                    options.add_argument("--headless=new")
+                if user_data_dir:
+                    use_profile(options, user_data_dir)
+                options.add_experimental_option("excludeSwitches", ['enable-automation'])
+                options.add_argument("--disable-blink-features=AutomationControlled")
+                options.add_argument("--no-sandbox")
+                options.add_argument("--disable-dev-shm-usage")
+            if capture or traffic:
+                enable_capture(options)
+
+            with self.metrics.span('browser_start'):
+                self.logger.info(f"附着到已运行的浏览器 {attach}" if attach else "准备初始化浏览器")
+                driver = webdriver.Chrome(options=options)
+
+                # 尝试注入 stealth
+                if os.path.exists(STEALTH_PATH):
+                    self.logger.info("加载 stealth.min.js")
+                    try:
+                        driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': load_stealth()})
+                        self.logger.info("已注入 stealth 脚本")
+                    except Exception as e:
+                        self.logger.warning(f"stealth 注入失败：{e}")
+                else:
+                    self.logger.warning("未找到 stealth.min.js，跳过注入")
+
+            self.logger.info("浏览器运行成功")
+        self.driver: Chrome = driver
+        # 可选：从笔记列表/详情接口的响应中直接解析数据，取不到时仍走 DOM 提取
+        self.capture = NetworkCapture(self.driver, logger=self.logger) if capture else None
+        self.lean = LeanMode(self.driver, logger=self.logger) if lean else None
+        if self.lean:
+            self.lean.cover()
+        self.traffic = TrafficMeter(self.driver, traffic, lean, capture=self.capture, logger=self.logger) if traffic else None
+        # 登录会话：启动时按存储判断是否注入 Cookie，采集中在品牌间隙续存
+        self.sessions = SessionStore(logger=self.logger)
+        self.keeper = SessionKeeper(self.sessions, SESSION_ACCOUNT, logged_in=lambda d: bool(d.find_elements(*SIDEBAR)),
+                                    logger=self.logger)
 
         self.seen_links = set()
         self.notes_data = []
         self.main_window = None
-        self.all_links = set()
+        # 以下按 12 字节笔记ID（note_key）为键，同一笔记换 xsec_token 出现时不会重复计入
+        self.all_links = {}  # 笔记ID -> 打开详情用的链接（已采集的笔记不保留链接）
+        self.existing_links = set()  # 批量去重判定为已存在的笔记ID
         self.collected_quick_data = []  # 快速模式数据缓存
 
     # ---------- 停止控制 ----------
@@ -268,81 +256,124 @@ class XHSCrawler:
             raise KeyboardInterrupt("收到停止信号")
 
     # ---------- 登录 ----------
+    @timed('login')
     def login(self):
+        # 附着的浏览器已停在登录后的页面：直接沿用
+        if self.reuse_session and session_logged_in(self.driver, self.logger):
+            self.main_window = self.driver.current_window_handle
+            self.logger.info("沿用已登录的浏览器会话，跳过登录")
+            return
         self.driver.get('https://www.xiaohongshu.com/explore')
         self.main_window = self.driver.current_window_handle
+        # 用户目录中已有登录状态时不再加载 Cookie 和刷新
+        if self.reuse_session:
+            try:
+                WebDriverWait(self.driver, 5).until(EC.presence_of_element_located(SIDEBAR))
+                self.logger.info("用户目录中已是登录状态")
+                return
+            except Exception:
+                pass
 
-        if os.path.exists("xhs_cookie.pkl"):
+        # 会话存储中的 Cookie 已过期/失效时不再注入和等待，直接手动登录
+        status = self.sessions.status(SESSION_ACCOUNT)
+        if status in USABLE:
             try:
-                cookies = pickle.load(open("xhs_cookie.pkl", "rb"))
-                for cookie in cookies:
+                for cookie in self.sessions.cookies(SESSION_ACCOUNT):
                     self.driver.add_cookie(cookie)
                 self.driver.refresh()
                 WebDriverWait(self.driver, 15).until(
                     EC.presence_of_element_located((By.CLASS_NAME, 'user.side-bar-component'))
                 )
+                self.sessions.save(SESSION_ACCOUNT, self.driver.get_cookies())
                 self.logger.info("Cookie 登录成功")
                 return
             except Exception as e:
                 self.logger.warning(f"Cookie加载失败: {e}")
+                self.sessions.invalidate(SESSION_ACCOUNT)
+        else:
+            self.logger.info(f"会话不可用（{status}），跳过 Cookie 登录")
 
         self.logger.info("等待手动登录（120s 超时）")
         WebDriverWait(self.driver, 120).until(
             EC.presence_of_element_located((By.CLASS_NAME, 'user.side-bar-component'))
         )
-        pickle.dump(self.driver.get_cookies(), open("xhs_cookie.pkl", "wb"))
+        self.sessions.save(SESSION_ACCOUNT, self.driver.get_cookies())
         self.logger.info('登录成功并已保存 Cookie')
 
     # ---------- 列表页提取 ----------
-    def extract_current_links(self):
-        current_links = set()
+    def extract_current_links(self, cards=None):
+        """提取当前页面的所有链接（单次 execute_script 批量提取），按页面顺序返回 {笔记ID: 链接}"""
+        current_links = {}
         try:
-            items = self.driver.find_elements(By.CSS_SELECTOR, '.note-item')
-            for item in items:
-                try:
-                    link_element = item.find_element(
-                        By.CSS_SELECTOR, 'a.cover.mask.ld[href^="/user/profile/"]'
-                    )
-                    raw_url = link_element.get_attribute('href')
-                    clean_url = raw_url.replace('&amp;', '&')
-                    current_links.add(clean_url)
-                except Exception:
-                    continue
+            if cards is None:
+                cards = fetch_note_cards(self.driver)
+            for card in cards:
+                key = note_key(card['href']) if card['profile_link'] else b''
+                if key:
+                    current_links.setdefault(key, card['href'])
         except Exception as e:
-            self.logger.warning(f"提取链接异常: {e}")
+            self.logger.warning(f"提取链接时遇到异常: {e}")
         return current_links
 
     # ---------- 智能滚动 ----------
+    @timed('scroll')
     def smart_scroll(self, spd_setting=1, max_scroll=None):
         total_scroll = 0
         no_new_count = 0
         max_no_new = 6
         last_height = 0
         max_scroll = self.max_scroll_default if max_scroll is None else int(max_scroll)
+        known_run = KnownRun(self.known_stop)
+        start_ts = time.time()
 
-        self.logger.info(f"智能滚动设置: 最大滚动次数={max_scroll}（滚动等待将实时读取 GUI 配置）")
+        self.logger.info(f"智能滚动设置: 最大滚动次数={max_scroll}（请求节奏与最长等待由限速器调整）")
 
         while no_new_count < max_no_new and total_scroll < max_scroll:
             self.check_stop()
+            if self.capture:
+                self.capture.poll()  # 收集上一次滚动加载的笔记列表接口响应
 
-            current_links = self.extract_current_links()
-            converted_new_links = {
-                convert_xhs_url(link).split('?')[0]
-                for link in (current_links - self.all_links)
-            }
-            new_links = converted_new_links - self.all_links
-
-            if spd_setting == 2 and new_links:
-                self.process_quick_data(new_links)
-
-            self.all_links.update(current_links)
-            self.logger.info(f"当前总链接数：{len(self.all_links)} 新增：{len(new_links)}")
-
+            try:
+                cards = fetch_note_cards(self.driver)
+            except Exception as e:
+                self.logger.warning(f"提取链接时遇到异常: {e}")
+                cards = []
+            current_links = self.extract_current_links(cards)
+            new_keys = [key for key in current_links if key not in self.all_links]
+
+            # 本次滚动的新笔记一次性批量去重
+            existing = {note_key(url) for url in self.check_existing(explore_url(key) for key in new_keys)}
+            self.existing_links.update(existing)
+            # 已采集的笔记只记ID，不保留链接
+            for key in new_keys:
+                self.all_links[key] = '' if key in existing else current_links[key]
+            if self.progress:
+                self.progress.save_links(self.all_links, self.existing_links)
+
+            # 快速模式即时处理（复用本次滚动已提取的卡片）
+            fresh = {key for key in new_keys if key not in existing}
+            if spd_setting == 2 and fresh:
+                self.process_quick_data(fresh, cards)
+
+            self.logger.info(f"当前总链接数：{len(self.all_links)} 新增：{len(new_keys)}")
+
+            # 主页按时间倒序：连续 known_stop 条已采集笔记之后不会再有新笔记，提前结束滚动
+            if known_run.update(key in existing for key in new_keys):
+                saved = max_scroll - total_scroll
+                per_scroll = (time.time() - start_ts) / total_scroll if total_scroll else self.governor.timeout(PAGE)
+                self.logger.info(f"连续 {known_run.run} 条已采集笔记，提前停止滚动：已滚动 {total_scroll} 次，"
+                                 f"节省 {saved} 次滚动 / 约 {saved * per_scroll:.0f}s")
+                break
+
+            # —— 滚动等待（读条）：新卡片出现且高度稳定即返回，限速器给出最长等待 ——
+            self.governor.acquire(PAGE, on_tick=self._wait_tick("pace"))
+            feed_loaded = FeedLoaded(self.driver)
             self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-
-            # —— 滚动等待（读条）——
-            scroll_sleep = max(0.0, float(self.get_scroll_sleep()))
-            self._sleep_with_progress("scroll", scroll_sleep)
+            if self.waiter.wait("scroll", feed_loaded, self.governor.timeout(PAGE), on_tick=self._wait_tick("scroll")):
+                self.governor.success(PAGE)
+            elif not self.all_links:
+                # 到底后的超时是正常的；一条笔记都没有加载出来才算被限流/空页面
+                self.governor.failure(PAGE, "主页没有加载出笔记")
 
             new_height = self.driver.execute_script("return document.body.scrollHeight")
             if new_height == last_height:
@@ -354,164 +385,195 @@ class XHSCrawler:
             total_scroll += 1
 
     # ---------- 处理单个笔记 ----------
+    @timed('detail')
     def process_single_note(self, origin_note_url: str):
         note_url = convert_xhs_url(origin_note_url)
         self.logger.info(f"打开URL: {origin_note_url} -> {note_url}")
-        img_urls = []
 
+        new_window = None  # 尚未打开详情页时（如限速等待中收到停止）不关闭主窗口
         try:
             self.driver.switch_to.window(self.main_window)
+            self.governor.acquire(DETAIL, on_tick=self._wait_tick("pace"))
             self.driver.execute_script(f"window.open('{note_url}');")
             new_window = [w for w in self.driver.window_handles if w != self.main_window][0]
             self.driver.switch_to.window(new_window)
+            if self.lean:
+                self.lean.cover()
 
             WebDriverWait(self.driver, 15).until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, ".note-container"))
             )
 
-            # —— 详情等待（读条）——
-            detail_sleep = max(0.0, float(self.get_detail_sleep()))
-            self._sleep_with_progress("detail", detail_sleep)
+            # —— 详情等待（读条）：字段渲染完成即返回，限速器给出最长等待 ——
+            ready = self.waiter.wait("detail", DetailReady(self.driver), self.governor.timeout(DETAIL),
+                                     on_tick=self._wait_tick("detail"))
+            self.governor.report(DETAIL, ready, "详情页未就绪")
 
-            try:
-                time_element = self.driver.find_element(By.CSS_SELECTOR, '.bottom-container .date')
-                raw_time = time_element.text.strip()
-                auth_time = parse_xhs_time(raw_time)
-            except Exception as te:
-                self.logger.warning(f"时间提取失败: {te}")
-                auth_time = 0
-
-            # 点赞
-            try:
-                like_count = 0
-                like_element = self.driver.find_element(
-                    By.CSS_SELECTOR,
-                    '.interact-container .like-active .count'
-                )
-                like_text = like_element.text.strip()
-                if '万' in like_text:
-                    like_count = int(float(like_text.replace('万', '')) * 10000)
-                elif 'k' in like_text.lower():
-                    like_count = int(float(like_text.lower().replace('k', '')) * 1000)
-                else:
-                    like_count = int(like_text) if like_text.isdigit() else 0
-            except Exception as le:
-                self.logger.warning(f"点赞数提取失败: {le}")
-                like_count = 0
-
-            # 视频封面 or 图文图片
-            try:
-                video_element = self.driver.find_element(By.CSS_SELECTOR, '.player-container')
-                if video_element:
-                    try:
-                        poster = self.driver.find_element(By.CSS_SELECTOR, 'xg-poster.xgplayer-poster')
-                        style = poster.get_attribute('style')
-                        cover_url = style.split('url("')[1].split('")')[0].replace('&quot;', '')
-                        img_urls = [cover_url]
-                    except Exception as ve2:
-                        self.logger.warning(f"视频封面提取失败: {ve2}")
-            except Exception:
-                # 图文
-                try:
-                    swiper = self.driver.find_element(By.CLASS_NAME, 'swiper-wrapper')
-                    for img in swiper.find_elements(By.TAG_NAME, 'img'):
-                        src = img.get_attribute('src')
-                        if src and src.startswith('http') and src not in img_urls:
-                            img_urls.append(src)
-                except Exception as ie:
-                    self.logger.warning(f"图片提取失败: {ie}")
-
-            # 内容
-            content = ''
-            try:
-                text_element = self.driver.find_element(By.CSS_SELECTOR, '.note-content .desc')
-                content = text_element.text.replace('\n', ' ').strip()[:2000]
-            except Exception as te:
-                self.logger.warning(f"内容提取失败: {te}")
-
-            # 标题
-            title = ''
-            try:
-                title_element = self.driver.find_element(By.ID, 'detail-title')
-                title = title_element.text.strip()
-            except Exception as titile_e:
-                self.logger.warning(f"标题提取失败: {titile_e}")
-
-            baseUrl = note_url.split('?')[0]
-            return {
-                'images': img_urls,
-                'content': content,
-                'url': baseUrl,
-                'title': title,
-                'auth_time': auth_time,
-                'like_count': like_count,
-            }
+            return self._scrape_note(note_url)
 
         except Exception as e:
             self.logger.error(f"笔记处理失败 {note_url}: {e}", exc_info=True)
+            self.governor.failure(DETAIL, "详情页打开失败")
             return None
         finally:
             try:
-                self.driver.close()
+                if new_window:
+                    self.driver.close()
                 self.driver.switch_to.window(self.main_window)
             except Exception as close_e:
                 self.logger.warning(f"窗口关闭异常: {close_e}")
 
-    # ---------- 快速模式 ----------
-    def process_quick_data(self, new_links):
-        current_items = self.driver.find_elements(By.CSS_SELECTOR, '.note-item')
-        for item in current_items:
+    # ---------- 多标签并发处理 ----------
+    @timed('detail_batch')
+    def process_notes_batch(self, origin_note_urls: list) -> list:
+        """一批笔记一起打开、并行加载，再逐个切换提取；每页最多等待限速器给出的详情等待（从各自打开时刻算起）"""
+        detail_sleep = self.governor.timeout(DETAIL)
+        tabs = []
+        self.driver.switch_to.window(self.main_window)
+        try:
+            for origin_note_url in origin_note_urls:
+                self.check_stop()
+                note_url = convert_xhs_url(origin_note_url)
+                self.logger.info(f"打开URL: {origin_note_url} -> {note_url}")
+                self.governor.acquire(DETAIL, on_tick=self._wait_tick("pace"))
+                try:
+                    before = set(self.driver.window_handles)
+                    self.driver.execute_script("window.open(arguments[0]);", note_url)
+                    handle = (set(self.driver.window_handles) - before).pop()
+                    tabs.append((note_url, handle, time.time()))
+                except Exception as e:
+                    self.logger.error(f"打开标签页失败 {note_url}: {e}")
+                    tabs.append((note_url, None, 0))
+                time.sleep(self.tab_open_interval)
+
+            results = []
+            for note_url, handle, opened_at in tabs:
+                if handle is None:
+                    results.append(None)
+                    continue
+                try:
+                    self.driver.switch_to.window(handle)
+                    if self.lean:
+                        self.lean.cover()
+                    WebDriverWait(self.driver, 15).until(
+                        EC.presence_of_element_located((By.CSS_SELECTOR, ".note-container"))
+                    )
+                    ready = self.waiter.wait("detail", DetailReady(self.driver), opened_at + detail_sleep - time.time(),
+                                             floor=0, on_tick=self._wait_tick("detail"))
+                    self.governor.report(DETAIL, ready, "详情页未就绪")
+                    results.append(self._scrape_note(note_url))
+                except Exception as e:
+                    self.logger.error(f"笔记处理失败 {note_url}: {e}", exc_info=True)
+                    self.governor.failure(DETAIL, "详情页打开失败")
+                    results.append(None)
+            return results
+        finally:
+            # 包括收到停止信号时，关闭本批打开的全部标签页
+            for _, handle, _ in tabs:
+                if handle is None:
+                    continue
+                try:
+                    self.driver.switch_to.window(handle)
+                    self.driver.close()
+                except Exception:
+                    pass
             try:
-                link = item.find_element(By.CSS_SELECTOR, 'a.cover.mask.ld').get_attribute('href')
-                clean_url = convert_xhs_url(link).split('?')[0]
+                self.driver.switch_to.window(self.main_window)
+            except Exception as close_e:
+                self.logger.warning(f"窗口关闭异常: {close_e}")
 
-                if self.url_checker and self.url_checker(clean_url):
-                    self.logger.info(f"已存在，跳过快速采集: {clean_url}")
-                    continue
+    @timed('extract')
+    def _scrape_note(self, note_url: str) -> Dict:
+        """从当前标签页提取笔记详情（一次往返取回快照，字段解析在本地完成）"""
+        if self.capture:
+            record = self.capture.note_record(note_url)
+            if record:
+                return record
+        snapshot = fetch_note_snapshot(self.driver)
+        fields, missing = build_note_fields(snapshot, parse_xhs_time)
+        for name in missing:
+            self.logger.warning(f"{name}提取失败: 页面中未找到对应元素")
+
+        baseUrl = note_url.split('?')[0]
+        return {
+            'images': fields['images'],
+            'content': fields['content'],
+            'url': baseUrl,
+            'title': fields['title'],
+            'auth_time': fields['auth_time'],
+            'like_count': fields['like_count'],
+        }
 
-                if clean_url not in new_links:
+    # ---------- 快速模式 ----------
+    def process_quick_data(self, new_keys: set, cards=None):
+        """处理快速采集数据（复用本次滚动已提取的卡片，new_keys 为已完成去重的笔记ID，处理过的会从中移除）"""
+        if cards is None:
+            cards = fetch_note_cards(self.driver)
+        for card in cards:
+            try:
+                key = note_key(card['href'])
+                if key not in new_keys:
                     continue
+                new_keys.discard(key)  # 同一笔记的多张卡片只处理一次
+                clean_url = explore_url(key)
 
                 # 首图
-                try:
-                    img = item.find_element(By.CSS_SELECTOR, 'img[src*="xhscdn.com"]')
-                    cover_url = img.get_attribute('src').split('?')[0]
-                except Exception as e:
-                    self.logger.warning(f"首图提取失败: {e}")
-                    cover_url = ""
+                cover_url = card['cover'].split('?')[0]
+                if not cover_url:
+                    self.logger.warning(f"首图提取失败: {clean_url}")
 
                 # 标题
-                try:
-                    title = item.find_element(By.CSS_SELECTOR, '.title > span').text[:600]
-                except Exception as e:
+                if card['title'] is None:
                     title = "无标题"
-                    self.logger.warning(f"标题提取失败: {e}")
+                    self.logger.warning(f"标题提取失败: {clean_url}")
+                else:
+                    title = card['title'][:600]
 
-                self.collected_quick_data.append({
+                quick_data = {
                     'url': clean_url,
                     'images': [cover_url] if cover_url else [],
                     'title': title,
                     'content': ''
-                })
+                }
+                # 列表接口里有完整标题和准确点赞数时优先使用
+                feed = self.capture.feed_note(card['note_id']) if self.capture else None
+                if feed:
+                    quick_data['title'] = feed['title'][:600] or title
+                    if feed['cover'] and not cover_url:
+                        quick_data['images'] = [feed['cover']]
+                    quick_data['like_count'] = feed['like_count']
+                self.collected_quick_data.append(quick_data)
             except Exception as e:
                 self.logger.error(f"快速采集异常: {e}")
 
+    # ---------- 批量去重 ----------
+    @timed('dedup')
+    def check_existing(self, urls) -> set:
+        """批量去重：优先一次批量查询，未提供批量接口时退回逐条检查"""
+        urls = set(urls)
+        if not urls:
+            return set()
+        if self.batch_url_checker:
+            return set(self.batch_url_checker(urls))
+        if self.url_checker:
+            return {url for url in urls if self.url_checker(url)}
+        return set()
+
     # ---------- 采集作者 ----------
     def get_collected_count(self, brand_id: int) -> int:
         if self.url_checker and hasattr(self.url_checker, '__self__'):
             db = self.url_checker.__self__
             try:
-                with db.connection.cursor() as cursor:
-                    sql = "SELECT COUNT(*) AS count FROM spider_log WHERE brand_id = %s"
-                    cursor.execute(sql, (brand_id,))
-                    result = cursor.fetchone()
-                    return result['count'] if result else 0
+                return db.count_collected(brand_id)
             except Exception as e:
                 self.logger.error(f"查询已采集数量失败: {e}")
                 return 0
         return 0
 
     def crawl_author(self, brand: Dict):
+        self.metrics.begin_brand(brand['brand_name'])
+        if self.traffic:
+            self.traffic.begin_brand()
         try:
             self.check_stop()
             spd_setting = brand.get('rednote_spd_setting', 1)
@@ -524,34 +586,65 @@ class XHSCrawler:
             collected_count = self.get_collected_count(brand['id'])
             self.logger.info(f"品牌[{brand['brand_name']}] 已采集数量: {collected_count}")
 
-            max_scroll = 1 if (spd_setting == 1 and collected_count > 20) else self.max_scroll_default
-
-            self.driver.get(brand['rednote_url'])
-            self.smart_scroll(spd_setting, max_scroll)
+            # 开启提前停止时由滚动中遇到的已采集笔记决定停在哪里；否则沿用已采集>20 则只滚动一次
+            if self.known_stop > 0:
+                max_scroll = self.max_scroll_default
+            else:
+                max_scroll = 1 if (spd_setting == 1 and collected_count > 20) else self.max_scroll_default
+
+            # 全量采集记录品牌断点；上次中断时恢复已收集的链接，滚动已完成则直接处理剩余笔记
+            if self.checkpoint and spd_setting == 1:
+                self.progress = BrandProgress(self.checkpoint, brand['id'], self.logger, commit=self.flush_callback)
+                if self.progress.load():
+                    self.all_links.update(self.progress.links)
+                    self.existing_links.update(self.progress.existing)
+                    # 上次中断前已提交、但还没记入断点的笔记：按数据库再判定一次，不重复写入
+                    unsettled = [key for key in self.progress.links
+                                 if key not in self.progress.existing and key not in self.progress.processed]
+                    self.existing_links.update(note_key(url) for url in
+                                               self.check_existing(explore_url(key) for key in unsettled))
+                    self.logger.info(f"品牌[{brand['brand_name']}]从断点继续：已收集链接 {len(self.progress.links)}，"
+                                     f"已处理 {len(self.progress.processed)}，滚动{'已' if self.progress.scrolled else '未'}完成")
+
+            if not (self.progress and self.progress.scrolled):
+                self.governor.acquire(PAGE, on_tick=self._wait_tick("pace"))
+                with self.metrics.span('page_load'):
+                    self.driver.get(brand['rednote_url'])
+                self.smart_scroll(spd_setting, max_scroll)
+                if self.progress:
+                    self.progress.save_links(self.all_links, self.existing_links, scrolled=True)
 
             # 全量
             if spd_setting == 1:
-                for note_url in self.all_links.copy():
-                    self.check_stop()
-                    base_url = convert_xhs_url(note_url).split('?')[0]
-                    if self.url_checker and self.url_checker(base_url):
-                        self.logger.info(f"已处理过，跳过: {base_url}")
+                pending = []
+                for key, note_url in self.all_links.items():
+                    if key in self.existing_links or (self.progress and key in self.progress.processed):
+                        self.logger.info(f"已处理过，跳过: {explore_url(key)}")
                         continue
+                    pending.append(note_url)
 
-                    detail = self.process_single_note(note_url)
-
-                    # 详情页之间的等待（读条）
-                    detail_sleep = max(0.0, float(self.get_detail_sleep()))
-                    self._sleep_with_progress("detail", detail_sleep)
-
-                    if detail:
+                # 每批最多 detail_tabs 个标签页同时加载
+                for start in range(0, len(pending), self.detail_tabs):
+                    self.check_stop()
+                    batch = pending[start:start + self.detail_tabs]
+                    if len(batch) == 1:
+                        details = [self.process_single_note(batch[0])]
+                    else:
+                        details = self.process_notes_batch(batch)
+
+                    for detail in details:
+                        if not detail:
+                            continue
                         detail.update({
                             'brand_id': brand['id'],
                             'brand_name': brand['brand_name']
                         })
                         if self.insert_callback:
                             try:
-                                self.insert_callback(detail)
+                                with self.metrics.span('insert'):
+                                    self.insert_callback(detail)
+                                if self.progress:
+                                    self.progress.note_written(note_key(detail['url']))
                             except Exception as e:
                                 self.logger.error(f"数据库插入失败: {e}")
 
@@ -567,13 +660,15 @@ class XHSCrawler:
                     })
                     if self.insert_callback:
                         try:
-                            self.insert_callback(quick_data)
+                            with self.metrics.span('insert'):
+                                self.insert_callback(quick_data)
                         except Exception as e:
                             self.logger.error(f"数据库插入失败: {e}")
                 self.logger.info(f"快速采集数据入库成功: {len(self.collected_quick_data)} 条")
 
-            self.all_links.clear()
-            self.collected_quick_data.clear()
+            # 缓冲中的笔记提交后才删除品牌断点
+            if self.progress and self.progress.commit_written():
+                self.progress.clear()
             return True
         except KeyboardInterrupt:
             self.logger.info("收到停止信号，已终止当前作者采集")
@@ -581,45 +676,34 @@ class XHSCrawler:
         except Exception as e:
             self.logger.error(f"作者采集失败 {brand.get('rednote_url')}: {e}")
             return False
-
-    # ---------- 内部：带进度的 sleep ----------
-    def _sleep_with_progress(self, phase: str, total: float):
-        """phase: 'scroll' / 'detail'"""
-        total = max(0.0, float(total))
-        # 先推一次 0%（立即可见）
-        if self.on_sleep:
-            try:
-                self.on_sleep(phase, 0.0, total)
-            except Exception:
-                pass
-
-        if total == 0:
-            # 0 秒等待也推满格，方便 UI 刷新
-            if self.on_sleep:
-                try:
-                    self.on_sleep(phase, total, total)
-                except Exception:
-                    pass
-            return
-
-        elapsed = 0.0
-        step = 0.2  # UI 更新粒度
-        while elapsed < total:
+        finally:
+            # 成功、跳过、停止或失败都清掉本品牌的链接和去重缓存（断点已另存在文件中）
+            self.reset_brand()
+            self.progress = None
+            if self.traffic:
+                self.traffic.end_brand(self.metrics)
+            self.metrics.end_brand()
+            self.keeper.tick(self.driver)
+
+    def reset_brand(self):
+        """清理单个品牌的采集缓存"""
+        self.all_links.clear()
+        self.existing_links.clear()
+        self.seen_links.clear()
+        self.collected_quick_data.clear()
+        if self.capture:
+            self.capture.reset()
+
+    # ---------- 内部：就绪等待的进度回调 ----------
+    def _wait_tick(self, phase: str):
+        def tick(elapsed: float, total: float):
             self.check_stop()
-            time.sleep(min(step, total - elapsed))
-            elapsed = min(total, elapsed + step)
             if self.on_sleep:
                 try:
                     self.on_sleep(phase, elapsed, total)
                 except Exception:
                     pass
-
-        # 结束时再回调一次满格
-        if self.on_sleep:
-            try:
-                self.on_sleep(phase, total, total)
-            except Exception:
-                pass
+        return tick
 
 
 # ===================== GUI & 主流程 =====================
@@ -654,15 +738,10 @@ class App:
         frm = ttk.LabelFrame(master, text="采集参数（可运行中随时修改）")
         frm.pack(fill="x", padx=10, pady=10)
 
-        # 滚动等待
-        ttk.Label(frm, text="滚动等待(秒)：").grid(row=0, column=0, padx=6, pady=6, sticky='e')
-        self.var_scroll_sleep = tk.StringVar(value="10.5")
-        ttk.Entry(frm, textvariable=self.var_scroll_sleep, width=10).grid(row=0, column=1, padx=6, pady=6, sticky='w')
-
-        # 详情等待
-        ttk.Label(frm, text="详情等待(秒)：").grid(row=0, column=2, padx=6, pady=6, sticky='e')
-        self.var_detail_sleep = tk.StringVar(value="5.0")
-        ttk.Entry(frm, textvariable=self.var_detail_sleep, width=10).grid(row=0, column=3, padx=6, pady=6, sticky='w')
+        # 当前速率（限速器按成功/超时自动调整，每秒刷新）
+        ttk.Label(frm, text="当前速率：").grid(row=0, column=0, padx=6, pady=6, sticky='e')
+        self.var_rate = tk.StringVar(value="未运行")
+        ttk.Label(frm, textvariable=self.var_rate).grid(row=0, column=1, columnspan=3, padx=6, pady=6, sticky='w')
 
         # 最大滚动（运行中改会在下一位作者生效）
         ttk.Label(frm, text="最大滚动次数：").grid(row=0, column=4, padx=6, pady=6, sticky='e')
@@ -673,6 +752,44 @@ class App:
         self.var_headless = tk.BooleanVar(value=False)
         ttk.Checkbutton(frm, text="无头模式(Headless)", variable=self.var_headless).grid(row=0, column=6, padx=6, pady=6)
 
+        # 精简模式：无头 + 拦截图片/视频/字体（启动时生效，需已保存 Cookie）
+        self.var_lean = tk.BooleanVar(value=False)
+        ttk.Checkbutton(frm, text="精简模式(无头+拦截图片)", variable=self.var_lean).grid(row=1, column=6, padx=6, pady=6, sticky='w')
+
+        # 详情并发标签数（运行中改会在下一位作者生效）
+        ttk.Label(frm, text="详情标签数：").grid(row=1, column=0, padx=6, pady=6, sticky='e')
+        self.var_detail_tabs = tk.StringVar(value="1")
+        ttk.Entry(frm, textvariable=self.var_detail_tabs, width=10).grid(row=1, column=1, padx=6, pady=6, sticky='w')
+
+        # 就绪等待的最短等待（运行中改会在下一位作者生效）
+        ttk.Label(frm, text="最短等待(秒)：").grid(row=1, column=2, padx=6, pady=6, sticky='e')
+        self.var_wait_floor = tk.StringVar(value="0.5")
+        ttk.Entry(frm, textvariable=self.var_wait_floor, width=10).grid(row=1, column=3, padx=6, pady=6, sticky='w')
+
+        # 连续已采集即停止滚动（运行中改会在下一位作者生效）
+        ttk.Label(frm, text="已采集即停(条)：").grid(row=2, column=0, padx=6, pady=6, sticky='e')
+        self.var_known_stop = tk.StringVar(value="10")
+        ttk.Entry(frm, textvariable=self.var_known_stop, width=10).grid(row=2, column=1, padx=6, pady=6, sticky='w')
+
+        # 按发帖频率排期（启动时生效）
+        self.var_schedule = tk.BooleanVar(value=True)
+        ttk.Checkbutton(frm, text="按发帖频率排期", variable=self.var_schedule).grid(row=2, column=2, columnspan=2, padx=6, pady=6, sticky='w')
+
+        # 从上次中断/停止的位置继续（启动时生效）
+        self.var_resume = tk.BooleanVar(value=False)
+        ttk.Checkbutton(frm, text="断点续采", variable=self.var_resume).grid(row=2, column=4, columnspan=2, padx=6, pady=6, sticky='w')
+
+        # 接口抓取（启动时生效）
+        self.var_capture = tk.BooleanVar(value=False)
+        ttk.Checkbutton(frm, text="接口数据优先(CDP)", variable=self.var_capture).grid(row=1, column=4, columnspan=2, padx=6, pady=6, sticky='w')
+
+        # 复用浏览器（启动时生效）：持久化用户目录保留登录状态；附着地址不为空时连接已运行的调试端口 Chrome
+        self.var_profile = tk.BooleanVar(value=False)
+        ttk.Checkbutton(frm, text="保留浏览器登录(用户目录)", variable=self.var_profile).grid(row=2, column=6, padx=6, pady=6, sticky='w')
+        ttk.Label(frm, text="附着调试地址：").grid(row=3, column=0, padx=6, pady=6, sticky='e')
+        self.var_attach = tk.StringVar(value="")
+        ttk.Entry(frm, textvariable=self.var_attach, width=18).grid(row=3, column=1, columnspan=2, padx=6, pady=6, sticky='w')
+
         # ===== 控制/状态区 =====
         ctrl = ttk.Frame(master)
         ctrl.pack(fill='x', padx=10)
@@ -741,26 +858,13 @@ class App:
 
         self.master.protocol("WM_DELETE_WINDOW", self.on_close)
 
-    # ====== 提供给爬虫的“动态读取”函数 ======
-    def get_scroll_sleep(self) -> float:
-        try:
-            return max(0.0, float(self.var_scroll_sleep.get()))
-        except Exception:
-            return 10.5
-
-    def get_detail_sleep(self) -> float:
-        try:
-            return max(0.0, float(self.var_detail_sleep.get()))
-        except Exception:
-            return 5.0
-
     # ====== 给爬虫的 sleep 回调（线程安全） ======
     def on_sleep(self, phase: str, elapsed: float, total: float):
         def _update():
             total_ = max(0.0, total)
             elapsed_ = min(max(0.0, elapsed), total_)
             percent = 0 if total_ == 0 else (elapsed_ / total_) * 100.0
-            phase_cn = "滚动等待" if phase == "scroll" else "详情等待"
+            phase_cn = {"scroll": "滚动等待", "detail": "详情等待", "pace": "限速等待"}.get(phase, phase)
             self.var_sleep_text.set(f"{phase_cn}：{elapsed_:.1f}s / {total_:.1f}s")
             self.sleep_bar['value'] = percent
             # 完成后 1 秒自动清空
@@ -783,6 +887,8 @@ class App:
             mm = (elapsed % 3600) // 60
             ss = elapsed % 60
             self.var_duration.set(f"已用时：{hh:02d}:{mm:02d}:{ss:02d}")
+        if self.crawler:
+            self.var_rate.set(self.crawler.governor.describe())
         self._tick_after_id = self.master.after(1000, self._tick)
 
     # ====== 进度刷新 ======
@@ -803,6 +909,21 @@ class App:
         except ValueError:
             messagebox.showerror("错误", "最大滚动次数需为整数")
             return
+        try:
+            detail_tabs = max(1, int(self.var_detail_tabs.get()))
+        except ValueError:
+            messagebox.showerror("错误", "详情标签数需为整数")
+            return
+        try:
+            wait_floor = max(0.0, float(self.var_wait_floor.get()))
+        except ValueError:
+            messagebox.showerror("错误", "最短等待需为数字")
+            return
+        try:
+            known_stop = max(0, int(self.var_known_stop.get()))
+        except ValueError:
+            messagebox.showerror("错误", "已采集即停需为整数")
+            return
 
         self.btn_start.config(state='disabled')
         self.btn_stop.config(state='normal')
@@ -818,18 +939,34 @@ class App:
 
         def run():
             try:
+                # 启动浏览器前离线检查登录会话：无头且需要手动登录时不启动
+                interactive = (not (self.var_lean.get() or self.var_headless.get())
+                               or self.var_profile.get() or bool(self.var_attach.get().strip()))
+                if not preflight(SessionStore(logger=self.logger), SESSION_ACCOUNT, interactive, self.logger):
+                    self.var_status.set("需要登录")
+                    return
+
                 self.logger.info("初始化DB")
-                self.db = DatabaseManager()
+                self.db = DatabaseManager(logger=self.logger)
 
-                self.logger.info("初始化爬虫（速度参数将实时读取 GUI 输入框）")
+                self.logger.info("初始化爬虫（请求节奏由限速器自动调整）")
                 self.crawler = XHSCrawler(
                     url_checker=self.db.is_url_exists,
                     insert_callback=self.db.insert_one,
-                    get_scroll_sleep=self.get_scroll_sleep,   # 运行中实时读取
-                    get_detail_sleep=self.get_detail_sleep,   # 运行中实时读取
+                    batch_url_checker=self.db.existing_urls,
+                    flush_callback=self.db.flush,
                     on_sleep=self.on_sleep,                   # 读条回调
                     max_scroll_default=max_scroll,
+                    detail_tabs=detail_tabs,
+                    wait_floor=wait_floor,
+                    capture=self.var_capture.get(),
+                    known_stop=known_stop,
+                    checkpoint=CHECKPOINT_FILE,
                     headless=self.var_headless.get(),
+                    lean=self.var_lean.get(),
+                    traffic=TRAFFIC_FILE if self.var_lean.get() else '',
+                    user_data_dir=PROFILE_DIR if self.var_profile.get() else '',
+                    attach=self.var_attach.get().strip(),
                     logger=self.logger
                 )
 
@@ -837,6 +974,16 @@ class App:
                 self.crawler.login()
 
                 brands = self.db.fetch_brand_urls()
+                checkpoint = Checkpoint(CHECKPOINT_FILE, self.logger)
+                resumed = checkpoint.resume(brands) if self.var_resume.get() else None
+                if resumed is not None:
+                    brands = resumed
+                else:
+                    if self.var_schedule.get():
+                        # 预计没有新笔记的品牌本轮推迟
+                        scheduler = BrandScheduler('spider_log', 'rednote_spd_setting', logger=self.logger)
+                        brands = scheduler.schedule(self.db.connection, brands)
+                    checkpoint.start(brands)
                 self.total_brands = len(brands)
                 self._update_progress()
                 self.logger.info(f"待处理品牌数量：{self.total_brands}")
@@ -853,10 +1000,24 @@ class App:
                             self.crawler.max_scroll_default = int(self.var_max_scroll.get())
                         except Exception:
                             pass
+                        try:
+                            self.crawler.detail_tabs = max(1, int(self.var_detail_tabs.get()))
+                        except Exception:
+                            pass
+                        try:
+                            self.crawler.waiter.floor = max(0.0, float(self.var_wait_floor.get()))
+                        except Exception:
+                            pass
+                        try:
+                            self.crawler.known_stop = max(0, int(self.var_known_stop.get()))
+                        except Exception:
+                            pass
 
-                        if self.crawler.crawl_author(brand):
+                        # 缓冲中的笔记提交后才更新采集时间、记入运行断点
+                        if self.crawler.crawl_author(brand) and self.db.flush():
                             self.db.update_last_gather_time(brand['id'])
                             self.logger.info(f"已更新采集时间: {brand['brand_name']}")
+                            checkpoint.brand_done(brand['id'])
 
                         self.crawler.notes_data.clear()
                         self.crawler.all_links.clear()
@@ -868,9 +1029,10 @@ class App:
                         self.master.after(0, self._update_progress)
 
                 if self.crawler and self.crawler.stop_requested:
-                    self.logger.info("任务被用户停止")
+                    self.logger.info("任务被用户停止，勾选“断点续采”可从此处继续")
                     self.var_status.set("已停止")
                 else:
+                    checkpoint.finish()
                     self.logger.info("任务结束")
                     self.var_status.set("已完成")
             except KeyboardInterrupt:
@@ -882,12 +1044,23 @@ class App:
             finally:
                 try:
                     if self.crawler:
+                        self.logger.info(self.crawler.waiter.summary())
+                        self.logger.info(self.crawler.governor.summary())
+                        if self.crawler.capture:
+                            self.logger.info(self.crawler.capture.summary())
+                        if self.crawler.traffic:
+                            self.logger.info(self.crawler.traffic.summary())
+                        self.logger.info(self.crawler.metrics.summary())
+                        self.crawler.metrics.export('gui_xhs_metrics.json')
                         self.crawler.driver.quit()
                 except Exception:
                     pass
                 try:
                     if self.db:
-                        self.db.connection.close()
+                        # 停止/退出时提交缓冲中的笔记
+                        self.db.flush()
+                        self.logger.info(self.db.note_index.summary())
+                        self.db.close()
                 except Exception:
                     pass
 
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+回归测试的公共部分
+- 模块都在仓库根目录（平铺结构），测试从 tests/ 运行时把根目录加入 sys.path
+- FlakyConnection：本地 SQLite 连接（bench_crawl.SQLiteConnection）上按计划注入断开故障，
+  覆盖缓冲写入器/数据库线程的重连与重试路径，不连接线上数据库
+
+用法：python -m pytest -q tests
+"""
+
+import os
+import sys
+
+import pymysql
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_crawl import SQLiteConnection, TABLE_SQL  # noqa: E402
+
+LOST = pymysql.err.OperationalError(2013, 'Lost connection to MySQL server during query')
+
+
+class FlakyConnection(SQLiteConnection):
+    """commit_lost：提交成功但客户端收到断开（确认丢失）的次数；dead：连接已断开；can_reconnect：ping 能否重连"""
+
+    def __init__(self, tables=('spider_log',)):
+        super().__init__(':memory:')
+        self.commit_lost = 0
+        self.dead = False
+        self.can_reconnect = True
+        self.pings = 0
+        with self.cursor() as cursor:
+            for table in tables:
+                cursor.execute(TABLE_SQL.format(table=table))
+        self.commit()
+
+    def _check(self):
+        if self.dead:
+            raise LOST
+
+    def cursor(self):
+        self._check()
+        return super().cursor()
+
+    def commit(self):
+        self._check()
+        super().commit()
+        if self.commit_lost:
+            self.commit_lost -= 1
+            raise LOST
+
+    def rollback(self):
+        self._check()
+        super().rollback()
+
+    def ping(self, reconnect=True):
+        self.pings += 1
+        if not self.can_reconnect:
+            raise LOST
+        self.dead = False
+
+    def urls(self, table: str = 'spider_log') -> list:
+        return [row[0] for row in self.connection.execute(f"SELECT url FROM {table} ORDER BY id")]
+
+
+class StubPool:
+    """DBService 用的单连接池"""
+
+    reconnects = 0
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def acquire(self):
+        return self.connection
+
+    def release(self, connection):
+        pass
+
+    def check(self, connection):
+        pass
+
+
+@pytest.fixture
+def flaky():
+    connection = FlakyConnection()
+    yield connection
+    connection.close()
+
+
+def note_rows(prefix: str, n: int) -> list:
+    return [{'url': f'https://www.xiaohongshu.com/explore/{prefix}{i:022x}', 'title': f't{i}'} for i in range(n)]
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+进程池故障演练（由 test_pool.py 以子进程运行）
+- 工作进程以 spawn 方式启动，会重新导入本脚本（__mp_main__），因此假爬虫/假数据库和 POOL_KINDS 注册都放在模块顶层
+- 故障按标记文件只触发一次：login 失败（浏览器起不来）、crash 在处理品牌 2 时进程直接退出
+- 结果（更新过采集时间的品牌、断点文件是否保留）写到 JSON 文件
+
+用法：POOL_HARNESS_DIR=<目录> POOL_HARNESS_FAULTS=login,crash python pool_harness.py <进程数>
+"""
+
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import xhs_pool  # noqa: E402
+
+WORKDIR = os.environ.get('POOL_HARNESS_DIR', '')
+FAULTS = os.environ.get('POOL_HARNESS_FAULTS', '').split(',')
+
+xhs_pool.POOL_KINDS['fake'] = xhs_pool.PoolKind('__mp_main__' if __name__ != '__main__' else '__main__',
+                                               'FakeDB', 'fetch', 'FakeCrawler', 'crawl', 'insert',
+                                               os.path.join(WORKDIR, 'pool.log'))
+
+
+def once(name: str) -> bool:
+    """故障 name 已启用且还没触发过时返回 True（跨进程只触发一次）"""
+    marker = os.path.join(WORKDIR, f'{name}.fired')
+    if name not in FAULTS or os.path.exists(marker):
+        return False
+    open(marker, 'w').close()
+    return True
+
+
+class _Stats:
+    def summary(self):
+        return ''
+
+    def export(self, path):
+        pass
+
+
+class FakeDB:
+    connection = None
+    note_index = _Stats()
+
+    def __init__(self):
+        self.updated = []
+
+    def fetch(self):
+        return [{'id': i, 'brand_name': f'b{i}'} for i in (1, 2, 3)]
+
+    def existing_urls(self, urls):
+        return set()
+
+    def insert(self, data):
+        pass
+
+    def update_last_gather_time(self, brand_id):
+        self.updated.append(brand_id)
+
+    def flush(self):
+        return 'flush' not in FAULTS
+
+    def close(self):
+        with open(os.path.join(WORKDIR, 'result.json'), 'w') as f:
+            json.dump({'updated': sorted(self.updated)}, f)
+
+
+class FakeCrawler:
+    def __init__(self, **kwargs):
+        self.waiter = self.metrics = _Stats()
+        self.capture = self.traffic = None
+
+        class Driver:
+            window_handles = ['main']
+
+            def quit(self):
+                pass
+
+        self.driver = Driver()
+
+    def login(self):
+        if once('login'):
+            raise RuntimeError('chrome failed to start')
+
+    def reset_brand(self):
+        pass
+
+    def crawl(self, brand):
+        if brand['id'] == 2 and once('crash'):
+            os._exit(3)
+        return True
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+    xhs_pool.run_pool('fake', int(sys.argv[1]), {}, checkpoint=os.path.join(WORKDIR, 'run.json'))
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""运行断点与品牌断点：finish 只在全部完成时删除，resume 按原顺序跳过已完成，笔记提交后才记为已处理"""
+
+import os
+
+from xhs_checkpoint import BrandProgress, Checkpoint, progress_path
+
+BRANDS = [{'id': i, 'brand_name': f'b{i}'} for i in (3, 1, 2)]
+
+
+def test_finish_removes_checkpoint_when_all_done(tmp_path):
+    path = str(tmp_path / 'run.json')
+    checkpoint = Checkpoint(path)
+    checkpoint.start(BRANDS)
+    for brand in BRANDS:
+        checkpoint.brand_done(brand['id'])
+    checkpoint.finish()
+    assert not os.path.exists(path)
+
+
+def test_finish_keeps_checkpoint_with_unfinished_brands(tmp_path):
+    path = str(tmp_path / 'run.json')
+    checkpoint = Checkpoint(path)
+    checkpoint.start(BRANDS)
+    checkpoint.brand_done(3)
+    checkpoint.finish()
+    assert os.path.exists(path)
+
+
+def test_resume_returns_remaining_in_original_order(tmp_path):
+    path = str(tmp_path / 'run.json')
+    first = Checkpoint(path)
+    first.start(BRANDS)
+    first.brand_done(1)
+
+    # 上次之后新增的品牌 4 不在本轮，被删除的品牌 2 不再采集
+    current = [brand for brand in BRANDS if brand['id'] != 2] + [{'id': 4, 'brand_name': 'b4'}]
+    resumed = Checkpoint(path).resume(current)
+    assert [brand['id'] for brand in resumed] == [3]
+
+
+def test_resume_without_checkpoint_starts_over(tmp_path):
+    assert Checkpoint(str(tmp_path / 'missing.json')).resume(BRANDS) is None
+
+
+def test_start_clears_stale_brand_progress(tmp_path):
+    path = str(tmp_path / 'run.json')
+    stale = BrandProgress(path, 1)
+    stale.save_links({b'\x01' * 12: 'https://x/1'}, [])
+    assert os.path.exists(progress_path(path, 1))
+    Checkpoint(path).start(BRANDS)
+    assert not os.path.exists(progress_path(path, 1))
+
+
+def test_notes_are_processed_only_after_commit(tmp_path):
+    path = str(tmp_path / 'run.json')
+    results = [False, True]
+    progress = BrandProgress(path, 1, commit=lambda: results.pop(0), commit_every=2)
+    keys = [bytes([i]) * 12 for i in range(3)]
+
+    progress.note_written(keys[0])
+    assert not progress.processed
+    progress.note_written(keys[1])  # 攒满 2 条，提交失败：仍未处理
+    assert not progress.processed
+    progress.note_written(keys[2])  # 再次提交成功：三条一起记为已处理
+    assert progress.processed == set(keys)
+
+    reloaded = BrandProgress(path, 1)
+    assert reloaded.load()
+    assert reloaded.processed == set(keys)
+
+
+def test_unsettled_notes_are_not_saved(tmp_path):
+    """进程在提交前被杀：断点里只有已提交的笔记，续采时重新抓取其余的"""
+    path = str(tmp_path / 'run.json')
+    progress = BrandProgress(path, 1, commit=lambda: True, commit_every=20)
+    progress.save_links({bytes([i]) * 12: f'https://x/{i}' for i in range(3)}, [])
+    progress.note_written(b'\x00' * 12)
+
+    reloaded = BrandProgress(path, 1)
+    assert reloaded.load()
+    assert not reloaded.processed
+    assert len(reloaded.links) == 3
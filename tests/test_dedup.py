@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""去重索引：命中/未命中/回查统计，批量回查，连续已采集计数"""
+
+from conftest import FlakyConnection
+from xhs_dedup import KnownRun, NoteIndex, query_existing_urls
+
+KNOWN = 'https://www.xiaohongshu.com/explore/64a1b2c3d4e5f60718293a4b'
+NEW = 'https://www.xiaohongshu.com/explore/64a1b2c3d4e5f60718293a4c'
+SHORT_LINK = 'https://xhslink.com/a/abcdef'
+
+
+def make_connection():
+    connection = FlakyConnection()
+    with connection.cursor() as cursor:
+        cursor.execute("INSERT INTO spider_log (url) VALUES (%s)", (KNOWN + '?xsec_token=abc',))
+    connection.commit()
+    return connection
+
+
+def test_lookup_hit_miss_and_fallback():
+    connection = make_connection()
+    index = NoteIndex('spider_log')
+    assert index.lookup(KNOWN) is None  # 未加载时回查数据库
+    index.load(connection)
+    assert index.loaded
+
+    assert index.lookup(KNOWN) is True
+    assert index.lookup(NEW) is False
+    assert index.lookup(SHORT_LINK) is None  # 取不到笔记ID
+    assert (index.hits, index.misses, index.fallbacks) == (1, 1, 2)
+
+
+def test_add_makes_new_note_known():
+    index = NoteIndex('spider_log')
+    index.load(make_connection())
+    index.add(NEW)
+    assert index.lookup(NEW) is True
+
+
+def test_split_known():
+    index = NoteIndex('spider_log')
+    index.load(make_connection())
+    existing, unknown = index.split_known([KNOWN, NEW, SHORT_LINK])
+    assert existing == {KNOWN}
+    assert unknown == [SHORT_LINK]
+
+
+def test_failed_load_falls_back_to_database():
+    connection = FlakyConnection()
+    connection.dead = True
+    index = NoteIndex('spider_log')
+    index.load(connection)
+    assert not index.loaded
+    assert index.lookup(KNOWN) is None
+
+
+def test_query_existing_urls_chunks():
+    connection = FlakyConnection()
+    urls = [f'https://x/{i}' for i in range(7)]
+    with connection.cursor() as cursor:
+        cursor.executemany("INSERT INTO spider_log (url) VALUES (%s)", [(url,) for url in urls[::2]])
+    connection.commit()
+    assert query_existing_urls(connection, 'spider_log', urls + urls[:1], chunk_size=3) == set(urls[::2])
+
+
+def test_known_run_resets_on_new_note():
+    run = KnownRun(3)
+    assert not run.update([True, True, False, True])
+    assert run.update([True, True])
+    assert not KnownRun(0).update([True] * 10)
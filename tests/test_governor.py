@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""限速器退避/恢复与按路由切换等待上限，排期器的采集顺序与推迟规则"""
+
+from xhs_governor import DETAIL, PAGE, Governor
+from xhs_scheduler import DAY, BrandScheduler
+
+
+def test_failure_backs_off_and_success_recovers():
+    governor = Governor(paced=False)
+    rate = governor.rate(PAGE)
+    governor.failure(PAGE, '主页没有加载出笔记')
+    assert governor.rate(PAGE) == rate * 0.5
+    assert governor.timeout(PAGE) == 7.5 * 2
+
+    governor.success(PAGE)
+    assert governor.timeout(PAGE) == 7.5
+    assert governor.rate(PAGE) > rate * 0.5
+    assert governor.rate(DETAIL) == 20  # 两类请求互不影响
+
+
+def test_timeout_growth_is_capped():
+    governor = Governor(paced=False)
+    for _ in range(5):
+        governor.failure(DETAIL, '详情页未就绪')
+    assert governor.timeout(DETAIL) == 10.0 * 4
+
+
+def test_with_timeouts_shares_rate_state():
+    brand = Governor(paced=False)
+    artist = brand.with_timeouts(23.5, 2)
+    assert (artist.timeout(PAGE), artist.timeout(DETAIL)) == (23.5, 2)
+    assert (brand.timeout(PAGE), brand.timeout(DETAIL)) == (7.5, 10.0)
+
+    artist.failure(PAGE, '主页没有加载出作品')
+    assert brand.rate(PAGE) == artist.rate(PAGE)
+    assert brand.timeout(PAGE) == 15.0
+
+
+def test_unpaced_acquire_does_not_wait():
+    assert Governor(paced=False).acquire(PAGE) == 0.0
+
+
+def test_schedule_order_and_deferral(monkeypatch):
+    now = 1_700_000_000
+    scheduler = BrandScheduler('spider_log', 'rednote_spd_setting', max_stale_days=14, min_expected=0.5)
+    history = {
+        1: {'n': 90, 'first_ts': now - 90 * DAY},  # 1 篇/天
+        2: {'n': 9, 'first_ts': now - 90 * DAY},   # 0.1 篇/天
+        3: {'n': 3, 'first_ts': now - 90 * DAY},
+    }
+    monkeypatch.setattr(scheduler, 'load_history', lambda connection, ids, ts: history)
+    brands = [
+        {'id': 1, 'last_gather_time': now - 2 * DAY, 'rednote_spd_setting': 1},
+        {'id': 2, 'last_gather_time': now - 2 * DAY, 'rednote_spd_setting': 1},   # 预计 0.2 篇：推迟
+        {'id': 3, 'last_gather_time': now - 20 * DAY, 'rednote_spd_setting': 1},  # 超过最长间隔：强制采集
+        {'id': 4, 'last_gather_time': None, 'rednote_spd_setting': 1},            # 从未采集：最前
+        {'id': 5, 'last_gather_time': now - 2 * DAY, 'rednote_spd_setting': 3},   # 不采集：最后
+    ]
+    scheduled, deferred = scheduler.plan(None, brands, now=now)
+    assert [plan.brand['id'] for plan in scheduled] == [4, 1, 3, 5]
+    assert [plan.brand['id'] for plan in deferred] == [2]
+
+
+def test_schedule_falls_back_to_original_order(monkeypatch):
+    scheduler = BrandScheduler('spider_log', 'rednote_spd_setting')
+
+    def broken(connection, ids, now):
+        raise RuntimeError('db down')
+
+    monkeypatch.setattr(scheduler, 'load_history', broken)
+    brands = [{'id': i, 'brand_name': f'b{i}', 'last_gather_time': 0} for i in (3, 1, 2)]
+    assert scheduler.schedule(None, brands) == brands
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""流水线：发现失败/提交失败的品牌不记完成、保留断点、不更新采集时间；详情浏览器在品牌之间清理缓存"""
+
+import os
+
+import pytest
+
+import xhs_pipeline
+from xhs_checkpoint import Checkpoint
+
+BRANDS = [{'id': i, 'brand_name': f'b{i}', 'rednote_url': f'https://x/user/{i}'} for i in (1, 2, 3)]
+
+
+class _Stats:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: ''
+
+
+class FakeCrawler:
+    """发现浏览器返回每个品牌一条详情链接，fail_discover 中的品牌发现失败"""
+
+    fail_discover = set()
+    instances = []
+
+    def __init__(self, **kwargs):
+        self.metrics = self.keeper = self.waiter = self.governor = self.driver = _Stats()
+        self.traffic = None
+        self.detail_tabs = 1
+        self.collected_quick_data = []
+        self.resets = 0
+        FakeCrawler.instances.append(self)
+
+    def login(self):
+        pass
+
+    def reset_brand(self):
+        self.resets += 1
+
+    def discover(self, brand, spd_setting):
+        if brand['id'] in self.fail_discover:
+            raise RuntimeError('profile did not load')
+        return [f"https://x/explore/{brand['id']}"]
+
+    def process_single_note(self, url):
+        return {'url': url}
+
+
+class FakeDB:
+    def __init__(self, flush_ok: bool = True):
+        self.flush_ok = flush_ok
+        self.inserted = []
+        self.updated = []
+
+    def is_url_exists(self, url):
+        return False
+
+    def existing_urls(self, urls):
+        return set()
+
+    def insert_one(self, data):
+        self.inserted.append(data)
+
+    def update_last_gather_time(self, brand_id):
+        self.updated.append(brand_id)
+
+    def flush(self):
+        return self.flush_ok
+
+
+@pytest.fixture(autouse=True)
+def reset_fakes():
+    FakeCrawler.fail_discover = set()
+    FakeCrawler.instances = []
+
+
+def run(tmp_path, db):
+    path = str(tmp_path / 'run.json')
+    checkpoint = Checkpoint(path)
+    checkpoint.start(BRANDS)
+    xhs_pipeline.run_pipeline(FakeCrawler, db, BRANDS, 1, {}, checkpoint=checkpoint, report_interval=999)
+    return checkpoint, os.path.exists(path)
+
+
+def test_clean_run_finishes_checkpoint(tmp_path):
+    db = FakeDB()
+    checkpoint, kept = run(tmp_path, db)
+    assert checkpoint.done == {1, 2, 3}
+    assert sorted(db.updated) == [1, 2, 3]
+    assert len(db.inserted) == 3
+    assert not kept
+
+
+def test_discover_failure_keeps_checkpoint(tmp_path):
+    FakeCrawler.fail_discover = {2}
+    db = FakeDB()
+    checkpoint, kept = run(tmp_path, db)
+    assert checkpoint.done == {1, 3}
+    assert sorted(db.updated) == [1, 3]
+    assert kept
+
+
+def test_failed_flush_does_not_stamp_brand(tmp_path):
+    db = FakeDB(flush_ok=False)
+    checkpoint, kept = run(tmp_path, db)
+    assert not checkpoint.done
+    assert db.updated == []
+    assert kept
+
+
+def test_detail_crawlers_reset_between_brands(tmp_path):
+    run(tmp_path, FakeDB())
+    discovery, detail = FakeCrawler.instances
+    assert discovery.resets == 3
+    assert detail.resets >= 1
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""进程池：浏览器起不来或中途崩溃时补起新进程，剩余品牌不丢；提交失败的品牌不更新采集时间"""
+
+import json
+import os
+import subprocess
+import sys
+
+HARNESS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pool_harness.py')
+
+
+def run_harness(tmp_path, workers: int, faults: str):
+    env = dict(os.environ, POOL_HARNESS_DIR=str(tmp_path), POOL_HARNESS_FAULTS=faults)
+    proc = subprocess.run([sys.executable, HARNESS, str(workers)], env=env, capture_output=True,
+                          text=True, encoding='utf-8', timeout=120)
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    with open(tmp_path / 'result.json') as f:
+        result = json.load(f)
+    result['checkpoint_kept'] = os.path.exists(tmp_path / 'run.json')
+    result['log'] = proc.stdout + proc.stderr
+    return result
+
+
+def test_clean_run(tmp_path):
+    result = run_harness(tmp_path, 2, '')
+    assert result['updated'] == [1, 2, 3]
+    assert not result['checkpoint_kept']
+
+
+def test_worker_that_fails_to_start_is_replaced(tmp_path):
+    """唯一的工作进程启动浏览器失败：补起新进程接手全部品牌"""
+    result = run_harness(tmp_path, 1, 'login')
+    assert result['updated'] == [1, 2, 3]
+    assert '已补起 worker-1' in result['log']
+
+
+def test_crashed_brand_is_requeued(tmp_path):
+    result = run_harness(tmp_path, 1, 'crash')
+    assert result['updated'] == [1, 2, 3]
+    assert '品牌重新排队: b2' in result['log']
+    assert not result['checkpoint_kept']
+
+
+def test_failed_flush_does_not_stamp_brands(tmp_path):
+    result = run_harness(tmp_path, 1, 'flush')
+    assert result['updated'] == []
+    assert result['checkpoint_kept']
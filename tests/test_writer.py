@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""缓冲写入器与数据库线程：断开重连后不重复写入、不丢行，写入任务不盲目重跑"""
+
+import pymysql
+import pytest
+
+from conftest import LOST, FlakyConnection, StubPool, note_rows
+from xhs_db import DBService
+from xhs_writer import BufferedWriter, SPIDER_LOG
+
+
+def make_writer(connection, rows):
+    writer = BufferedWriter(connection, SPIDER_LOG, max_rows=100)
+    for row in rows:
+        writer.add(row)
+    return writer
+
+
+def test_flush_writes_batch(flaky):
+    rows = note_rows('a', 5)
+    writer = make_writer(flaky, rows)
+    assert writer.flush() == 5
+    assert flaky.urls() == [row['url'] for row in rows]
+    assert writer.commit()
+
+
+def test_lost_commit_ack_is_not_written_twice(flaky):
+    """服务端已提交、客户端收到断开：重连后按 url 查出已入库的行，不再整批重发"""
+    rows = note_rows('b', 5)
+    writer = make_writer(flaky, rows)
+    flaky.commit_lost = 1
+    assert writer.flush() == 5
+    assert sorted(flaky.urls()) == sorted(row['url'] for row in rows)
+    assert not writer.rows
+
+
+def test_partial_commit_retries_only_missing_rows(flaky):
+    """断开前只提交了一部分：已入库的跳过，其余重写一次"""
+    rows = note_rows('c', 6)
+    writer = make_writer(flaky, rows)
+    committed = writer.rows[:2]
+    with flaky.cursor() as cursor:
+        cursor.executemany(SPIDER_LOG.sql, committed)
+    flaky.connection.commit()
+
+    def drop_then_fail(batch):
+        writer._write_batch = original
+        raise LOST
+
+    original = writer._write_batch
+    writer._write_batch = drop_then_fail
+    assert writer.flush() == 6
+    assert sorted(flaky.urls()) == sorted(row['url'] for row in rows)
+
+
+def test_disconnect_without_reconnect_keeps_rows(flaky):
+    rows = note_rows('d', 3)
+    writer = make_writer(flaky, rows)
+    flaky.dead, flaky.can_reconnect = True, False
+    assert writer.flush() == 0
+    assert len(writer.rows) == 3
+    assert not writer.commit()
+
+    flaky.dead, flaky.can_reconnect = False, True
+    assert writer.commit()
+    assert len(flaky.urls()) == 3
+
+
+def test_rollback_on_dead_connection_does_not_raise(flaky):
+    """整批因 SQL 错误失败后回滚时连接已断开且无法重连：不抛出，剩余行留在缓冲区"""
+    writer = make_writer(flaky, note_rows('e', 3))
+    original = writer._write_batch
+
+    def fail_then_die(batch):
+        flaky.dead, flaky.can_reconnect = True, False
+        raise pymysql.err.IntegrityError(1062, 'Duplicate entry')
+
+    writer._write_batch = fail_then_die
+    assert writer.flush() == 0
+    assert len(writer.rows) == 3
+
+    writer._write_batch = original
+    flaky.dead, flaky.can_reconnect = False, True
+    assert writer.commit()
+    assert len(flaky.urls()) == 3
+
+
+def test_bad_row_is_dropped_alone(flaky):
+    """整批失败退回逐行写入时，只丢弃出错的那一行"""
+    rows = note_rows('f', 3)
+    writer = make_writer(flaky, rows)
+    writer.rows[1] = writer.rows[1][:-1]  # 少一列，单独写入也会失败
+    assert writer.flush() == 2
+    assert flaky.urls() == [rows[0]['url'], rows[2]['url']]
+
+
+@pytest.fixture
+def service():
+    connection = FlakyConnection()
+    service = DBService(StubPool(connection), idle_interval=60)
+    yield service
+    service.close()
+    connection.close()
+
+
+def flaky_task(runs: list, result=None):
+    def task():
+        runs.append(1)
+        if len(runs) == 1:
+            raise LOST
+        return result
+    return task
+
+
+def test_service_retries_only_opted_in_tasks(service):
+    writes, reads = [], []
+    service.post(flaky_task(writes))
+    assert service.call(flaky_task(reads, 'ok'), retry=True) == 'ok'
+    assert len(writes) == 1
+    assert len(reads) == 2
+    assert service.failed == 1
+
+
+def test_service_call_raises_without_retry(service):
+    runs = []
+    with pytest.raises(pymysql.err.OperationalError):
+        service.call(flaky_task(runs))
+    assert len(runs) == 1
+    assert service.connection.pings == 1
@@ -1,11 +1,11 @@
 import configparser
 import time
-import pickle
-import os
 from selenium import webdriver
 from selenium.webdriver import Chrome
 from selenium.webdriver.common.by import By
 
+from xhs_session import SessionStore, USABLE
+
 # 预先检查配置文件是否合理
 cf = configparser.ConfigParser()
 cf.read('config.ini')
@@ -45,11 +45,15 @@ def login():
     time.sleep(sleepTime1)
     web.find_element(By.ID, 'login_pwd_submit').click()
 
-#加载cookie
-if os.path.getsize("weidian_cookie.pkl") > 0:
+sleepTime1 = 0.5
+sleepTime2 = 0.05
+
+#加载cookie（会话存储离线判断，登录态已过期时直接进入登录页）
+sessions = SessionStore()
+print(sessions.describe('weidian'))
+if sessions.status('weidian') in USABLE:
     web.get('https://shop1725890150.v.weidian.com/item.html?itemID=6241829296&spider_token=a5a8')
-    cookies = pickle.load(open("weidian_cookie.pkl", "rb"))
-    for cookie in cookies:
+    for cookie in sessions.cookies('weidian'):
         web.add_cookie(cookie)
     web.refresh()
 else:
@@ -59,8 +63,6 @@ else:
 
 
 # web.get('https://shop1725890150.v.weidian.com/item.html?itemID=6241829296&spider_token=a5a8')
-sleepTime1 = 0.5
-sleepTime2 = 0.05
 
 
 # 等待登录成功
@@ -71,7 +73,7 @@ while True:
         cart = web.find_element(By.CLASS_NAME, 'entry-shop')
         print('已确认登录')
         #保留cookie
-        pickle.dump(web.get_cookies(), open("weidian_cookie.pkl", "wb"))
+        sessions.save('weidian', web.get_cookies())
         try:
             # 检测是否可购买
             isDisable = web.find_element(By.XPATH, '//div[contains(text(), "商品已下架，为你推荐本店其他商品")]')
@@ -1,10 +1,6 @@
-import os
-import pickle
+import argparse
 import sys
 import time
-import urllib
-import urllib.parse
-import pymysql
 import logging
 from typing import Dict, Optional, Callable
 from selenium.webdriver import Chrome
@@ -13,138 +9,143 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
-
-def convert_xhs_url(original_url):
-    parsed_url = urllib.parse.urlparse(original_url)
-
-    # 替换查询参数中的&amp;为&
-    new_query = parsed_url.query.replace('&amp;', '&')
-
-    # 分割路径并处理
-    path_parts = parsed_url.path.split('/')
-    if len(path_parts) >= 5 and path_parts[1] == 'user' and path_parts[2] == 'profile':
-        note_id = path_parts[4]
-        new_path = f'/explore/{note_id}'
-    else:
-        new_path = parsed_url.path  # 保留原始路径
-
-    # 构建新URL
-    new_parsed = parsed_url._replace(
-        path=new_path,
-        query=new_query
-    )
-    return urllib.parse.urlunparse(new_parsed)
-
-
-def parse_xhs_time(time_str: str) -> int:
-    """解析小红书时间格式（新增天前处理）"""
-    from datetime import datetime, timedelta
-    import re
-
-    clean_str = time_str.replace('编辑于 ', '').strip()
-    parts = re.split(r'\s+(?=[\u4e00-\u9fa5]{2,5}$)', clean_str)
-    time_part = parts[0]
-
-    now = datetime.now()
-    current_year = now.year
-
-    try:
-        # 新增天前处理（保持原有结构）
-        if '天前' in time_part:
-            days = int(re.search(r'\d+', time_part).group())
-            return int((now - timedelta(days=days)).timestamp())
-        # 原有时间处理逻辑保持不变...
-        if '昨天' in time_part:
-            date = now - timedelta(days=1)
-            time_str = re.sub(r'昨天', date.strftime('%Y-%m-%d'), time_part)
-        elif '今天' in time_part:
-            time_str = re.sub(r'今天', now.strftime('%Y-%m-%d'), time_part)
-        elif '分钟前' in time_part:
-            minutes = int(re.search(r'\d+', time_part).group())
-            return int((now - timedelta(minutes=minutes)).timestamp())
-        elif '小时前' in time_part:
-            hours = int(re.search(r'\d+', time_part).group())
-            return int((now - timedelta(hours=hours)).timestamp())
-        else:
-            time_str = time_part
-
-        # 处理带时间的格式（增强匹配模式）
-        time_formats = [
-            (r'(\d{1,2})-(\d{1,2}) (\d{1,2}):(\d{2})', "%m-%d %H:%M"),  # 04-20 15:30
-            (r'(\d{4})-(\d{1,2})-(\d{1,2}) (\d{1,2}):(\d{2})', "%Y-%m-%d %H:%M"),  # 2023-04-20 15:30
-            (r'(\d{1,2})-(\d{1,2})', "%m-%d"),  # 04-20
-        ]
-
-        for pattern, time_format in time_formats:
-            if re.match(pattern, time_str):
-                dt = datetime.strptime(time_str, time_format)
-                # 自动补全年份（若需要）
-                if dt.year == 1900:  # strptime默认年份
-                    dt = dt.replace(year=current_year)
-                    # 处理跨年（如当前1月但解析到12月的情况）
-                    if dt > now + timedelta(days=60):
-                        dt = dt.replace(year=current_year - 1)
-                return int(dt.timestamp())
-
-        return 0
-    except Exception as e:
-        logging.warning(f"时间解析失败: {clean_str} ({str(e)})")
-        return 0
+from xhs_text import convert_xhs_url, note_key, explore_url, parse_xhs_time
+from xhs_dedup import NoteIndex, KnownRun, query_existing_urls
+from xhs_writer import BufferedWriter, SPIDER_LOG
+from xhs_db import ConnectionPool, DBService, DB_CONFIG
+from xhs_extract import fetch_note_cards, fetch_note_snapshot, build_note_fields
+from xhs_wait import ReadyWaiter, FeedLoaded, DetailReady
+from xhs_capture import NetworkCapture, enable_capture
+from xhs_scheduler import BrandScheduler
+from xhs_metrics import Metrics, timed
+from xhs_checkpoint import Checkpoint, BrandProgress
+from xhs_lean import LeanMode, TrafficMeter, apply_lean_options
+from xhs_browser import SIDEBAR, attach_options, load_stealth, session_logged_in, startup_mode, use_profile
+from xhs_session import SessionStore, SessionKeeper, USABLE, preflight
+from xhs_governor import Governor, PAGE, DETAIL
+from xhs_images import ImageStage
+
+SESSION_ACCOUNT = 'xhs'  # 会话存储中的账号（xhs_session）
 
 
 class XHSCrawler:
-    def __init__(self, url_checker: Optional[Callable] = None, insert_callback: Optional[Callable] = None):
-        options = webdriver.ChromeOptions()
-        # options.add_argument("--headless")
-        options.add_experimental_option("excludeSwitches", ['enable-automation'])
-        options.add_argument("--disable-blink-features=AutomationControlled")
-        # options.add_argument('user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, '
-        #                      'like Gecko) Chrome/86.0.4240.198 Safari/537.36')
-        print("准备初始化浏览器")
-        self.driver = webdriver.Chrome(options=options)
-        print("加载stealth.min.js")
-        # 运行这段JS隐藏浏览器特征  https://github.com/berstend/puppeteer-extra/blob/stealth-js/stealth.min.js
-        with open('./stealth.min.js', 'r') as f:
-            stealth_script = f.read()
-
-        print("运行JS")
-        self.driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': stealth_script})
-        print("浏览器运行成功")
+    def __init__(self, url_checker: Optional[Callable] = None, insert_callback: Optional[Callable] = None,
+                 batch_url_checker: Optional[Callable] = None, detail_tabs: int = 1,
+                 wait_floor: float = 0.5, capture: bool = False, known_stop: int = 10, driver=None,
+                 checkpoint: str = '', lean: bool = False, traffic: str = '',
+                 user_data_dir: str = '', attach: str = '', governor: Optional[Governor] = None,
+                 flush_callback: Optional[Callable] = None):
+        """driver 不为空时直接使用（如 xhs_fixture.FakeDriver 离线回放），不启动浏览器；
+        checkpoint 为断点文件路径（xhs_checkpoint），为空不记录品牌断点；
+        flush_callback 等待已交给 insert_callback 的记录提交（如 DatabaseManager.flush），品牌断点只记已提交的笔记，
+        为空时视为写入回调返回即已提交；
+        lean 为精简模式（无头、拦截图片/视频/字体，xhs_lean），traffic 为流量统计文件，为空不统计；
+        user_data_dir 为持久化用户目录，attach 为已运行 Chrome 的调试地址（xhs_browser），沿用其中的登录状态；
+        governor 为限速器（xhs_governor），进程池/流水线中多个浏览器共用一个，为空时自建"""
+        self.metrics = Metrics('brand')  # 各阶段耗时（按品牌/整次运行汇总）
+        self.metrics.startup = startup_mode(user_data_dir, attach)
+        self.reuse_session = bool(user_data_dir or attach)
+        if driver is None:
+            if attach:
+                options = attach_options(attach)
+            else:
+                options = webdriver.ChromeOptions()
+                # options.add_argument("--headless")
+                if lean:
+                    apply_lean_options(options)
+                if user_data_dir:
+                    use_profile(options, user_data_dir)
+                options.add_experimental_option("excludeSwitches", ['enable-automation'])
+                options.add_argument("--disable-blink-features=AutomationControlled")
+                # options.add_argument('user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, '
+                #                      'like Gecko) Chrome/86.0.4240.198 Safari/537.36')
+            if capture or traffic:
+                enable_capture(options)
+            with self.metrics.span('browser_start'):
+                print("附着到已运行的浏览器" if attach else "准备初始化浏览器")
+                driver = webdriver.Chrome(options=options)
+                print("加载stealth.min.js")
+                # 运行这段JS隐藏浏览器特征  https://github.com/berstend/puppeteer-extra/blob/stealth-js/stealth.min.js
+                stealth_script = load_stealth()
+
+                print("运行JS")
+                driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': stealth_script})
+            print("浏览器运行成功")
+        self.driver = driver
 
         # self.driver.get('https://bot.sannysoft.com/')
         self.seen_links = set()
         self.notes_data = []
         self.url_checker = url_checker
+        self.batch_url_checker = batch_url_checker
         self.insert_callback = insert_callback
         self.main_window = None
-        self.all_links = set()
+        # 以下按 12 字节笔记ID（note_key）为键，同一笔记换 xsec_token 出现时不会重复计入
+        self.all_links = {}  # 笔记ID -> 打开详情用的链接（已采集的笔记不保留链接）
+        self.existing_links = set()  # 批量去重判定为已存在的笔记ID
         self.collected_quick_data = []  # 快速模式数据缓存
-        self.wait_rate = 5
-
+        # 限速器：主页/详情的请求节奏和就绪等待上限（滚动 7.5s、详情 10s 起），按成功/超时自动调整
+        self.governor = governor or Governor()
+        self.detail_tabs = max(1, int(detail_tabs))  # 同时在途的详情标签页数
+        self.tab_open_interval = 1.0  # 多标签模式下相邻标签的打开间隔（秒）
+        # 就绪等待：条件满足即返回，原固定 sleep 时长作为超时上限
+        self.waiter = ReadyWaiter(floor=wait_floor, metrics=self.metrics)
+        self.known_stop = known_stop  # 滚动中连续遇到多少条已采集笔记即停止，0 为不提前停止
+        self.checkpoint = checkpoint
+        self.flush_callback = flush_callback
+        self.progress = None  # 当前品牌的断点（全量采集时）
+        # 可选：从笔记列表/详情接口的响应中直接解析数据，取不到时仍走 DOM 提取
+        self.capture = NetworkCapture(self.driver) if capture else None
+        self.lean = LeanMode(self.driver) if lean else None
+        if self.lean:
+            self.lean.cover()
+        self.traffic = TrafficMeter(self.driver, traffic, lean, capture=self.capture) if traffic else None
+        # 登录会话：启动时按存储判断是否注入 Cookie，采集中在品牌间隙续存
+        self.sessions = SessionStore()
+        self.keeper = SessionKeeper(self.sessions, SESSION_ACCOUNT, logged_in=lambda d: bool(d.find_elements(*SIDEBAR)))
+
+    @timed('login')
     def login(self):
         """优化登录流程"""
+        # 附着的浏览器已停在登录后的页面：直接沿用
+        if self.reuse_session and session_logged_in(self.driver):
+            self.main_window = self.driver.current_window_handle
+            print('沿用已登录的浏览器会话')
+            return
         self.driver.get('https://www.xiaohongshu.com/explore')
         self.main_window = self.driver.current_window_handle
+        # 用户目录中已有登录状态时不再加载 Cookie 和刷新
+        if self.reuse_session:
+            try:
+                WebDriverWait(self.driver, 5).until(EC.presence_of_element_located(SIDEBAR))
+                print('用户目录中已是登录状态')
+                return
+            except Exception:
+                pass
 
-        if os.path.exists("xhs_cookie.pkl"):
+        # 会话存储中的 Cookie 已过期/失效时不再注入和等待，直接手动登录
+        status = self.sessions.status(SESSION_ACCOUNT)
+        if status in USABLE:
             try:
-                cookies = pickle.load(open("xhs_cookie.pkl", "rb"))
-                for cookie in cookies:
+                for cookie in self.sessions.cookies(SESSION_ACCOUNT):
                     self.driver.add_cookie(cookie)
                 self.driver.refresh()
                 WebDriverWait(self.driver, 15).until(
                     EC.presence_of_element_located((By.CLASS_NAME, 'user.side-bar-component'))
                 )
+                self.sessions.save(SESSION_ACCOUNT, self.driver.get_cookies())
                 return
             except Exception as e:
-                print(f"页面访问失败，错误详情：\n{e.msg}")
                 print(f"Cookie加载失败: {str(e)}")
+                self.sessions.invalidate(SESSION_ACCOUNT)
+        else:
+            print(f"会话不可用（{status}），请手动登录")
 
         # 手动登录流程
         WebDriverWait(self.driver, 120).until(
             EC.presence_of_element_located((By.CLASS_NAME, 'user.side-bar-component'))
         )
-        pickle.dump(self.driver.get_cookies(), open("xhs_cookie.pkl", "wb"))
+        self.sessions.save(SESSION_ACCOUNT, self.driver.get_cookies())
         print('登录成功')
 
     def extract_notes(self):
@@ -161,7 +162,8 @@ class XHSCrawler:
                     link_element = item.find_element(By.CSS_SELECTOR, 'a.cover.mask.ld')
                     note_url = link_element.get_attribute('href')
                     print(note_url)
-                    if note_url in self.seen_links:
+                    key = note_key(note_url)
+                    if key in self.seen_links:
                         continue
                     if self.url_checker and self.url_checker(note_url):
                         continue
@@ -173,25 +175,29 @@ class XHSCrawler:
                         'images': [],
                         'content': ''
                     })
-                    self.seen_links.add(note_url)
+                    self.seen_links.add(key)
                 except Exception as e:
                     logging.error(f"提取笔记异常: {str(e)}")
         except Exception as e:
             logging.error(f"页面加载异常: {str(e)}")
         return notes
 
+    @timed('detail')
     def process_single_note(self, origin_note_url: str):
         """处理单个笔记详情页（支持视频封面提取）"""
         # URL转换
         note_url = convert_xhs_url(origin_note_url)
         print(f"打开URL: {origin_note_url} -> {note_url}")
-        img_urls = []  # 确保变量始终存在
+        new_window = None  # 尚未打开详情页时（如限速等待中收到停止）不关闭主窗口
         try:
             # 新标签页操作逻辑
             self.driver.switch_to.window(self.main_window)
+            self.governor.acquire(DETAIL)
             self.driver.execute_script(f"window.open('{note_url}');")
             new_window = [w for w in self.driver.window_handles if w != self.main_window][0]
             self.driver.switch_to.window(new_window)
+            if self.lean:
+                self.lean.cover()
             print("等待网页加载")
 
             # 统一等待页面基础元素
@@ -199,171 +205,182 @@ class XHSCrawler:
                 EC.presence_of_element_located((By.CSS_SELECTOR, ".note-container"))
             )
             print("网页已加载")
-            time.sleep(2 * self.wait_rate)
-
-            try:
-                # 时间提取
-                time_element = self.driver.find_element(By.CSS_SELECTOR, '.bottom-container .date')
-                raw_time = time_element.text.strip()
-                auth_time = parse_xhs_time(raw_time)
-                print(f"解析时间: {raw_time} -> {auth_time}")
-            except Exception as te:
-                logging.warning(f"时间提取失败: {str(te)}")
-                auth_time = 0
-
-            # 新增：点赞数提取
-
-            try:
-                like_count = 0
-                # 尝试定位点赞数元素
-                like_element = self.driver.find_element(
-                    By.CSS_SELECTOR,
-                    '.interact-container .like-active .count'
-                )
-                like_text = like_element.text.strip()
-                print("like = " + like_text)
-                # 处理点赞数的不同表示形式
-                if '万' in like_text:
-                    # 处理"万"单位的点赞数
-                    like_count = int(float(like_text.replace('万', '')) * 10000)
-                elif 'k' in like_text.lower():
-                    # 处理"k"单位的点赞数
-                    like_count = int(float(like_text.lower().replace('k', '')) * 1000)
-                else:
-                    # 直接转换为整数
-                    like_count = int(like_text) if like_text.isdigit() else 0
-
-                print(f"提取到点赞数: {like_count}")
-            except Exception as le:
-                logging.warning(f"点赞数提取失败: {str(le)}")
-                like_count = 0
-
-            # 视频封面提取逻辑
-            try:
-                # 通过更稳定的选择器判断视频类型
-                video_element = self.driver.find_element(By.CSS_SELECTOR, '.player-container')
-                if video_element:
-                    print("检测到视频笔记，提取封面")
-                    # 使用精确选择器定位封面元素
-                    poster = self.driver.find_element(By.CSS_SELECTOR, 'xg-poster.xgplayer-poster')
-                    style = poster.get_attribute('style')
-                    # 提取并清洗封面URL
-                    cover_url = style.split('url("')[1].split('")')[0].replace('&quot;', '')
-                    print(f"提取到视频封面: {cover_url}")
-                    img_urls = [cover_url]  # 包装成列表保持结构统一
-
-            except Exception as ve:
-                # 非视频笔记执行原图提取逻辑
-                print("是图文笔记，执行常规图片提取")
-                try:
-                    swiper = self.driver.find_element(By.CLASS_NAME, 'swiper-wrapper')
-                    for img in swiper.find_elements(By.TAG_NAME, 'img'):
-                        src = img.get_attribute('src')
-                        if src and src.startswith('http'):
-                            # 判断是否存在相同
-                            if src in img_urls:
-                                print(f"跳过重复图片: {src}")
-                                continue
-                            img_urls.append(src)
-                            print(f"提取到图片: {src}")
-
-                except Exception as ie:
-                    logging.warning(f"图片提取失败: {str(ie)}")
-
-            # 统一内容提取逻辑
-            content = ''
-            try:
-                text_element = self.driver.find_element(By.CSS_SELECTOR, '.note-content .desc')
-                content = text_element.text.replace('\n', ' ').strip()[:2000]
-                print(f"提取到内容: {content[:50]}...")  # 防止日志过长
-            except Exception as te:
-                logging.warning(f"内容提取失败: {str(te)}")
-
-            # 标题提取优化
-            title = ''
-            try:
-                title_element = self.driver.find_element(By.ID, 'detail-title')
-                title = title_element.text.strip()
-                print(f"提取到标题: {title}")
-            except Exception as titile_e:
-                logging.warning(f"标题提取失败: {str(titile_e)}")
-
-            baseUrl = note_url.split('?')[0]
-            return {
-                'images': img_urls,
-                'content': content,
-                'url': baseUrl,
-                'title': title,
-                'auth_time': auth_time,
-                'like_count': like_count,
-            }
+            ready = self.waiter.wait('detail', DetailReady(self.driver), self.governor.timeout(DETAIL))
+            self.governor.report(DETAIL, ready, "详情页未就绪")
+            return self._scrape_note(note_url)
 
         except Exception as e:
             logging.error(f"笔记处理失败 {note_url}: {str(e)}", exc_info=True)
+            self.governor.failure(DETAIL, "详情页打开失败")
             return None
         finally:
             try:
-                self.driver.close()
+                if new_window:
+                    self.driver.close()
                 self.driver.switch_to.window(self.main_window)
             except Exception as close_e:
                 logging.warning(f"窗口关闭异常: {str(close_e)}")
 
-    def extract_current_links(self):
-        """实时提取当前可见的笔记链接（精确版）"""
-        current_links = set()
-        try:
-            items = self.driver.find_elements(By.CSS_SELECTOR, '.note-item')
-            for item in items:
+    @timed('detail_batch')
+    def process_notes_batch(self, origin_note_urls: list) -> list:
+        """多标签并发处理一批笔记：一起打开、并行加载，再逐个切换提取
+
+        每个标签页最多等到打开后限速器给出的详情等待上限（与单标签模式一致），详情就绪即提前提取，
+        各标签的等待相互重叠；返回值与 origin_note_urls 一一对应，失败为 None。
+        """
+        settle = self.governor.timeout(DETAIL)
+        tabs = []
+        self.driver.switch_to.window(self.main_window)
+        for origin_note_url in origin_note_urls:
+            note_url = convert_xhs_url(origin_note_url)
+            print(f"打开URL: {origin_note_url} -> {note_url}")
+            try:
+                self.governor.acquire(DETAIL)
+                before = set(self.driver.window_handles)
+                self.driver.execute_script("window.open(arguments[0]);", note_url)
+                handle = (set(self.driver.window_handles) - before).pop()
+                tabs.append((note_url, handle, time.time()))
+            except Exception as e:
+                logging.error(f"打开标签页失败 {note_url}: {str(e)}")
+                tabs.append((note_url, None, 0))
+            time.sleep(self.tab_open_interval)
+
+        results = []
+        for note_url, handle, opened_at in tabs:
+            if handle is None:
+                results.append(None)
+                continue
+            try:
+                self.driver.switch_to.window(handle)
+                if self.lean:
+                    self.lean.cover()
+                WebDriverWait(self.driver, 15).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, ".note-container"))
+                )
+                # 已就绪的标签立即提取，否则最多等到打开后 settle 秒
+                remaining = opened_at + settle - time.time()
+                ready = self.waiter.wait('detail', DetailReady(self.driver), remaining, floor=0)
+                self.governor.report(DETAIL, ready, "详情页未就绪")
+                results.append(self._scrape_note(note_url))
+            except Exception as e:
+                logging.error(f"笔记处理失败 {note_url}: {str(e)}", exc_info=True)
+                self.governor.failure(DETAIL, "详情页打开失败")
+                results.append(None)
+            finally:
                 try:
-                    # 通过精确的 CSS 选择器定位笔记链接
-                    link_element = item.find_element(
-                        By.CSS_SELECTOR, 'a.cover.mask.ld[href^="/user/profile/"]'
-                    )
-                    raw_url = link_element.get_attribute('href')
-
-                    # 清洗 URL 的两种方式（根据需求选择一种）
-                    # 方案二：完全原始 URL（不推荐）
-                    clean_url = raw_url.replace('&amp;', '&')  # 转换 HTML 实体
-
-                    current_links.add(clean_url)
-                except Exception as e:
-                    continue
+                    self.driver.close()
+                except Exception as close_e:
+                    logging.warning(f"窗口关闭异常: {str(close_e)}")
+        self.driver.switch_to.window(self.main_window)
+        return results
+
+    @timed('extract')
+    def _scrape_note(self, note_url: str) -> Dict:
+        """从当前标签页提取笔记详情"""
+        if self.capture:
+            record = self.capture.note_record(note_url)
+            if record:
+                print(f"接口数据: 时间 {record['auth_time']}，点赞 {record['like_count']}，"
+                      f"图片 {len(record['images'])} 张，标题: {record['title']}")
+                return record
+        # 一次往返取回详情页快照，字段解析在本地完成
+        snapshot = fetch_note_snapshot(self.driver)
+        fields, missing = build_note_fields(snapshot, parse_xhs_time)
+        for name in missing:
+            logging.warning(f"{name}提取失败: 页面中未找到对应元素")
+        print(f"解析时间: {fields['raw_time']} -> {fields['auth_time']}")
+        print(f"提取到点赞数: {fields['like_count']}")
+        if fields['is_video']:
+            print(f"检测到视频笔记，提取到封面: {fields['images']}")
+        else:
+            print(f"是图文笔记，提取到图片 {len(fields['images'])} 张")
+        print(f"提取到内容: {fields['content'][:50]}...")  # 防止日志过长
+        print(f"提取到标题: {fields['title']}")
+
+        baseUrl = note_url.split('?')[0]
+        return {
+            'images': fields['images'],
+            'content': fields['content'],
+            'url': baseUrl,
+            'title': fields['title'],
+            'auth_time': fields['auth_time'],
+            'like_count': fields['like_count'],
+        }
+
+    def extract_current_links(self, cards=None):
+        """实时提取当前可见的笔记链接（单次 execute_script 批量提取），按页面顺序返回 {笔记ID: 链接}"""
+        current_links = {}
+        try:
+            if cards is None:
+                cards = fetch_note_cards(self.driver)
+            for card in cards:
+                # 只保留 /user/profile/ 形式的笔记链接（已转换 HTML 实体）
+                key = note_key(card['href']) if card['profile_link'] else b''
+                if key:
+                    current_links.setdefault(key, card['href'])
         except Exception as e:
             logging.warning(f"提取链接时遇到异常: {str(e)}")
         return current_links
 
+    @timed('scroll')
     def smart_scroll(self, spd_setting=1, max_scroll=20):
         """智能滚动采集（动态保存链接）"""
         total_scroll = 0
         no_new_count = 0
         max_no_new = 6
         last_height = 0
+        known_run = KnownRun(self.known_stop)
+        start_ts = time.time()
 
         # 新增：记录最大滚动次数
-        logging.info(f"智能滚动设置: 最大滚动次数={max_scroll}")
+        logging.info(f"智能滚动设置: 最大滚动次数={max_scroll}，连续 {self.known_stop} 条已采集即停止")
 
 
         while no_new_count < max_no_new and total_scroll < max_scroll:
-            # 获取当前屏幕可见链接
-            current_links = self.extract_current_links()
-            # 关键修复：逐个转换链接
-            converted_new_links = {
-                convert_xhs_url(link).split('?')[0]
-                for link in (current_links - self.all_links)
-            }
-            new_links = converted_new_links - self.all_links
+            if self.capture:
+                self.capture.poll()  # 收集上一次滚动加载的笔记列表接口响应
+            # 获取当前屏幕可见卡片（一次往返）
+            try:
+                cards = fetch_note_cards(self.driver)
+            except Exception as e:
+                logging.warning(f"提取链接时遇到异常: {str(e)}")
+                cards = []
+            current_links = self.extract_current_links(cards)
+            new_keys = [key for key in current_links if key not in self.all_links]
+
+            # 本次滚动的新笔记一次性批量去重
+            existing = {note_key(url) for url in self.check_existing(explore_url(key) for key in new_keys)}
+            self.existing_links.update(existing)
+            # 已采集的笔记只记ID，不保留链接
+            for key in new_keys:
+                self.all_links[key] = '' if key in existing else current_links[key]
+            if self.progress:
+                self.progress.save_links(self.all_links, self.existing_links)
 
             # 快速模式即时处理
-            if spd_setting == 2 and new_links:
-                self.process_quick_data(new_links)  # 直接传递已转换的链接集合
-
-            # 更新全局链接集合（使用原始链接）
-            self.all_links.update(current_links)
-            logging.info(f"当前总链接数：{len(self.all_links)} 新增：{len(new_links)}")
-
-            # 执行滚动
+            fresh = {key for key in new_keys if key not in existing}
+            if spd_setting == 2 and fresh:
+                self.process_quick_data(fresh, cards)  # 复用本次滚动已提取的卡片
+
+            logging.info(f"当前总链接数：{len(self.all_links)} 新增：{len(new_keys)}")
+
+            # 主页按时间倒序：连续 known_stop 条已采集笔记之后不会再有新笔记，提前结束滚动
+            if known_run.update(key in existing for key in new_keys):
+                saved = max_scroll - total_scroll
+                per_scroll = (time.time() - start_ts) / total_scroll if total_scroll else self.governor.timeout(PAGE)
+                logging.info(f"连续 {known_run.run} 条已采集笔记，提前停止滚动：已滚动 {total_scroll} 次，"
+                             f"节省 {saved} 次滚动 / 约 {saved * per_scroll:.0f}s")
+                break
+
+            # 执行滚动，等待新卡片出现且页面高度稳定（最长为限速器给出的滚动等待上限）
+            self.governor.acquire(PAGE)
+            feed_loaded = FeedLoaded(self.driver)
             self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(1.5 * self.wait_rate)  # 等待新内容加载
+            if self.waiter.wait('scroll', feed_loaded, self.governor.timeout(PAGE)):
+                self.governor.success(PAGE)
+            elif not self.all_links:
+                # 到底后的超时是正常的；一条笔记都没有加载出来才算被限流/空页面
+                self.governor.failure(PAGE, "主页没有加载出笔记")
 
             # 检查滚动是否生效
             new_height = self.driver.execute_script("return document.body.scrollHeight")
@@ -375,8 +392,11 @@ class XHSCrawler:
 
             total_scroll += 1
 
-    def crawl_author(self, brand: Dict):
-        """处理单个作者（支持三种采集模式）"""
+    def crawl_author(self, brand: Dict, max_scroll: Optional[int] = None):
+        """处理单个作者（支持三种采集模式），max_scroll 不为空时覆盖默认的滚动上限"""
+        self.metrics.begin_brand(brand['brand_name'])
+        if self.traffic:
+            self.traffic.begin_brand()
         try:
             spd_setting = brand.get('rednote_spd_setting', 1)  # 获取采集配置
             logging.info(f"品牌[{brand['brand_name']}]采集配置: {spd_setting}")
@@ -385,33 +405,30 @@ class XHSCrawler:
                 logging.info(f"品牌[{brand['brand_name']}]配置不采集，跳过")
                 return True
 
-            # 新增：检查已采集数量
-            collected_count = self.get_collected_count(brand['id'])
-            logging.info(f"品牌[{brand['brand_name']}]已采集数量: {collected_count}")
-
-            # 新增：如果全量采集且已采集>20，则不滚动
-            max_scroll = 1 if (spd_setting == 1 and collected_count > 20) else 20
-
-            self.driver.get(brand['rednote_url'])
-            self.smart_scroll(spd_setting, max_scroll)  # 传入采集模式参数
+            pending = self.discover(brand, spd_setting, max_scroll)
 
             # 全量采集模式处理
             if spd_setting == 1:
-                for note_url in self.all_links:
-                    base_url = convert_xhs_url(note_url).split('?')[0]
-                    if self.url_checker and self.url_checker(base_url):
-                        logging.info(f"已处理过，跳过: {base_url}")
-                        continue
-
-                    detail = self.process_single_note(note_url)
-                    if detail:
+                # 每批最多 detail_tabs 个标签页同时加载
+                for start in range(0, len(pending), self.detail_tabs):
+                    batch = pending[start:start + self.detail_tabs]
+                    if len(batch) == 1:
+                        details = [self.process_single_note(batch[0])]
+                    else:
+                        details = self.process_notes_batch(batch)
+                    for detail in details:
+                        if not detail:
+                            continue
                         detail.update({
                             'brand_id': brand['id'],
                             'brand_name': brand['brand_name']
                         })
                         if self.insert_callback:
                             try:
-                                self.insert_callback(detail)
+                                with self.metrics.span('insert'):
+                                    self.insert_callback(detail)
+                                if self.progress:
+                                    self.progress.note_written(note_key(detail['url']))
                             except Exception as e:
                                 logging.error(f"数据库插入失败: {str(e)}")
 
@@ -426,93 +443,165 @@ class XHSCrawler:
                     })
                     if self.insert_callback:
                         try:
-                            self.insert_callback(quick_data)
+                            with self.metrics.span('insert'):
+                                self.insert_callback(quick_data)
                         except Exception as e:
                             logging.error(f"数据库插入失败: {str(e)}")
                 logging.info(f"快速采集数据入库成功: {len(self.collected_quick_data)} 条")
 
-            # 清理采集缓存
-            self.all_links.clear()
-            self.collected_quick_data.clear()
+            # 缓冲中的笔记提交后才删除品牌断点
+            if self.progress and self.progress.commit_written():
+                self.progress.clear()
             return True
         except Exception as e:
             logging.error(f"作者采集失败 {brand['rednote_url']}: {str(e)}")
             return False
+        finally:
+            # 成功、跳过或失败都清掉本品牌的链接和去重缓存，不影响下一个品牌（断点已另存在文件中）
+            self.reset_brand()
+            self.progress = None
+            if self.traffic:
+                self.traffic.end_brand(self.metrics)
+            self.metrics.end_brand()
+            self.keeper.tick(self.driver)
+
+    def discover(self, brand: Dict, spd_setting: int, max_scroll: Optional[int] = None) -> list:
+        """打开主页并滚动收集链接，返回全量模式下待打开的详情链接（快速模式的数据在 collected_quick_data 中）"""
+        # 新增：检查已采集数量
+        collected_count = self.get_collected_count(brand['id'])
+        logging.info(f"品牌[{brand['brand_name']}]已采集数量: {collected_count}")
+
+        # 开启提前停止时由滚动中遇到的已采集笔记决定停在哪里；否则沿用全量采集且已采集>20 则只滚动一次
+        if max_scroll is None:
+            if self.known_stop > 0:
+                max_scroll = 20
+            else:
+                max_scroll = 1 if (spd_setting == 1 and collected_count > 20) else 20
+
+        # 全量采集记录品牌断点；上次中断时恢复已收集的链接，滚动已完成则直接处理剩余笔记
+        if self.checkpoint and spd_setting == 1:
+            self.progress = BrandProgress(self.checkpoint, brand['id'], commit=self.flush_callback)
+            if self.progress.load():
+                self.all_links.update(self.progress.links)
+                self.existing_links.update(self.progress.existing)
+                # 上次中断前已提交、但还没记入断点的笔记：按数据库再判定一次，不重复写入
+                unsettled = [key for key in self.progress.links
+                             if key not in self.progress.existing and key not in self.progress.processed]
+                self.existing_links.update(note_key(url) for url in
+                                           self.check_existing(explore_url(key) for key in unsettled))
+                logging.info(f"品牌[{brand['brand_name']}]从断点继续：已收集链接 {len(self.progress.links)}，"
+                             f"已处理 {len(self.progress.processed)}，滚动{'已' if self.progress.scrolled else '未'}完成")
+
+        if not (self.progress and self.progress.scrolled):
+            self.governor.acquire(PAGE)
+            with self.metrics.span('page_load'):
+                self.driver.get(brand['rednote_url'])
+            self.smart_scroll(spd_setting, max_scroll)  # 传入采集模式参数
+            if self.progress:
+                self.progress.save_links(self.all_links, self.existing_links, scrolled=True)
+
+        pending = []
+        if spd_setting == 1:
+            for key, note_url in self.all_links.items():
+                if key in self.existing_links or (self.progress and key in self.progress.processed):
+                    logging.info(f"已处理过，跳过: {explore_url(key)}")
+                    continue
+                pending.append(note_url)
+        return pending
+
+    def reset_brand(self):
+        """清理单个品牌的采集缓存"""
+        self.all_links.clear()
+        self.existing_links.clear()
+        self.seen_links.clear()
+        self.collected_quick_data.clear()
+        if self.capture:
+            self.capture.reset()
+
+    @timed('dedup')
+    def check_existing(self, urls) -> set:
+        """批量去重：优先一次批量查询，未提供批量接口时退回逐条检查"""
+        urls = set(urls)
+        if not urls:
+            return set()
+        if self.batch_url_checker:
+            return set(self.batch_url_checker(urls))
+        if self.url_checker:
+            return {url for url in urls if self.url_checker(url)}
+        return set()
 
     def get_collected_count(self, brand_id: int) -> int:
         """查询该品牌已采集数量"""
-        # 使用url_checker函数（即db.is_url_exists）的底层连接执行查询
+        # 通过url_checker函数（即db.is_url_exists）所属的数据库对象查询
         if self.url_checker and hasattr(self.url_checker, '__self__'):
             db = self.url_checker.__self__
             try:
-                with db.connection.cursor() as cursor:
-                    sql = "SELECT COUNT(*) AS count FROM spider_log WHERE brand_id = %s"
-                    cursor.execute(sql, (brand_id,))
-                    result = cursor.fetchone()
-                    return result['count'] if result else 0
+                return db.count_collected(brand_id)
             except Exception as e:
                 logging.error(f"查询已采集数量失败: {str(e)}")
                 return 0
         return 0
 
-    def process_quick_data(self, new_links):
-        """快速采集模式数据处理"""
-        current_items = self.driver.find_elements(By.CSS_SELECTOR, '.note-item')
-        for item in current_items:
+    def process_quick_data(self, new_keys: set, cards=None):
+        """快速采集模式数据处理（new_keys 为已完成去重的笔记ID，处理过的会从中移除）"""
+        if cards is None:
+            cards = fetch_note_cards(self.driver)
+        for card in cards:
             try:
-                link = item.find_element(By.CSS_SELECTOR, 'a.cover.mask.ld').get_attribute('href')
-                clean_url = convert_xhs_url(link).split('?')[0]
-
-                # 新增数据库去重检查
-                if self.url_checker and self.url_checker(clean_url):
-                    logging.info(f"已存在，跳过快速采集: {clean_url}")
-                    continue
-
-                if clean_url not in new_links:
+                key = note_key(card['href'])
+                if key not in new_keys:
                     continue
+                new_keys.discard(key)  # 同一笔记的多张卡片只处理一次
+                clean_url = explore_url(key)
 
                 # 提取首图
-                try:
-                    img = item.find_element(By.CSS_SELECTOR, 'img[src*="xhscdn.com"]')
-                    cover_url = img.get_attribute('src').split('?')[0]
-                except Exception as e:
-                    logging.warning(f"首图提取失败: {str(e)}")
-                    cover_url = ""
+                cover_url = card['cover'].split('?')[0]
+                if not cover_url:
+                    logging.warning(f"首图提取失败: {clean_url}")
 
                 # 提取标题
-                try:
-                    title = item.find_element(By.CSS_SELECTOR, '.title > span').text[:600]
-                except Exception as e:
+                if card['title'] is None:
                     title = "无标题"
-                    logging.warning(f"标题提取失败: {str(e)}")
+                    logging.warning(f"标题提取失败: {clean_url}")
+                else:
+                    title = card['title'][:600]
 
-                self.collected_quick_data.append({
+                quick_data = {
                     'url': clean_url,
                     'images': [cover_url] if cover_url else [],
                     'title': title,
                     'content': ''
-                })
+                }
+                # 列表接口里有完整标题和准确点赞数时优先使用
+                feed = self.capture.feed_note(card['note_id']) if self.capture else None
+                if feed:
+                    quick_data['title'] = feed['title'][:600] or title
+                    if feed['cover'] and not cover_url:
+                        quick_data['images'] = [feed['cover']]
+                    quick_data['like_count'] = feed['like_count']
+                self.collected_quick_data.append(quick_data)
             except Exception as e:
                 logging.error(f"快速采集异常: {str(e)}")
 
 
 class DatabaseManager:
     def __init__(self):
-        self.connection = pymysql.connect(
-            host='111.229.182.88',
-            port=3306,
-            user='root',
-            password='s*xNvd%v@',
-            database='sukitime',
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor
-        )
+        # 连接池 + 数据库线程：运行中的写入和回查都在数据库线程执行，断线自动重连
+        self.pool = ConnectionPool(**DB_CONFIG)
+        self.connection = self.pool.acquire()  # 主线程：启动时读取品牌、加载索引和排期
+        self.service = DBService(self.pool)
+        # 已采集笔记ID的内存索引，替代逐条 SELECT 去重
+        self.note_index = NoteIndex('spider_log')
+        self.note_index.load(self.connection)
+        # 缓冲写入，按行数/时间阈值批量提交（在数据库线程）
+        self.writer = BufferedWriter(self.service.connection, SPIDER_LOG)
+        self.service.on_idle(self.writer.flush_due)
 
     def fetch_brand_urls(self) -> list:
         with self.connection.cursor() as cursor:
             # and id not in (SELECT DISTINCT brand_id from spider_log )
             sql = """
-                SELECT id, brand_name, rednote_url, rednote_spd_setting 
+                SELECT id, brand_name, rednote_url, rednote_spd_setting, spider_index, last_gather_time
                 FROM brand 
                 WHERE rednote_url != '' AND is_delete = 0 AND is_brand = 1
                 ORDER BY spider_index DESC, last_gather_time ASC
@@ -521,79 +610,102 @@ class DatabaseManager:
             return cursor.fetchall()
 
     def update_last_gather_time(self, brand_id: int):
-        with self.connection.cursor() as cursor:
+        """入队即返回：数据库线程先提交缓冲中的笔记，全部提交后才更新采集时间"""
+        self.service.post(self._update_last_gather_time, brand_id, retry=True)
+
+    def _update_last_gather_time(self, brand_id: int):
+        if not self.writer.commit():
+            raise RuntimeError("缓冲中的记录未能提交，不更新采集时间")
+        with self.service.connection.cursor() as cursor:
             sql = "UPDATE brand SET last_gather_time = NOW() WHERE id = %s"
             cursor.execute(sql, (brand_id,))
-            self.connection.commit()
+            self.service.connection.commit()
 
     def is_url_exists(self, title: str) -> bool:
-        with self.connection.cursor() as cursor:
+        exists = self.note_index.lookup(title)
+        if exists is not None:
+            return exists
+        return self.service.call(self._url_exists, title, retry=True)
+
+    def _url_exists(self, url: str) -> bool:
+        with self.service.connection.cursor() as cursor:
             sql = "SELECT 1 FROM spider_log WHERE url = %s LIMIT 1"
-            cursor.execute(sql, (title,))
+            cursor.execute(sql, (url,))
             return bool(cursor.fetchone())
 
+    def count_collected(self, brand_id: int) -> int:
+        """查询该品牌已采集数量"""
+        return self.service.call(self._count_collected, brand_id, retry=True)
+
+    def _count_collected(self, brand_id: int) -> int:
+        with self.service.connection.cursor() as cursor:
+            sql = "SELECT COUNT(*) AS count FROM spider_log WHERE brand_id = %s"
+            cursor.execute(sql, (brand_id,))
+            result = cursor.fetchone()
+            return result['count'] if result else 0
+
+    def existing_urls(self, urls) -> set:
+        """批量判断哪些 URL 已存在（先查内存索引，其余合并为一次 IN 查询）"""
+        existing, unknown = self.note_index.split_known(urls)
+        if unknown:
+            existing.update(self.service.call(query_existing_urls, self.service.connection, 'spider_log',
+                                              unknown, retry=True))
+        return existing
+
     def insert_one(self, data: Dict):
-        """单条插入优化"""
-        with self.connection.cursor() as cursor:
-            sql = """
-                INSERT INTO spider_log (
-                    msg_type, status, origin_type, title, 
-                    content, url, images, brand_id, 
-                    brand_name, auth_time, created_at, updated_at, likes
-                ) VALUES (
-                    %s, %s, %s, %s, 
-                    %s, %s, %s, %s, 
-                    %s, %s, %s, %s, %s
-                )
-            """
-            cursor.execute(sql, (
-                0, 0, 'xhs',
-                data['title'],
-                data['content'],
-                data['url'],
-                ','.join(data['images']),
-                data['brand_id'],
-                data['brand_name'],
-                data.get('auth_time', 0),
-                int(time.time()),
-                int(time.time()),
-                data.get('like', 0)
-            ))
-            self.connection.commit()
+        """单条写入（入队即返回，数据库线程中进入缓冲区，达到阈值后批量提交）"""
+        self.note_index.add(data['url'])
+        self.service.post(self.writer.add, data)
 
     def batch_insert(self, data: list):
-        """批量插入优化"""
-        with self.connection.cursor() as cursor:
-            sql = """
-                INSERT INTO spider_log (
-                    msg_type, status, origin_type, title, 
-                    content, url, images, brand_id, 
-                    brand_name, created_at, updated_at
-                ) VALUES (
-                    %s, %s, %s, %s, 
-                    %s, %s, %s, %s, 
-                    %s, %s, %s
-                )
-            """
-            batch = []
-            for item in data:
-                batch.append((
-                    0, 0, 'xhs',
-                    item['title'],
-                    item['content'],
-                    item['url'],
-                    ','.join(item['images']),
-                    item['brand_id'],
-                    item['brand_name'],
-                    int(time.time()),
-                    int(time.time())
-                ))
-
-            cursor.executemany(sql, batch)
-            self.connection.commit()
+        """批量插入（写入全部字段，立即提交）"""
+        for item in data:
+            self.insert_one(item)
+        self.flush()
+
+    def flush(self) -> bool:
+        """等待队列中的写入完成并提交缓冲区，全部提交时返回 True"""
+        return self.service.call(self.writer.commit)
+
+    def close(self):
+        """执行完剩余的写入后停止数据库线程并关闭连接"""
+        self.service.close()
+        logging.info(self.service.summary())
+        self.pool.release(self.connection)
+        self.pool.close()
 
 
 def main():
+    parser = argparse.ArgumentParser(description="小红书品牌笔记采集")
+    parser.add_argument('--workers', type=int, default=1, help="并行浏览器进程数，大于 1 时启用进程池")
+    parser.add_argument('--tabs', type=int, default=1, help="每个浏览器同时加载的详情标签页数")
+    parser.add_argument('--wait-floor', type=float, default=0.5, help="就绪等待的最短秒数")
+    parser.add_argument('--known-stop', type=int, default=10,
+                        help="滚动中连续遇到多少条已采集笔记即停止滚动，0 为不提前停止")
+    parser.add_argument('--capture', action='store_true', help="从网络接口响应中解析笔记数据（取不到时仍走页面提取）")
+    parser.add_argument('--no-schedule', action='store_true', help="不按发帖频率排期，按 spider_index/上次采集时间顺序全部采集")
+    parser.add_argument('--max-stale-days', type=float, default=14, help="距上次采集超过该天数的品牌强制采集")
+    parser.add_argument('--min-expected', type=float, default=0.5, help="预计新笔记数低于该值的品牌本轮推迟")
+    parser.add_argument('--dry-run', action='store_true', help="只输出采集计划，不启动浏览器")
+    parser.add_argument('--metrics-out', default='xhs_metrics.json',
+                        help="阶段耗时导出文件，.prom 为 Prometheus 文本格式，其余为 JSON；为空不导出")
+    parser.add_argument('--checkpoint', default='xhs_checkpoint.json', help="采集断点文件，为空不记录断点")
+    parser.add_argument('--resume', action='store_true', help="从上次中断的位置继续（跳过已完成的品牌和已处理的笔记）")
+    parser.add_argument('--pipeline', type=int, default=0,
+                        help="分阶段流水线：1 个浏览器滚动发现 + N 个浏览器抓取详情，0 为不启用")
+    parser.add_argument('--queue-size', type=int, default=40, help="流水线各阶段之间的队列长度")
+    parser.add_argument('--lean', action='store_true', help="精简模式：无头运行，拦截图片/视频/字体（需已保存 Cookie）")
+    parser.add_argument('--traffic', default='',
+                        help="按品牌记录网络流量和加载耗时到指定文件（如 xhs_traffic.json），用于精简模式与常规模式对比；默认不统计")
+    parser.add_argument('--user-data-dir', default='',
+                        help="持久化浏览器用户目录（如 xhs_profile），保留登录状态和缓存，重启后跳过 Cookie 登录")
+    parser.add_argument('--attach', default='',
+                        help="附着到已运行的调试端口 Chrome（如 127.0.0.1:9222），进程池/流水线用逗号分隔多个地址")
+    parser.add_argument('--image-cache', default='',
+                        help="写入后把笔记图片下载到该目录（按内容寻址，如 xhs_images），为空不下载")
+    parser.add_argument('--image-concurrency', type=int, default=8, help="图片同时下载数")
+    args = parser.parse_args()
+
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(levelname)s - %(message)s',
@@ -608,26 +720,93 @@ def main():
                                               errors='replace'))
         ]
     )
+    scheduler = None
+    if not args.no_schedule:
+        scheduler = BrandScheduler('spider_log', 'rednote_spd_setting',
+                                   max_stale_days=args.max_stale_days, min_expected=args.min_expected)
+
+    # 启动浏览器前离线检查登录会话：无头且需要手动登录时直接退出
+    interactive = not args.lean or bool(args.user_data_dir or args.attach)
+    if not args.dry_run and not preflight(SessionStore(), SESSION_ACCOUNT, interactive):
+        return
+
+    if args.workers > 1 and not args.dry_run:
+        from xhs_pool import run_pool
+        # 图片由主进程在写入后统一下载
+        images = ImageStage(args.image_cache, args.image_concurrency) if args.image_cache else None
+        try:
+            run_pool('brand', args.workers, {'detail_tabs': args.tabs, 'wait_floor': args.wait_floor,
+                                             'capture': args.capture, 'known_stop': args.known_stop,
+                                             'lean': args.lean, 'traffic': args.traffic,
+                                             'user_data_dir': args.user_data_dir, 'attach': args.attach,
+                                             'governor': Governor()},
+                     scheduler=scheduler, metrics_out=args.metrics_out,
+                     checkpoint=args.checkpoint, resume=args.resume, image_stage=images)
+        finally:
+            if images:
+                images.close()
+        return
+
     print("初始化DB")
     db = DatabaseManager()
+    brands = db.fetch_brand_urls()
+    checkpoint = Checkpoint(args.checkpoint)
+    resumed = checkpoint.resume(brands) if args.resume else None
+    if resumed is not None:
+        brands = resumed
+    elif scheduler:
+        brands = scheduler.schedule(db.connection, brands)
+    if args.dry_run:
+        db.close()
+        return
+    if resumed is None:
+        checkpoint.start(brands)
+    # 可选：写入后在后台下载笔记图片到本地缓存（xhs_images）
+    images = ImageStage(args.image_cache, args.image_concurrency) if args.image_cache else None
+
+    if args.pipeline > 0:
+        from xhs_pipeline import run_pipeline
+        try:
+            run_pipeline(XHSCrawler, db, brands, args.pipeline,
+                         {'detail_tabs': args.tabs, 'wait_floor': args.wait_floor,
+                          'capture': args.capture, 'known_stop': args.known_stop,
+                          'lean': args.lean, 'traffic': args.traffic,
+                          'user_data_dir': args.user_data_dir, 'attach': args.attach,
+                          'governor': Governor()},
+                         queue_size=args.queue_size, checkpoint=checkpoint, metrics_out=args.metrics_out,
+                         image_stage=images)
+        finally:
+            if images:
+                images.close()
+            db.flush()
+            logging.info(db.note_index.summary())
+            db.close()
+        return
     print()
-    crawler = XHSCrawler(url_checker=db.is_url_exists, insert_callback=db.insert_one)
+    crawler = XHSCrawler(url_checker=db.is_url_exists,
+                         insert_callback=images.wrap(db.insert_one) if images else db.insert_one,
+                         batch_url_checker=db.existing_urls, flush_callback=db.flush, detail_tabs=args.tabs,
+                         wait_floor=args.wait_floor, capture=args.capture,
+                         known_stop=args.known_stop, checkpoint=args.checkpoint,
+                         lean=args.lean, traffic=args.traffic, user_data_dir=args.user_data_dir,
+                         attach=args.attach.split(',')[0].strip())
 
     try:
         print("准备登录")
         crawler.login()
 
-        for brand in db.fetch_brand_urls():
+        for brand in brands:
             try:
                 logging.info(f"处理品牌: {brand['brand_name']}")
 
                 # if crawler.url_checker(brand['rednote_url']):
                 #     logging.info(f"已处理过，跳过: {brand['brand_name']}")
                 #     continue
-                if crawler.crawl_author(brand):
-                    # 采集成功时更新采集时间
+                # 采集成功且缓冲中的笔记已提交时才更新采集时间、记入运行断点
+                if crawler.crawl_author(brand) and db.flush():
                     db.update_last_gather_time(brand['id'])
                     logging.info(f"已更新采集时间: {brand['brand_name']}")
+                    checkpoint.brand_done(brand['id'])
 
                 # 批量写入数据库
                 # db.batch_insert(crawler.notes_data)
@@ -640,10 +819,23 @@ def main():
             except Exception as e:
                 logging.error(f"品牌处理异常 {brand['brand_name']}: {str(e)}")
                 continue
+        checkpoint.finish()
 
     finally:
+        if images:
+            images.close()
+        db.flush()
+        logging.info(crawler.waiter.summary())
+        logging.info(crawler.governor.summary())
+        if crawler.capture:
+            logging.info(crawler.capture.summary())
+        if crawler.traffic:
+            logging.info(crawler.traffic.summary())
+        logging.info(crawler.metrics.summary())
+        crawler.metrics.export(args.metrics_out)
         crawler.driver.quit()
-        db.connection.close()
+        logging.info(db.note_index.summary())
+        db.close()
         logging.info("爬虫任务正常结束")
 
 
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+浏览器启动复用
+- 持久化用户目录（--user-data-dir）：Cookie、登录状态和缓存保存在目录里，重启后打开首页即已登录，
+  不再加载 pickle Cookie、刷新和等待侧边栏
+- 附着到已运行的调试端口 Chrome（--attach 127.0.0.1:9222）：不启动新浏览器，沿用其中已登录的会话
+  先手动启动：chrome --remote-debugging-port=9222 --user-data-dir=<目录>
+  附着时 Chrome 启动参数（无头、精简模式参数等）不生效，由启动 Chrome 的命令决定
+- stealth.min.js 每个进程只读取一次；注入脚本绑定在 driver 会话上，每个会话仍需注入一次
+- 同一用户目录不能被两个 Chrome 同时使用：进程池/流水线中第 0 个浏览器使用 <目录>，第 i 个使用 <目录>-<i>；
+  附着地址用逗号分隔，按序号逐个分配
+- 首个品牌开始时记录距启动的耗时（Metrics 的 first_brand 阶段），可对比冷启动与复用
+"""
+
+import functools
+import logging
+import os
+from typing import Dict, Optional
+
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+
+STEALTH_PATH = './stealth.min.js'
+SIDEBAR = (By.CLASS_NAME, 'user.side-bar-component')  # 登录后才出现的侧边栏
+
+
+@functools.lru_cache(maxsize=None)
+def load_stealth(path: str = STEALTH_PATH) -> str:
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def startup_mode(user_data_dir: str = '', attach: str = '') -> str:
+    """cold / profile / attach，记入 Metrics.startup"""
+    if attach:
+        return 'attach'
+    return 'profile' if user_data_dir else 'cold'
+
+
+def attach_options(address: str):
+    """附着到 address 上的 Chrome；debuggerAddress 不能与 excludeSwitches 等启动选项同时使用"""
+    options = webdriver.ChromeOptions()
+    options.debugger_address = address
+    return options
+
+
+def use_profile(options, user_data_dir: str):
+    """持久化用户目录（不存在时由 Chrome 创建）"""
+    options.add_argument(f"--user-data-dir={os.path.abspath(user_data_dir)}")
+
+
+def browser_options(options: Dict, index: int) -> Dict:
+    """进程池/流水线中第 index 个浏览器的构造参数：用户目录加序号（第 0 个不加），附着地址按序号取"""
+    options = dict(options)
+    if options.get('user_data_dir') and index:
+        options['user_data_dir'] = f"{options['user_data_dir']}-{index}"
+    if options.get('attach'):
+        addresses = [a.strip() for a in options['attach'].split(',') if a.strip()]
+        if index >= len(addresses):
+            raise ValueError(f"附着地址不足：第 {index} 个浏览器没有可用的调试端口（--attach 用逗号分隔多个地址）")
+        options['attach'] = addresses[index]
+    return options
+
+
+def session_logged_in(driver, logger: Optional[logging.Logger] = None) -> bool:
+    """附着/复用的浏览器已停在已登录的小红书页面时返回 True，并关闭上次遗留的其他标签页"""
+    logger = logger or logging.getLogger(__name__)
+    try:
+        if 'xiaohongshu.com' not in driver.current_url or not driver.find_elements(*SIDEBAR):
+            return False
+        current = driver.current_window_handle
+        for handle in driver.window_handles:
+            if handle != current:
+                driver.switch_to.window(handle)
+                driver.close()
+        driver.switch_to.window(current)
+        return True
+    except Exception as e:
+        logger.warning(f"检查已有会话失败: {str(e)}")
+        return False
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+网络响应抓取（可选）
+- 通过 chromedriver 的 performance 日志拿到 CDP Network 事件，筛出主页笔记列表/笔记详情接口
+- 请求完成后用 Network.getResponseBody 取回 JSON，解析成与 DOM 提取相同的记录字典
+- 直接打开的详情页由服务端渲染、没有详情接口请求，此时退回读取 window.__INITIAL_STATE__
+- 接口拿不到数据时调用方继续走 DOM 快照提取，不影响原流程
+
+启用：创建 driver 前对 ChromeOptions 调用 enable_capture(options)
+"""
+
+import base64
+import json
+import logging
+from typing import Dict, List, Optional
+
+from xhs_text import note_id_of, parse_like_count
+
+FEED_API = '/api/sns/web/v1/user_posted'  # 主页笔记列表（滚动加载）
+DETAIL_API = '/api/sns/web/v1/feed'       # 笔记详情
+
+# 服务端渲染的详情数据（Vue 响应式对象先取原始值再序列化）
+INITIAL_STATE_JS = r"""
+var s = window.__INITIAL_STATE__;
+if (!s || !s.note || !s.note.noteDetailMap) { return null; }
+try {
+    var map = s.note.noteDetailMap;
+    var raw = map._rawValue || map._value || map;
+    return JSON.stringify(raw);
+} catch (e) {
+    return null;
+}
+"""
+
+
+def enable_capture(options):
+    """打开 performance 日志（含 Network 事件），须在创建 driver 前调用"""
+    options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+
+def _pick(data: Dict, *keys, default=None):
+    """同一字段在接口里是下划线命名，在 __INITIAL_STATE__ 里是驼峰命名"""
+    for key in keys:
+        if isinstance(data, dict) and data.get(key) is not None:
+            return data[key]
+    return default
+
+
+def _image_url(image: Dict) -> str:
+    url = _pick(image, 'url_default', 'urlDefault', default='')
+    if not url:
+        for info in _pick(image, 'info_list', 'infoList', default=[]):
+            if info.get('url'):
+                url = info['url']
+                if _pick(info, 'image_scene', 'imageScene') in ('WB_DFT', 'CRD_WM_WEBP'):
+                    break
+    if not url:
+        url = image.get('url', '')
+    return url
+
+
+def _like_count(interact: Dict) -> int:
+    liked = _pick(interact, 'liked_count', 'likedCount', default='')
+    return parse_like_count(str(liked).rstrip('+'))
+
+
+def parse_note_card(card: Dict) -> Dict:
+    """解析详情接口的 note_card（或 __INITIAL_STATE__ 中的 note）
+
+    返回 images/content/title/auth_time/like_count/is_video，与 DOM 提取的字段一致
+    """
+    is_video = card.get('type') == 'video'
+    images = []
+    for image in _pick(card, 'image_list', 'imageList', default=[]):
+        url = _image_url(image)
+        if url and url not in images:
+            images.append(url)
+    if is_video:
+        # 视频笔记只保留封面
+        images = images[:1]
+    publish_ms = _pick(card, 'time', default=0) or 0
+    return {
+        'images': images,
+        'content': (card.get('desc') or '').replace('\n', ' ').strip()[:2000],
+        'title': (card.get('title') or '').strip(),
+        'auth_time': int(publish_ms) // 1000,
+        'like_count': _like_count(_pick(card, 'interact_info', 'interactInfo', default={})),
+        'is_video': is_video,
+    }
+
+
+def parse_detail_payload(payload: Dict) -> Dict[str, Dict]:
+    """详情接口响应 -> {笔记ID: 记录}"""
+    notes = {}
+    for item in ((payload or {}).get('data') or {}).get('items') or []:
+        card = item.get('note_card') or {}
+        note_id = item.get('id') or card.get('note_id')
+        if note_id and card:
+            notes[note_id] = parse_note_card(card)
+    return notes
+
+
+def parse_feed_payload(payload: Dict) -> Dict[str, Dict]:
+    """主页笔记列表响应 -> {笔记ID: {title, cover, like_count, is_video, xsec_token}}"""
+    notes = {}
+    for note in ((payload or {}).get('data') or {}).get('notes') or []:
+        note_id = note.get('note_id')
+        if not note_id:
+            continue
+        notes[note_id] = {
+            'title': (note.get('display_title') or '').strip(),
+            'cover': _image_url(note.get('cover') or {}),
+            'like_count': _like_count(note.get('interact_info') or {}),
+            'is_video': note.get('type') == 'video',
+            'xsec_token': note.get('xsec_token', ''),
+        }
+    return notes
+
+
+def parse_initial_state(detail_map: Dict) -> Dict[str, Dict]:
+    """__INITIAL_STATE__.note.noteDetailMap -> {笔记ID: 记录}"""
+    notes = {}
+    for note_id, entry in (detail_map or {}).items():
+        note = (entry or {}).get('note') or {}
+        if _pick(note, 'noteId', 'note_id') or note.get('title') or note.get('desc'):
+            notes[note_id] = parse_note_card(note)
+    return notes
+
+
+class NetworkCapture:
+    """从 performance 日志中收集笔记列表/详情接口的响应"""
+
+    def __init__(self, driver, logger: Optional[logging.Logger] = None, max_retries: int = 20):
+        self.driver = driver
+        self.logger = logger or logging.getLogger(__name__)
+        self.max_retries = max_retries
+        self.feed: Dict[str, Dict] = {}     # 笔记ID -> 列表接口摘要
+        self.details: Dict[str, Dict] = {}  # 笔记ID -> 详情记录
+        # requestId -> [url, 是否已加载完成, 取响应体失败次数]
+        # 响应体只能在发起请求的标签页里取，其他标签的请求留到切换过去后再取
+        self._pending: Dict[str, List] = {}
+        self.responses = 0
+        self.api_hits = 0
+        self.dom_fallbacks = 0
+        self.meter = None  # 可选的 xhs_lean.TrafficMeter，读取到的事件同时交给它统计流量
+
+    def poll(self):
+        """读取并清空 performance 日志，解析已完成的接口响应"""
+        try:
+            entries = self.driver.get_log('performance')
+        except Exception as e:
+            self.logger.warning(f"读取 performance 日志失败: {str(e)}")
+            return
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            method = message.get('method')
+            params = message.get('params') or {}
+            if self.meter is not None:
+                self.meter.feed(method, params)
+            if method == 'Network.responseReceived':
+                url = (params.get('response') or {}).get('url', '')
+                if FEED_API in url or DETAIL_API in url:
+                    self._pending[params['requestId']] = [url, False, 0]
+            elif method == 'Network.loadingFinished' and params.get('requestId') in self._pending:
+                self._pending[params['requestId']][1] = True
+            elif method == 'Network.loadingFailed':
+                self._pending.pop(params.get('requestId'), None)
+
+        for request_id, state in list(self._pending.items()):
+            url, finished, retries = state
+            if not finished:
+                continue
+            try:
+                result = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+            except Exception:
+                state[2] += 1
+                if state[2] >= self.max_retries:
+                    del self._pending[request_id]
+                continue
+            del self._pending[request_id]
+            self._handle_body(url, result)
+
+    def _handle_body(self, url: str, result: Dict):
+        body = result.get('body', '')
+        if result.get('base64Encoded'):
+            body = base64.b64decode(body).decode('utf-8', errors='replace')
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            self.logger.warning(f"接口响应不是 JSON: {url}")
+            return
+        self.responses += 1
+        if FEED_API in url:
+            self.feed.update(parse_feed_payload(payload))
+        else:
+            self.details.update(parse_detail_payload(payload))
+
+    def feed_note(self, note_id: str) -> Optional[Dict]:
+        return self.feed.get(note_id)
+
+    def note_record(self, note_url: str) -> Optional[Dict]:
+        """当前标签页笔记的记录（字段同 process_single_note 返回值），取不到返回 None"""
+        note_id = note_id_of(note_url)
+        if not note_id:
+            return None
+        self.poll()
+        record = self.details.get(note_id)
+        if record is None:
+            try:
+                raw = self.driver.execute_script(INITIAL_STATE_JS)
+                if raw:
+                    self.details.update(parse_initial_state(json.loads(raw)))
+            except Exception as e:
+                self.logger.warning(f"读取页面初始数据失败: {str(e)}")
+            record = self.details.get(note_id)
+        if record is None or not (record['images'] or record['content'] or record['title']):
+            self.dom_fallbacks += 1
+            return None
+        self.api_hits += 1
+        record = dict(record)
+        record.pop('is_video')
+        record['url'] = note_url.split('?')[0]
+        return record
+
+    def reset(self):
+        """作者切换时清空缓存的解析结果"""
+        self.feed.clear()
+        self.details.clear()
+
+    def summary(self) -> str:
+        return (f"网络抓取：解析接口响应 {self.responses} 个，详情取自接口/初始数据 {self.api_hits} 条，"
+                f"退回 DOM 提取 {self.dom_fallbacks} 条")
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+采集断点与续采
+- 运行断点（Checkpoint）：本轮品牌顺序和已完成的品牌，每完成一个品牌写一次
+- 品牌断点（BrandProgress）：当前品牌滚动收集到的链接、滚动是否完成、已处理的笔记，
+  每次滚动写一次；品牌采集成功后删除
+- 写入回调只是把记录交给缓冲写入器（或进程池主进程），笔记要等写入器提交后才记为已处理：
+  每交出 commit_every 条等一次提交再写断点，进程被杀时缓冲中未提交的笔记续采时重新抓取
+- 写入先落到临时文件再替换，进程中途被杀也不会留下半个文件
+- --resume 时按上次的顺序跳过已完成的品牌；未完成的品牌恢复已收集的链接，
+  滚动已完成的直接从未处理的笔记继续，否则重新滚动并与已有链接合并
+- 只有全量采集模式记录品牌断点；快速采集不开详情页，中断后重采该品牌即可
+
+文件：xhs_checkpoint.json + xhs_checkpoint.brand-<品牌ID>.json（艺术家为 artist_checkpoint.*）
+用法：python xhs.py --resume / python artis_rednote_spd.py --resume
+"""
+
+import glob
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+def _write_json(path: str, data: Dict):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def _read_json(path: str) -> Optional[Dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"断点文件读取失败 {path}: {str(e)}")
+        return None
+
+
+def progress_path(path: str, brand_id) -> str:
+    """xhs_checkpoint.json -> xhs_checkpoint.brand-123.json"""
+    stem, dot, ext = path.rpartition('.')
+    return f"{stem}.brand-{brand_id}.{ext}" if dot else f"{path}.brand-{brand_id}"
+
+
+class Checkpoint:
+    """运行断点：品牌顺序 + 已完成的品牌ID"""
+
+    def __init__(self, path: str, logger: Optional[logging.Logger] = None):
+        self.path = path
+        self.logger = logger or logging.getLogger(__name__)
+        self.order: List = []
+        self.done = set()
+        self.started = 0
+
+    def start(self, brands: List[Dict]):
+        """新的一轮：记录顺序，清掉上一轮留下的品牌断点"""
+        if not self.path:
+            return
+        for stale in glob.glob(progress_path(glob.escape(self.path), '*')):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+        self.order = [brand['id'] for brand in brands]
+        self.done = set()
+        self.started = int(time.time())
+        self.save()
+
+    def resume(self, brands: List[Dict]) -> Optional[List[Dict]]:
+        """按上次的顺序返回未完成的品牌；没有可用断点时返回 None（调用方按新一轮处理）
+
+        brands 为本次从数据库读出的全部品牌，上次之后被删除的品牌不再采集。
+        """
+        state = _read_json(self.path) if self.path else None
+        if not state:
+            self.logger.info("没有可用的采集断点，从头开始")
+            return None
+        by_id = {brand['id']: brand for brand in brands}
+        self.order = [brand_id for brand_id in state.get('order', []) if brand_id in by_id]
+        self.done = set(state.get('done', [])) & set(self.order)
+        self.started = state.get('started', 0)
+        remaining = [by_id[brand_id] for brand_id in self.order
+                     if brand_id in by_id and brand_id not in self.done]
+        partial = sum(1 for brand in remaining if os.path.exists(progress_path(self.path, brand['id'])))
+        self.logger.info(f"从断点继续：共 {len(self.order)} 个，已完成 {len(self.done)} 个，"
+                         f"剩余 {len(remaining)} 个（其中 {partial} 个有未完成的笔记）")
+        return remaining
+
+    def brand_done(self, brand_id):
+        if not self.path:
+            return
+        self.done.add(brand_id)
+        self.save()
+
+    def finish(self):
+        """一轮结束：全部品牌完成时删除断点，否则保留供 --resume 重试未完成的品牌"""
+        if not self.path:
+            return
+        left = len(set(self.order) - self.done)
+        if left:
+            self.logger.info(f"本轮有 {left} 个品牌未完成，可用 --resume 继续")
+            return
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def save(self):
+        try:
+            _write_json(self.path, {'order': self.order, 'done': sorted(self.done), 'started': self.started})
+        except Exception as e:
+            self.logger.error(f"保存采集断点失败 {self.path}: {str(e)}")
+
+
+class BrandProgress:
+    """单个品牌的断点：链接按页面顺序保存，笔记ID以十六进制存放"""
+
+    def __init__(self, path: str, brand_id, logger: Optional[logging.Logger] = None,
+                 commit: Optional[Callable[[], bool]] = None, commit_every: int = 20):
+        """commit: 等待已交给写入回调的记录全部提交，成功返回 True（如 DatabaseManager.flush），
+        为空时视为写入回调返回即已提交；commit_every 与缓冲写入器的 max_rows 一致"""
+        self.path = progress_path(path, brand_id)
+        self.logger = logger or logging.getLogger(__name__)
+        self.commit = commit
+        self.commit_every = commit_every
+        self.links: Dict[bytes, str] = {}
+        self.existing = set()
+        self.processed = set()
+        self.written: List[bytes] = []  # 已交给写入回调、尚未确认提交的笔记
+        self.scrolled = False
+
+    def load(self) -> bool:
+        """读取上次中断时的状态，存在时返回 True"""
+        state = _read_json(self.path)
+        if not state:
+            return False
+        self.links = {bytes.fromhex(key): href for key, href in state.get('links', [])}
+        self.existing = {bytes.fromhex(key) for key in state.get('existing', [])}
+        self.processed = {bytes.fromhex(key) for key in state.get('processed', [])}
+        self.scrolled = state.get('scrolled', False)
+        return True
+
+    def save_links(self, links: Dict[bytes, str], existing: Iterable[bytes], scrolled: bool = False):
+        """每次滚动后调用；scrolled 表示滚动已结束，续采时可跳过滚动"""
+        self.links = dict(links)
+        self.existing = set(existing)
+        self.scrolled = scrolled
+        self.save()
+
+    def note_done(self, key: bytes):
+        """一条笔记已提交（或确认无需写入）"""
+        self.processed.add(key)
+        self.save()
+
+    def note_written(self, key: bytes):
+        """一条笔记已交给写入回调：攒满 commit_every 条时等写入器提交，再记为已处理"""
+        self.written.append(key)
+        if self.commit is None or len(self.written) >= self.commit_every:
+            self.commit_written()
+
+    def commit_written(self) -> bool:
+        """等写入器提交后把已交出的笔记记为已处理；提交失败时保持未处理（续采时重新抓取），返回 False"""
+        if not self.written:
+            return True
+        try:
+            if self.commit is not None and not self.commit():
+                self.logger.warning(f"写入器未能提交全部记录，{len(self.written)} 条笔记暂不记入断点")
+                return False
+        except Exception as e:
+            self.logger.error(f"等待写入提交失败: {str(e)}")
+            return False
+        self.processed.update(self.written)
+        self.written = []
+        self.save()
+        return True
+
+    def save(self):
+        try:
+            _write_json(self.path, {
+                'links': [[key.hex(), href] for key, href in self.links.items()],
+                'existing': [key.hex() for key in self.existing],
+                'processed': [key.hex() for key in self.processed],
+                'scrolled': self.scrolled,
+            })
+        except Exception as e:
+            self.logger.error(f"保存品牌断点失败 {self.path}: {str(e)}")
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
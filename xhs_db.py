@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+数据库服务层
+- ConnectionPool：少量长连接，取用前空闲超过 ping_interval 秒先 ping，断开时原地重连（pymysql ping(reconnect=True)）
+- DBService：一个后台线程独占一条连接，按入队顺序执行写入和回查
+  - post 入队即返回（写入、更新采集时间），浏览器线程不再等待远程库的往返
+  - call 等待结果（内存索引无法判定时的回查、已采集数量），与之前入队的写入保持先后顺序
+  - 执行中遇到连接断开时先重连；只有以 retry=True 提交的只读/幂等任务（回查、已采集数量、更新采集时间）自动重试一次。
+    写入不自动重试：断开可能发生在服务端已提交之后，重跑会重复写入，由 BufferedWriter 按 url 判定后自行重试
+  - 队列空闲时执行登记的空闲任务（如按时间阈值提交缓冲）
+- 主线程另取一条连接，只在启动时读取品牌列表、加载去重索引和排期
+
+用法：各 DatabaseManager 内部使用，对外接口不变；退出时调用 db.close()
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+import pymysql
+
+DB_CONFIG = dict(
+    host='111.229.182.88',
+    port=3306,
+    user='root',
+    password='s*xNvd%v@',
+    database='sukitime',
+    charset='utf8mb4',
+    cursorclass=pymysql.cursors.DictCursor
+)
+
+# 连接断开相关的 MySQL 错误码：2006 server has gone away / 2013 lost connection / 2055 lost connection (system error)
+DISCONNECT_CODES = {2006, 2013, 2055}
+
+
+def is_disconnect(e: Exception) -> bool:
+    """是否为连接断开（可重连后重试），SQL 本身的错误返回 False"""
+    if isinstance(e, pymysql.err.InterfaceError):
+        return True
+    if isinstance(e, pymysql.err.OperationalError):
+        return bool(e.args) and e.args[0] in DISCONNECT_CODES
+    return isinstance(e, (ConnectionError, BrokenPipeError))
+
+
+def reconnect(connection, logger: Optional[logging.Logger] = None) -> bool:
+    """原地重连（连接对象不变，持有它的写入器/索引无需更换），成功返回 True"""
+    logger = logger or logging.getLogger(__name__)
+    try:
+        connection.ping(reconnect=True)
+        logger.warning("数据库连接已断开，重连成功")
+        return True
+    except Exception as e:
+        logger.error(f"数据库重连失败: {str(e)}")
+        return False
+
+
+class ConnectionPool:
+    def __init__(self, size: int = 2, ping_interval: float = 30.0, logger: Optional[logging.Logger] = None,
+                 **connect_kwargs):
+        self.size = size
+        self.ping_interval = ping_interval
+        self.connect_kwargs = connect_kwargs or DB_CONFIG
+        self.logger = logger or logging.getLogger(__name__)
+        self.idle: List = []
+        self.created = 0
+        self.last_used = {}
+        self.reconnects = 0
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        with self.cond:
+            while not self.idle and self.created >= self.size:
+                self.cond.wait()
+            if self.idle:
+                connection = self.idle.pop()
+            else:
+                connection = pymysql.connect(**self.connect_kwargs)
+                self.created += 1
+        self.check(connection)
+        return connection
+
+    def release(self, connection):
+        with self.cond:
+            self.idle.append(connection)
+            self.cond.notify()
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def check(self, connection):
+        """健康检查：空闲超过 ping_interval 秒的连接先 ping，断开则原地重连"""
+        now = time.time()
+        if now - self.last_used.get(id(connection), now) > self.ping_interval:
+            try:
+                connection.ping(reconnect=False)
+            except Exception:
+                if reconnect(connection, self.logger):
+                    self.reconnects += 1
+        self.last_used[id(connection)] = now
+
+    def close(self):
+        with self.cond:
+            for connection in self.idle:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+            self.idle.clear()
+
+
+class DBService:
+    """数据库工作线程：所有写入和运行中的回查经队列串行执行"""
+
+    def __init__(self, pool: ConnectionPool, idle_interval: float = 5.0, logger: Optional[logging.Logger] = None):
+        self.pool = pool
+        self.connection = pool.acquire()
+        self.idle_interval = idle_interval
+        self.logger = logger or logging.getLogger(__name__)
+        self.queue = queue.Queue()
+        self.idle_tasks: List[Callable] = []
+        self.executed = 0
+        self.failed = 0
+        self.max_backlog = 0
+        self.wait_time = 0.0  # 调用方等待 call 结果的累计时间
+        self.thread = threading.Thread(target=self._run, name='xhs-db', daemon=True)
+        self.thread.start()
+
+    # ---- 调用方 ----
+    def submit(self, func: Callable, *args, retry: bool = False) -> Future:
+        """retry: 只读或可重复执行的任务，连接断开重连后自动重试一次"""
+        future = Future()
+        self._put((func, args, future, retry))
+        return future
+
+    def call(self, func: Callable, *args, retry: bool = False):
+        """在数据库线程执行并等待结果（异常原样抛出）"""
+        start = time.perf_counter()
+        try:
+            return self.submit(func, *args, retry=retry).result()
+        finally:
+            self.wait_time += time.perf_counter() - start
+
+    def post(self, func: Callable, *args, retry: bool = False):
+        """入队即返回，执行失败只记日志"""
+        self._put((func, args, None, retry))
+
+    def on_idle(self, func: Callable):
+        """队列空闲 idle_interval 秒时执行（在数据库线程）"""
+        self.idle_tasks.append(func)
+
+    def close(self):
+        """执行完队列中剩余的任务后停止线程，归还连接"""
+        if not self.thread.is_alive():
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.pool.release(self.connection)
+
+    def summary(self) -> str:
+        return (f"数据库线程：执行 {self.executed} 次，失败 {self.failed} 次，重连 {self.pool.reconnects} 次，"
+                f"最大积压 {self.max_backlog}，调用方等待 {self.wait_time:.1f}s")
+
+    def _put(self, task):
+        self.queue.put(task)
+        backlog = self.queue.qsize()
+        if backlog > self.max_backlog:
+            self.max_backlog = backlog
+
+    # ---- 数据库线程 ----
+    def _run(self):
+        while True:
+            try:
+                task = self.queue.get(timeout=self.idle_interval)
+            except queue.Empty:
+                for func in self.idle_tasks:
+                    self._execute(func, (), None, False)
+                continue
+            if task is None:
+                break
+            self._execute(*task)
+
+    def _execute(self, func: Callable, args: tuple, future: Optional[Future], retry: bool):
+        if future is not None and not future.set_running_or_notify_cancel():
+            return
+        self.pool.check(self.connection)
+        try:
+            try:
+                result = func(*args)
+            except Exception as e:
+                # 连接断开：先重连，后续任务照常执行；只有只读/幂等任务重试
+                if not is_disconnect(e) or not reconnect(self.connection, self.logger):
+                    raise
+                self.pool.reconnects += 1
+                if not retry:
+                    raise
+                result = func(*args)
+        except Exception as e:
+            self.failed += 1
+            if future is not None:
+                future.set_exception(e)
+            else:
+                self.logger.error(f"数据库任务失败 {getattr(func, '__name__', func)}: {str(e)}")
+            return
+        self.executed += 1
+        if future is not None:
+            future.set_result(result)
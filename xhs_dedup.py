@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+采集去重索引
+- 启动时一次性把 spider_log / artist_spider_log 中已有的笔记ID 读入内存
+- is_url_exists 先查内存索引，只有取不到笔记ID或索引未加载时才回查数据库
+- existing_urls 按滚动批次判断，回查部分合并为一次 IN 查询
+- 每次插入成功后同步更新索引，运行结束时输出命中/未命中统计
+- KnownRun 统计滚动中连续遇到的已采集笔记，用于提前停止滚动
+"""
+
+import logging
+from typing import Iterable, Optional
+
+from xhs_text import note_key
+
+
+class NoteIndex:
+    """按笔记ID索引的已采集集合（12 字节 note_key）"""
+
+    def __init__(self, table: str, logger: Optional[logging.Logger] = None):
+        self.table = table
+        self.logger = logger or logging.getLogger(__name__)
+        self.ids = set()
+        self.loaded = False
+        self.hits = 0       # 索引判定已存在
+        self.misses = 0     # 索引判定不存在
+        self.fallbacks = 0  # 无法判定，回查数据库
+
+    def load(self, connection, batch_size: int = 5000):
+        """从数据库全量加载已有 URL 的笔记ID"""
+        self.ids.clear()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT url FROM {self.table}")
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        key = note_key(row['url'])
+                        if key:
+                            self.ids.add(key)
+            self.loaded = True
+            self.logger.info(f"去重索引[{self.table}]加载完成: {len(self.ids)} 条")
+        except Exception as e:
+            self.loaded = False
+            self.logger.error(f"去重索引[{self.table}]加载失败，将逐条查询数据库: {str(e)}")
+
+    def lookup(self, url: str) -> Optional[bool]:
+        """查询索引：True/False 为确定结果，None 表示需要回查数据库"""
+        key = note_key(url)
+        if not self.loaded or not key:
+            self.fallbacks += 1
+            return None
+        if key in self.ids:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def split_known(self, urls: Iterable[str]):
+        """批量查询索引，返回 (确定已存在的 URL 集合, 需要回查数据库的 URL 列表)"""
+        existing, unknown = set(), []
+        for url in urls:
+            exists = self.lookup(url)
+            if exists is None:
+                unknown.append(url)
+            elif exists:
+                existing.add(url)
+        return existing, unknown
+
+    def add(self, url: str):
+        key = note_key(url)
+        if key:
+            self.ids.add(key)
+
+    def summary(self) -> str:
+        return (f"去重索引[{self.table}] 共 {len(self.ids)} 条，"
+                f"命中(已存在) {self.hits} 次，未命中(新笔记) {self.misses} 次，回查数据库 {self.fallbacks} 次")
+
+
+class KnownRun:
+    """按列表顺序统计连续的已采集笔记
+
+    主页按发布时间倒序，连续 limit 条都已采集说明后面不会再有新笔记；置顶笔记之后遇到新笔记会重新计数。
+    limit <= 0 表示不提前停止。
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.run = 0
+
+    def update(self, known_flags: Iterable[bool]) -> bool:
+        """按顺序喂入每条新出现笔记是否已采集，返回是否达到停止条件"""
+        for known in known_flags:
+            self.run = self.run + 1 if known else 0
+        return self.limit > 0 and self.run >= self.limit
+
+
+def query_existing_urls(connection, table: str, urls: Iterable[str], chunk_size: int = 500) -> set:
+    """一次 WHERE url IN (...) 查询批量判断哪些 URL 已存在，超过 chunk_size 时分批"""
+    urls = list(dict.fromkeys(urls))
+    existing = set()
+    if not urls:
+        return existing
+    with connection.cursor() as cursor:
+        for start in range(0, len(urls), chunk_size):
+            chunk = urls[start:start + chunk_size]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"SELECT url FROM {table} WHERE url IN ({placeholders})", chunk)
+            existing.update(row['url'] for row in cursor.fetchall())
+    return existing
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+小红书页面批量提取
+- 列表页：一次 execute_script 取回当前所有 .note-item 卡片（链接/标题/首图/笔记ID）
+- 详情页：一次 execute_script 取回时间/点赞/视频封面/图片/正文/标题快照，解析在 Python 侧完成
+- 每次 WebDriver 调用都是一次到 chromedriver 的 HTTP 往返，逐卡片 find_element 代价很高
+"""
+
+import re
+from typing import Callable, Dict, List, Tuple
+
+from xhs_text import parse_like_count
+
+# 列表页卡片提取脚本：返回纯数据记录，不返回 WebElement
+NOTE_CARDS_JS = r"""
+var cards = [];
+var items = document.querySelectorAll('.note-item');
+for (var i = 0; i < items.length; i++) {
+    var item = items[i];
+    var link = item.querySelector('a.cover.mask.ld[href^="/user/profile/"]')
+        || item.querySelector('a.cover.mask.ld');
+    if (!link) { continue; }
+    var href = link.href || '';
+    var m = href.match(/\/([0-9a-f]{24})(?:[?#]|$)/);
+    var img = item.querySelector('img[src*="xhscdn.com"]');
+    var title = item.querySelector('.title > span');
+    cards.push({
+        href: href,
+        note_id: m ? m[1] : '',
+        profile_link: (link.getAttribute('href') || '').indexOf('/user/profile/') === 0,
+        title: title ? title.innerText : null,
+        cover: img ? img.src : ''
+    });
+}
+return cards;
+"""
+
+
+def fetch_note_cards(driver) -> List[Dict]:
+    """一次往返提取当前列表页的全部卡片
+
+    返回 [{'href', 'note_id', 'profile_link', 'title', 'cover'}, ...]，
+    title 为 None 表示卡片没有标题元素。异常由调用方处理。
+    """
+    cards = driver.execute_script(NOTE_CARDS_JS) or []
+    for card in cards:
+        card['href'] = (card.get('href') or '').replace('&amp;', '&')
+    return cards
+
+
+# 详情页快照脚本：一次返回全部字段，缺失的元素返回 null
+NOTE_DETAIL_JS = r"""
+function text(sel) {
+    var el = document.querySelector(sel);
+    return el ? el.innerText : null;
+}
+var player = document.querySelector('.player-container');
+var poster = document.querySelector('xg-poster.xgplayer-poster');
+var images = [];
+var swiper = document.querySelector('.swiper-wrapper');
+if (swiper) {
+    var imgs = swiper.querySelectorAll('img');
+    for (var i = 0; i < imgs.length; i++) {
+        images.push(imgs[i].getAttribute('src') || '');
+    }
+}
+return {
+    ready: !!document.querySelector('.note-container'),
+    date: text('.bottom-container .date'),
+    like: text('.interact-container .like-active .count'),
+    is_video: !!player,
+    poster_style: poster ? (poster.getAttribute('style') || '') : null,
+    images: swiper ? images : null,
+    desc: text('.note-content .desc'),
+    title: text('#detail-title')
+};
+"""
+
+_POSTER_URL_RE = re.compile(r'url\(\s*(?:&quot;|["\'])?(.*?)(?:&quot;|["\'])?\s*\)')
+
+
+def fetch_note_snapshot(driver) -> Dict:
+    """一次往返取回详情页全部字段（原始文本）"""
+    return driver.execute_script(NOTE_DETAIL_JS) or {}
+
+
+def parse_poster_url(style: str) -> str:
+    """从 xg-poster 的 style 中取出封面地址"""
+    match = _POSTER_URL_RE.search(style or '')
+    return match.group(1).replace('&quot;', '') if match else ''
+
+
+def build_note_fields(snapshot: Dict, parse_time: Callable[[str], int]) -> Tuple[Dict, List[str]]:
+    """在 Python 侧解析详情页快照
+
+    返回 (字段, 缺失字段名列表)；字段包含 images/content/title/auth_time/like_count/raw_time/is_video
+    """
+    missing = []
+
+    raw_time = (snapshot.get('date') or '').strip()
+    if raw_time:
+        auth_time = parse_time(raw_time)
+    else:
+        auth_time = 0
+        missing.append('时间')
+
+    if snapshot.get('like') is None:
+        like_count = 0
+        missing.append('点赞数')
+    else:
+        like_count = parse_like_count(snapshot['like'])
+
+    img_urls = []
+    is_video = bool(snapshot.get('is_video'))
+    if is_video:
+        cover_url = parse_poster_url(snapshot.get('poster_style'))
+        if cover_url:
+            img_urls = [cover_url]
+        else:
+            missing.append('视频封面')
+    elif snapshot.get('images') is None:
+        missing.append('图片')
+    else:
+        for src in snapshot['images']:
+            if src and src.startswith('http') and src not in img_urls:
+                img_urls.append(src)
+
+    if snapshot.get('desc') is None:
+        content = ''
+        missing.append('内容')
+    else:
+        content = snapshot['desc'].replace('\n', ' ').strip()[:2000]
+
+    if snapshot.get('title') is None:
+        title = ''
+        missing.append('标题')
+    else:
+        title = snapshot['title'].strip()
+
+    fields = {
+        'images': img_urls,
+        'content': content,
+        'title': title,
+        'auth_time': auth_time,
+        'like_count': like_count,
+        'raw_time': raw_time,
+        'is_video': is_video,
+    }
+    return fields, missing
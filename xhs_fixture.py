@@ -0,0 +1,497 @@
+# -*- coding: utf-8 -*-
+"""
+离线回放：用录制的主页/笔记 HTML 代替真实浏览器
+- FakeDriver 实现爬虫用到的 WebDriver 接口（get/find_element(s)/execute_script/标签页切换等）
+- 爬虫中的页面脚本（xhs_extract / xhs_wait 的常量）在 Python 侧按同样的选择器对 HTML 求值
+- 每个 WebDriver 调用都计入 commands，与真实 chromedriver 的 HTTP 往返一一对应
+- 主页可由多段 HTML 组成，每次滚动到底追加下一段的卡片
+
+用法：XHSCrawler(driver=FakeDriver.from_fixtures('fixtures'))，基准见 bench_extract.py
+"""
+
+import json
+import os
+import re
+import time
+import urllib.parse
+from collections import Counter
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+from selenium.common.exceptions import NoSuchElementException, NoSuchWindowException
+from selenium.webdriver.common.by import By
+
+from xhs_capture import INITIAL_STATE_JS
+from xhs_extract import NOTE_CARDS_JS, NOTE_DETAIL_JS
+from xhs_text import note_id_of
+from xhs_wait import FEED_PROBE_JS, DETAIL_READY_JS
+
+EMPTY_PAGE = '<html><body></body></html>'
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+
+# ===================== 简易 DOM =====================
+
+class Node:
+    def __init__(self, tag: str, attrs: Optional[Dict[str, str]] = None, parent: Optional['Node'] = None):
+        self.tag = tag
+        self.attrs = attrs or {}
+        self.parent = parent
+        self.children: List = []  # Node 或文本
+
+    @property
+    def classes(self) -> List[str]:
+        return self.attrs.get('class', '').split()
+
+    def descendants(self):
+        for child in self.children:
+            if isinstance(child, Node):
+                yield child
+                yield from child.descendants()
+
+    def _raw_text(self) -> str:
+        parts = []
+        for child in self.children:
+            if isinstance(child, Node):
+                parts.append('\n' if child.tag == 'br' else child._raw_text())
+            else:
+                parts.append(child)
+        return ''.join(parts)
+
+    def text(self) -> str:
+        """近似 innerText：拼接全部文本，<br> 视为换行，去掉首尾空白"""
+        return self._raw_text().strip()
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node('#document')
+        self.stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        node = Node(tag, {k: v if v is not None else '' for k, v in attrs}, self.stack[-1])
+        self.stack[-1].children.append(node)
+        if tag not in VOID_TAGS:
+            self.stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        node = Node(tag, {k: v if v is not None else '' for k, v in attrs}, self.stack[-1])
+        self.stack[-1].children.append(node)
+
+    def handle_endtag(self, tag):
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i].tag == tag:
+                del self.stack[i:]
+                break
+
+    def handle_data(self, data):
+        self.stack[-1].children.append(data)
+
+
+def parse_html(html: str) -> Node:
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+# ===================== CSS 选择器（爬虫用到的子集） =====================
+# 支持：标签、.class、#id、[attr]、[attr="v"]、[attr^="v"]、[attr*="v"]、[attr$="v"]，
+# 后代（空格）与子元素（>）组合，逗号分隔的多个选择器
+
+_TOKEN_RE = re.compile(r'\s*(>)\s*|\s+|([^\s>]+)')
+_SIMPLE_RE = re.compile(r'^([a-zA-Z][\w-]*|\*)?')
+_PART_RE = re.compile(r'\.([\w-]+)|#([\w-]+)|\[\s*([\w-]+)\s*(?:([\^*$]?=)\s*(?:"([^"]*)"|\'([^\']*)\'|([^\]\s]*)))?\s*\]')
+_selector_cache: Dict[str, List[List]] = {}
+
+
+def _parse_compound(text: str) -> Dict:
+    tag = _SIMPLE_RE.match(text).group(1)
+    compound = {'tag': None if tag in (None, '*') else tag.lower(), 'classes': [], 'id': None, 'attrs': []}
+    pos = len(tag or '')
+    while pos < len(text):
+        match = _PART_RE.match(text, pos)
+        if not match:
+            raise ValueError(f"不支持的选择器: {text}")
+        cls, id_, attr, op, v1, v2, v3 = match.groups()
+        if cls:
+            compound['classes'].append(cls)
+        elif id_:
+            compound['id'] = id_
+        else:
+            value = next((v for v in (v1, v2, v3) if v is not None), None)
+            compound['attrs'].append((attr, op, value))
+        pos = match.end()
+    return compound
+
+
+def _parse_selector(selector: str) -> List[List]:
+    """'a b > c, d' -> [[a, ' ', b, '>', c], [d]]"""
+    if selector not in _selector_cache:
+        groups = []
+        for part in selector.split(','):
+            chain, combinator = [], None
+            for match in _TOKEN_RE.finditer(part.strip()):
+                if match.group(1):
+                    combinator = '>'
+                elif match.group(2):
+                    if chain:
+                        chain.append(combinator or ' ')
+                    chain.append(_parse_compound(match.group(2)))
+                    combinator = None
+            groups.append(chain)
+        _selector_cache[selector] = groups
+    return _selector_cache[selector]
+
+
+def _match_compound(node: Node, compound: Dict) -> bool:
+    if node.tag.startswith('#'):
+        return False
+    if compound['tag'] and node.tag != compound['tag']:
+        return False
+    if compound['id'] and node.attrs.get('id') != compound['id']:
+        return False
+    classes = node.classes
+    if any(cls not in classes for cls in compound['classes']):
+        return False
+    for attr, op, value in compound['attrs']:
+        if attr not in node.attrs:
+            return False
+        actual = node.attrs[attr]
+        if (op == '=' and actual != value) or (op == '^=' and not actual.startswith(value)) \
+                or (op == '*=' and value not in actual) or (op == '$=' and not actual.endswith(value)):
+            return False
+    return True
+
+
+def _match_chain(node: Node, chain: List) -> bool:
+    if not _match_compound(node, chain[-1]):
+        return False
+    if len(chain) == 1:
+        return True
+    combinator, rest = chain[-2], chain[:-2]
+    parent = node.parent
+    if combinator == '>':
+        return parent is not None and _match_chain(parent, rest)
+    while parent is not None:
+        if _match_chain(parent, rest):
+            return True
+        parent = parent.parent
+    return False
+
+
+def select(root: Node, selector: str) -> List[Node]:
+    """按文档顺序返回 root 的后代中匹配的元素（querySelectorAll）"""
+    groups = _parse_selector(selector)
+    return [node for node in root.descendants() if any(_match_chain(node, chain) for chain in groups)]
+
+
+def select_one(root: Node, selector: str) -> Optional[Node]:
+    groups = _parse_selector(selector)
+    for node in root.descendants():
+        if any(_match_chain(node, chain) for chain in groups):
+            return node
+    return None
+
+
+def _css(by: str, value: str) -> str:
+    if by == By.CSS_SELECTOR:
+        return value
+    if by == By.CLASS_NAME:
+        return '.' + value.replace(' ', '.')
+    if by == By.ID:
+        return '#' + value
+    if by == By.TAG_NAME:
+        return value
+    raise NotImplementedError(f"FakeDriver 不支持的定位方式: {by}")
+
+
+# ===================== 页面脚本的 Python 实现 =====================
+
+def _text_of(doc: Node, selector: str) -> Optional[str]:
+    node = select_one(doc, selector)
+    return node.text() if node else None
+
+
+def eval_note_cards(doc: Node, page_url: str) -> List[Dict]:
+    """NOTE_CARDS_JS"""
+    cards = []
+    for item in select(doc, '.note-item'):
+        link = select_one(item, 'a.cover.mask.ld[href^="/user/profile/"]') or select_one(item, 'a.cover.mask.ld')
+        if not link:
+            continue
+        raw_href = link.attrs.get('href', '')
+        href = urllib.parse.urljoin(page_url, raw_href) if raw_href else ''
+        match = re.search(r'/([0-9a-f]{24})(?:[?#]|$)', href)
+        img = select_one(item, 'img[src*="xhscdn.com"]')
+        title = select_one(item, '.title > span')
+        cards.append({
+            'href': href,
+            'note_id': match.group(1) if match else '',
+            'profile_link': raw_href.startswith('/user/profile/'),
+            'title': title.text() if title else None,
+            'cover': urllib.parse.urljoin(page_url, img.attrs['src']) if img else '',
+        })
+    return cards
+
+
+def eval_note_detail(doc: Node) -> Dict:
+    """NOTE_DETAIL_JS"""
+    poster = select_one(doc, 'xg-poster.xgplayer-poster')
+    swiper = select_one(doc, '.swiper-wrapper')
+    return {
+        'ready': select_one(doc, '.note-container') is not None,
+        'date': _text_of(doc, '.bottom-container .date'),
+        'like': _text_of(doc, '.interact-container .like-active .count'),
+        'is_video': select_one(doc, '.player-container') is not None,
+        'poster_style': poster.attrs.get('style', '') if poster else None,
+        'images': [img.attrs.get('src', '') for img in select(swiper, 'img')] if swiper else None,
+        'desc': _text_of(doc, '.note-content .desc'),
+        'title': _text_of(doc, '#detail-title'),
+    }
+
+
+def eval_detail_ready(doc: Node) -> bool:
+    """DETAIL_READY_JS"""
+    if select_one(doc, '.note-container') is None:
+        return False
+    date = select_one(doc, '.bottom-container .date')
+    media = select_one(doc, '.swiper-wrapper img[src^="http"]') \
+        or select_one(doc, 'xg-poster.xgplayer-poster[style*="url("]')
+    return bool(date and date.text().strip() and media)
+
+
+# ===================== Fake WebDriver =====================
+
+class FakeElement:
+    def __init__(self, driver: 'FakeDriver', node: Node):
+        self._driver = driver
+        self._node = node
+
+    @property
+    def text(self) -> str:
+        self._driver._count('get_element_text')
+        return self._node.text()
+
+    def get_attribute(self, name: str) -> Optional[str]:
+        self._driver._count('get_element_attribute')
+        value = self._node.attrs.get(name)
+        if value is not None and name in ('href', 'src'):
+            value = urllib.parse.urljoin(self._driver.current_url, value)  # 与浏览器的属性值一致
+        return value
+
+    def find_element(self, by=By.ID, value=None) -> 'FakeElement':
+        self._driver._count('find_child_element')
+        node = select_one(self._node, _css(by, value))
+        if node is None:
+            raise NoSuchElementException(f"no such element: {value}")
+        return FakeElement(self._driver, node)
+
+    def find_elements(self, by=By.ID, value=None) -> List['FakeElement']:
+        self._driver._count('find_child_elements')
+        return [FakeElement(self._driver, node) for node in select(self._node, _css(by, value))]
+
+
+class _Tab:
+    def __init__(self, url: str, html: str, more_pages: Optional[List[str]] = None):
+        self.url = url
+        self.doc = parse_html(html)
+        self.more_pages = list(more_pages or [])  # 滚动到底时依次追加的卡片
+
+
+class _SwitchTo:
+    def __init__(self, driver: 'FakeDriver'):
+        self._driver = driver
+
+    def window(self, handle: str):
+        self._driver._count('switch_to_window')
+        if handle not in self._driver._tabs:
+            raise NoSuchWindowException(f"no such window: {handle}")
+        self._driver._current = handle
+
+
+class FakeDriver:
+    """按 URL 提供录制的 HTML，记录每类 WebDriver 调用的次数
+
+    profiles: {主页URL（不含查询参数）: [第一屏HTML, 滚动后追加的HTML, ...]}
+    notes: {笔记ID: 详情页HTML}，/explore/ 与 /user/profile/ 两种笔记链接都按笔记ID匹配
+    latency: 每次调用额外等待的秒数，用于模拟 chromedriver 往返
+    """
+
+    def __init__(self, profiles: Optional[Dict[str, List[str]]] = None,
+                 notes: Optional[Dict[str, str]] = None, latency: float = 0.0):
+        self.profiles = profiles or {}
+        self.notes = notes or {}
+        self.latency = latency
+        self.commands: Counter = Counter()
+        self.switch_to = _SwitchTo(self)
+        self._tabs: Dict[str, _Tab] = {}
+        self._next_handle = 0
+        self._current = self._open_tab('about:blank')
+        self._cookies: List[Dict] = []
+
+    @classmethod
+    def from_fixtures(cls, directory: str, latency: float = 0.0) -> 'FakeDriver':
+        """读取 directory/manifest.json 描述的录制页面"""
+        manifest = load_manifest(directory)
+        profiles = {url: [_read(directory, name) for name in page['pages']]
+                    for url, page in manifest['profiles'].items()}
+        notes = {note_id: _read(directory, note['file']) for note_id, note in manifest['notes'].items()}
+        return cls(profiles, notes, latency)
+
+    # ---- 计数 ----
+    def _count(self, command: str):
+        self.commands[command] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @property
+    def command_count(self) -> int:
+        return sum(self.commands.values())
+
+    def reset_counts(self):
+        self.commands.clear()
+
+    # ---- 页面 ----
+    def _page_for(self, url: str):
+        base = url.split('#', 1)[0].split('?', 1)[0]
+        if base in self.profiles:
+            pages = self.profiles[base]
+            return pages[0], pages[1:]
+        note_id = note_id_of(url)
+        if note_id in self.notes:
+            return self.notes[note_id], []
+        return EMPTY_PAGE, []
+
+    def _open_tab(self, url: str) -> str:
+        handle = f"fake-{self._next_handle}"
+        self._next_handle += 1
+        html, more = self._page_for(url)
+        self._tabs[handle] = _Tab(url, html, more)
+        return handle
+
+    @property
+    def _tab(self) -> _Tab:
+        if self._current not in self._tabs:
+            raise NoSuchWindowException("current window was closed")
+        return self._tabs[self._current]
+
+    def get(self, url: str):
+        self._count('get')
+        html, more = self._page_for(url)
+        self._tabs[self._current] = _Tab(url, html, more)
+
+    def refresh(self):
+        self._count('refresh')
+        self.get(self._tab.url)
+
+    @property
+    def current_url(self) -> str:
+        return self._tab.url
+
+    @property
+    def current_window_handle(self) -> str:
+        self._count('get_current_window_handle')
+        return self._current
+
+    @property
+    def window_handles(self) -> List[str]:
+        self._count('get_window_handles')
+        return list(self._tabs)
+
+    def close(self):
+        self._count('close')
+        self._tabs.pop(self._current, None)
+
+    def quit(self):
+        self._count('quit')
+        self._tabs.clear()
+
+    # ---- 元素 ----
+    def find_element(self, by=By.ID, value=None) -> FakeElement:
+        self._count('find_element')
+        node = select_one(self._tab.doc, _css(by, value))
+        if node is None:
+            raise NoSuchElementException(f"no such element: {value}")
+        return FakeElement(self, node)
+
+    def find_elements(self, by=By.ID, value=None) -> List[FakeElement]:
+        self._count('find_elements')
+        return [FakeElement(self, node) for node in select(self._tab.doc, _css(by, value))]
+
+    # ---- 脚本 ----
+    def execute_script(self, script: str, *args):
+        self._count('execute_script')
+        tab = self._tab
+        if script == NOTE_CARDS_JS:
+            return eval_note_cards(tab.doc, tab.url)
+        if script == NOTE_DETAIL_JS:
+            return eval_note_detail(tab.doc)
+        if script == DETAIL_READY_JS:
+            return eval_detail_ready(tab.doc)
+        if script == FEED_PROBE_JS:
+            return [len(select(tab.doc, '.note-item')), self._scroll_height(tab)]
+        if script == INITIAL_STATE_JS:
+            return None
+        if script == "return document.body.scrollHeight":
+            return self._scroll_height(tab)
+        if script.startswith('window.scrollTo('):
+            self._load_more(tab)
+            return None
+        match = re.fullmatch(r"window\.open\((?:arguments\[0\]|'([^']*)')\);", script.strip())
+        if match:
+            self._open_tab(match.group(1) if match.group(1) is not None else args[0])
+            return None
+        raise NotImplementedError(f"FakeDriver 未实现的脚本: {script[:60]}")
+
+    @staticmethod
+    def _scroll_height(tab: _Tab) -> int:
+        return 800 + 320 * len(select(tab.doc, '.note-item'))
+
+    @staticmethod
+    def _load_more(tab: _Tab):
+        """滚动到底：把下一段录制页面中的卡片追加到当前列表末尾"""
+        if not tab.more_pages:
+            return
+        items = select(tab.doc, '.note-item')
+        if not items:
+            return
+        container = items[-1].parent
+        for item in select(parse_html(tab.more_pages.pop(0)), '.note-item'):
+            item.parent = container
+            container.children.append(item)
+
+    # ---- 其他接口：接受调用但不做任何事 ----
+    def execute_cdp_cmd(self, cmd: str, params: Dict):
+        self._count('execute_cdp_cmd')
+        return {}
+
+    def get_log(self, log_type: str) -> List:
+        self._count('get_log')
+        return []
+
+    def add_cookie(self, cookie: Dict):
+        self._count('add_cookie')
+        self._cookies.append(cookie)
+
+    def get_cookies(self) -> List[Dict]:
+        self._count('get_cookies')
+        return list(self._cookies)
+
+
+# ===================== 录制文件 =====================
+
+def _read(directory: str, name: str) -> str:
+    with open(os.path.join(directory, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def load_manifest(directory: str) -> Dict:
+    """manifest.json
+
+    profiles: 主页URL -> {pages, expected_links（滚动到底后的笔记ID顺序）, expected_quick（笔记ID -> 快速模式字段）}
+    notes: 笔记ID -> {file, expected（详情字段；发布时间依赖当前时间和时区，只比对 has_time）}
+    """
+    with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+自适应限速器（代替固定的 wait_rate、滚动/详情等待时长和 GUI 的等待配置）
+- 两类请求各一个令牌桶：page（打开主页、滚动加载下一页）和 detail（打开详情页），速率单位为 次/分钟；
+  每次请求前 acquire 取一个令牌，没有令牌时等待补充，burst 为可以连续发出的请求数
+- 加载成功（新卡片出现、详情就绪）时速率按 increase 比例上调，直到 max_rate
+- 超时或空页面时速率乘以 backoff（不低于 min_rate），并暂停 pause * 2^(连续失败次数-1) 秒（上限 max_pause）；
+  连续失败期间就绪等待的上限也随之加倍（最多 4 倍），给被限流时变慢的页面留出加载时间。
+  暂停期间其他浏览器报告的失败只计数，不重复降速
+- 状态放在 multiprocessing 共享内存中：流水线的多个浏览器线程、进程池的多个工作进程共用同一个限速器，
+  任一浏览器被限流时其他浏览器一起放慢
+- 就绪等待的基础上限沿用各爬虫原来的固定等待：品牌 7.5s/10s、艺术家 23.5s/2s、GUI 10.5s/5s；
+  合并采集用 with_timeouts 按主页的路由切换等待上限，速率和退避仍共用
+
+用法：各爬虫的 governor 参数，未传入时每个爬虫各建一个；进程池/流水线由 main 建一个传给全部浏览器
+"""
+
+import copy
+import logging
+import multiprocessing as mp
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+PAGE = 'page'  # 打开主页、滚动加载
+DETAIL = 'detail'  # 打开详情页
+KIND_NAMES = {PAGE: '主页', DETAIL: '详情'}
+
+# 共享数组中每类请求占 _FIELDS 个槽位
+_RATE, _TOKENS, _STAMP, _STREAK, _PAUSED_UNTIL, _OK, _FAILED, _WAITED = range(8)
+_FIELDS = 8
+
+
+class Budget:
+    def __init__(self, rate: float, min_rate: float, max_rate: float, burst: float = 1, timeout: float = 10.0):
+        """一类请求的令牌桶配置：rate 为初始速率（次/分钟），timeout 为就绪等待的基础上限（秒）"""
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.timeout = timeout
+
+
+def default_budgets(page_timeout: float = 7.5, detail_timeout: float = 10.0) -> Dict[str, Budget]:
+    return {
+        PAGE: Budget(30, 4, 60, burst=5, timeout=page_timeout),
+        DETAIL: Budget(20, 3, 40, burst=3, timeout=detail_timeout),
+    }
+
+
+class Governor:
+    def __init__(self, page_timeout: float = 7.5, detail_timeout: float = 10.0,
+                 budgets: Optional[Dict[str, Budget]] = None, paced: bool = True,
+                 increase: float = 0.05, backoff: float = 0.5, pause: float = 5.0, max_pause: float = 300.0,
+                 logger: Optional[logging.Logger] = None):
+        """paced 为假时 acquire 不等待（离线回放/压测），仍按成功失败调整速率和等待上限"""
+        self.budgets = budgets or default_budgets(page_timeout, detail_timeout)
+        self.kinds = list(self.budgets)
+        self.paced = paced
+        self.increase = increase
+        self.backoff = backoff
+        self.pause = pause
+        self.max_pause = max_pause
+        self.logger = logger or logging.getLogger(__name__)
+        now = time.time()
+        values = []
+        for kind in self.kinds:
+            budget = self.budgets[kind]
+            values += [budget.rate, budget.burst, now, 0, 0, 0, 0, 0]
+        # 进程池以 spawn 方式启动工作进程，共享内存须由同一上下文创建；限速器随 crawler_options 传入子进程
+        self.state = mp.get_context('spawn').Array('d', values)
+
+    def with_timeouts(self, page_timeout: float, detail_timeout: float) -> 'Governor':
+        """共用令牌桶和退避状态、只换就绪等待基础上限的限速器（合并采集中艺术家主页沿用艺术家的等待）"""
+        view = copy.copy(self)
+        view.budgets = {kind: copy.copy(budget) for kind, budget in self.budgets.items()}
+        view.budgets[PAGE].timeout = page_timeout
+        view.budgets[DETAIL].timeout = detail_timeout
+        return view
+
+    @contextmanager
+    def _slot(self, kind: str):
+        """加锁后返回 (原始数组, 该类请求的起始下标)"""
+        with self.state.get_lock():
+            yield self.state.get_obj(), self.kinds.index(kind) * _FIELDS
+
+    # ---- 请求前 ----
+    def acquire(self, kind: str, on_tick: Optional[Callable[[float, float], None]] = None,
+                poll: float = 0.25) -> float:
+        """取一个令牌，返回等待的秒数；on_tick(elapsed, total) 每次轮询时回调，可用于进度显示或抛出停止信号"""
+        if not self.paced:
+            return 0.0
+        budget = self.budgets[kind]
+        start = time.time()
+        total = 0.0
+        while True:
+            with self._slot(kind) as (s, i):
+                now = time.time()
+                s[i + _TOKENS] = min(budget.burst, s[i + _TOKENS] + (now - s[i + _STAMP]) * s[i + _RATE] / 60)
+                s[i + _STAMP] = now
+                if now < s[i + _PAUSED_UNTIL]:
+                    wait = s[i + _PAUSED_UNTIL] - now
+                elif s[i + _TOKENS] >= 1:
+                    s[i + _TOKENS] -= 1
+                    waited = now - start
+                    s[i + _WAITED] += waited
+                    break
+                else:
+                    wait = (1 - s[i + _TOKENS]) * 60 / s[i + _RATE]
+            elapsed = time.time() - start
+            total = max(total, elapsed + wait)
+            if on_tick:
+                on_tick(elapsed, total)
+            time.sleep(min(poll, wait))
+        if on_tick and total:
+            on_tick(total, total)
+        return waited
+
+    def timeout(self, kind: str) -> float:
+        """就绪等待的上限：连续失败时加倍，最多 4 倍"""
+        with self._slot(kind) as (s, i):
+            streak = int(s[i + _STREAK])
+        return self.budgets[kind].timeout * min(4, 2 ** streak)
+
+    # ---- 请求后 ----
+    def success(self, kind: str):
+        budget = self.budgets[kind]
+        with self._slot(kind) as (s, i):
+            s[i + _STREAK] = 0
+            s[i + _OK] += 1
+            s[i + _RATE] = min(budget.max_rate, s[i + _RATE] * (1 + self.increase))
+
+    def failure(self, kind: str, reason: str):
+        budget = self.budgets[kind]
+        with self._slot(kind) as (s, i):
+            now = time.time()
+            s[i + _FAILED] += 1
+            if now < s[i + _PAUSED_UNTIL]:
+                return  # 已在退避中：同一次限流的其他失败不重复降速
+            s[i + _STREAK] += 1
+            streak = int(s[i + _STREAK])
+            s[i + _RATE] = max(budget.min_rate, s[i + _RATE] * self.backoff)
+            s[i + _TOKENS] = 0
+            pause = min(self.max_pause, self.pause * 2 ** (streak - 1))
+            if self.paced:
+                s[i + _PAUSED_UNTIL] = now + pause
+            rate = s[i + _RATE]
+        self.logger.warning(f"限速[{KIND_NAMES.get(kind, kind)}]：{reason}，连续失败 {streak} 次，"
+                            f"速率降至 {rate:.1f} 次/分钟" + (f"，暂停 {pause:.0f}s" if self.paced else ''))
+
+    def report(self, kind: str, ok: bool, reason: str):
+        if ok:
+            self.success(kind)
+        else:
+            self.failure(kind, reason)
+
+    # ---- 显示 ----
+    def rate(self, kind: str) -> float:
+        with self._slot(kind) as (s, i):
+            return s[i + _RATE]
+
+    def describe(self) -> str:
+        """当前速率（GUI 显示）"""
+        parts = []
+        now = time.time()
+        for kind in self.kinds:
+            with self._slot(kind) as (s, i):
+                rate, paused = s[i + _RATE], s[i + _PAUSED_UNTIL] - now
+            text = f"{KIND_NAMES.get(kind, kind)} {rate:.1f} 次/分钟"
+            if self.paced and paused > 0:
+                text += f"（退避 {paused:.0f}s）"
+            parts.append(text)
+        return ' · '.join(parts)
+
+    def summary(self) -> str:
+        parts = []
+        for kind in self.kinds:
+            with self._slot(kind) as (s, i):
+                rate, ok, failed, waited = s[i + _RATE], int(s[i + _OK]), int(s[i + _FAILED]), s[i + _WAITED]
+            parts.append(f"{KIND_NAMES.get(kind, kind)} 当前 {rate:.1f} 次/分钟，成功 {ok} / 失败 {failed}，"
+                         f"限速等待 {waited:.0f}s")
+        return "限速器：" + '；'.join(parts)
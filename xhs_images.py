@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""
+笔记图片下载与本地缓存（可选阶段，--image-cache 目录）
+- 写入数据库之后把笔记的 images 交给后台下载线程，采集线程不等待下载
+- 后台线程内一个 asyncio 事件循环：concurrency 个下载任务从队列取 URL，
+  HTTP 请求在同样大小的线程池中执行（http.client，按主机复用 keep-alive 连接，不引入新的依赖）
+- 内容寻址存储：objects/<hash 前两位>/<sha256>.<扩展名>，内容相同的图片只存一份；
+  安装了 Pillow 时同时生成缩略图 thumbs/<hash 前两位>/<sha256>.jpg（长边 thumb_size 像素）
+- index.sqlite 记录 URL → hash：已下载过的 URL 不再请求，本次运行内重复出现的 URL 只排队一次；
+  下载失败的 URL 不记录，下次运行重试
+- 下游读取本地文件：ImageCache(root).lookup(url) / thumbnail(url)
+
+用法：python xhs.py --image-cache xhs_images（artis_rednote_spd.py / xhs_unified.py 相同）；本地压测见 bench_images.py
+"""
+
+import asyncio
+import hashlib
+import http.client
+import logging
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from PIL import Image  # 可选：只用于缩略图
+except ImportError:
+    Image = None
+
+IMAGES_ROOT = 'xhs_images'
+
+HEADERS = {
+    'User-Agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                   'Chrome/124.0 Safari/537.36'),
+    'Referer': 'https://www.xiaohongshu.com/',
+    'Accept': 'image/avif,image/webp,image/apng,image/*,*/*;q=0.8',
+}
+
+# 文件头 -> 扩展名
+_MAGIC = [
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+]
+
+
+def image_ext(body: bytes, content_type: str = '') -> str:
+    """按文件头（其次 Content-Type）判断图片格式，不是图片时返回空串"""
+    for magic, ext in _MAGIC:
+        if body.startswith(magic):
+            return ext
+    if body[:4] == b'RIFF' and body[8:12] == b'WEBP':
+        return 'webp'
+    if body[4:8] == b'ftyp':
+        return 'heic' if body[8:12] in (b'heic', b'heix', b'mif1') else 'avif'
+    content_type = content_type.split(';')[0].strip().lower()
+    if content_type.startswith('image/'):
+        return content_type[6:].replace('jpeg', 'jpg').replace('+xml', '') or 'img'
+    return ''
+
+
+class HTTPClient:
+    """按 (scheme, host) 复用 keep-alive 连接的阻塞 HTTP 客户端，可在多个线程中同时使用"""
+
+    def __init__(self, timeout: float = 20.0, max_redirects: int = 3):
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self.idle: Dict[Tuple[str, str], List] = {}
+        self.lock = threading.Lock()
+        self.connects = 0
+        self.reused = 0
+
+    def _acquire(self, key: Tuple[str, str]):
+        with self.lock:
+            idle = self.idle.get(key)
+            if idle:
+                self.reused += 1
+                return idle.pop(), True
+            self.connects += 1
+        scheme, netloc = key
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return cls(netloc, timeout=self.timeout), False
+
+    def _release(self, key: Tuple[str, str], connection):
+        with self.lock:
+            self.idle.setdefault(key, []).append(connection)
+
+    def get(self, url: str) -> Tuple[int, str, bytes]:
+        """返回 (状态码, Content-Type, 内容)，跟随最多 max_redirects 次跳转"""
+        for _ in range(self.max_redirects + 1):
+            parts = urllib.parse.urlsplit(url)
+            key = (parts.scheme, parts.netloc)
+            path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+            while True:
+                connection, reused = self._acquire(key)
+                try:
+                    connection.request('GET', path, headers=HEADERS)
+                    response = connection.getresponse()
+                    body = response.read()
+                    break
+                except (http.client.HTTPException, OSError):
+                    connection.close()
+                    if not reused:
+                        raise
+                    # 复用的连接可能已被服务器关闭：换一条新连接重试
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(key, connection)
+            location = response.getheader('Location')
+            if response.status in (301, 302, 303, 307, 308) and location:
+                url = urllib.parse.urljoin(url, location)
+                continue
+            return response.status, response.getheader('Content-Type', ''), body
+        raise ValueError(f"跳转次数超过 {self.max_redirects}")
+
+    def close(self):
+        with self.lock:
+            for connections in self.idle.values():
+                for connection in connections:
+                    connection.close()
+            self.idle.clear()
+
+
+class ImageCache:
+    """内容寻址的本地图片库与 URL 索引"""
+
+    def __init__(self, root: str = IMAGES_ROOT, thumb_size: int = 320, logger: Optional[logging.Logger] = None):
+        self.root = root
+        self.thumb_size = thumb_size
+        self.logger = logger or logging.getLogger(__name__)
+        os.makedirs(root, exist_ok=True)
+        # 连接只能在创建它的线程中使用：下载阶段在事件循环线程中创建，写文件（write_object）不访问索引
+        self.db = sqlite3.connect(os.path.join(root, 'index.sqlite'), isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS objects (hash TEXT PRIMARY KEY, ext TEXT NOT NULL, "
+                        "size INTEGER NOT NULL, thumb INTEGER NOT NULL, created_at INTEGER NOT NULL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, hash TEXT NOT NULL, "
+                        "fetched_at INTEGER NOT NULL)")
+
+    # ---- 路径 ----
+    def object_path(self, digest: str, ext: str) -> str:
+        return os.path.join(self.root, 'objects', digest[:2], f"{digest}.{ext}")
+
+    def thumb_path(self, digest: str) -> str:
+        return os.path.join(self.root, 'thumbs', digest[:2], f"{digest}.jpg")
+
+    # ---- 查询 ----
+    def digest(self, url: str) -> Optional[str]:
+        row = self.db.execute("SELECT hash FROM urls WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def lookup(self, url: str) -> Optional[str]:
+        """URL 对应的本地文件，未下载时返回 None"""
+        row = self.db.execute("SELECT o.hash, o.ext FROM urls u JOIN objects o ON o.hash = u.hash "
+                              "WHERE u.url = ?", (url,)).fetchone()
+        return self.object_path(*row) if row else None
+
+    def thumbnail(self, url: str) -> Optional[str]:
+        row = self.db.execute("SELECT o.hash FROM urls u JOIN objects o ON o.hash = u.hash "
+                              "WHERE u.url = ? AND o.thumb = 1", (url,)).fetchone()
+        return self.thumb_path(row[0]) if row else None
+
+    def has_object(self, digest: str) -> bool:
+        return self.db.execute("SELECT 1 FROM objects WHERE hash = ?", (digest,)).fetchone() is not None
+
+    # ---- 写入 ----
+    def write_object(self, digest: str, ext: str, body: bytes) -> bool:
+        """写入图片文件和缩略图（可在线程池中执行），返回是否生成了缩略图"""
+        _write_atomic(self.object_path(digest, ext), body)
+        if Image is None or not self.thumb_size:
+            return False
+        try:
+            with Image.open(BytesIO(body)) as image:
+                image.thumbnail((self.thumb_size, self.thumb_size))
+                buffer = BytesIO()
+                image.convert('RGB').save(buffer, 'JPEG', quality=80)
+            _write_atomic(self.thumb_path(digest), buffer.getvalue())
+            return True
+        except Exception as e:
+            self.logger.warning(f"生成缩略图失败 {digest}: {str(e)}")
+            return False
+
+    def add_object(self, digest: str, ext: str, size: int, thumb: bool):
+        self.db.execute("INSERT OR IGNORE INTO objects (hash, ext, size, thumb, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (digest, ext, size, int(thumb), int(time.time())))
+
+    def add_url(self, url: str, digest: str):
+        self.db.execute("INSERT OR REPLACE INTO urls (url, hash, fetched_at) VALUES (?, ?, ?)",
+                        (url, digest, int(time.time())))
+
+    def summary(self) -> str:
+        objects, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects").fetchone()
+        urls = self.db.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+        return f"图片缓存 {self.root}：{urls} 个 URL → {objects} 个文件，共 {size / 1048576:.1f}MB"
+
+    def close(self):
+        self.db.close()
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class ImageStage:
+    """后台下载阶段：add / wrap 在采集线程调用，下载在独立线程的事件循环中进行"""
+
+    def __init__(self, root: str = IMAGES_ROOT, concurrency: int = 8, timeout: float = 20.0,
+                 thumb_size: int = 320, logger: Optional[logging.Logger] = None):
+        self.root = root
+        self.concurrency = max(1, concurrency)
+        self.thumb_size = thumb_size
+        self.logger = logger or logging.getLogger(__name__)
+        self.client = HTTPClient(timeout)
+        self.queued = set()  # 本次运行已排队的 URL
+        self.downloaded = 0
+        self.bytes = 0
+        self.hits = 0        # 索引中已有，未请求
+        self.duplicates = 0  # 新 URL，但内容与已有文件相同
+        self.failed = 0
+        self.started = time.time()
+        if Image is None and thumb_size:
+            self.logger.warning("未安装 Pillow，只保存原图，不生成缩略图")
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='xhs-images', daemon=True)
+        self.thread.start()
+        self.ready.wait()
+
+    # ---- 采集线程 ----
+    def add(self, urls: Iterable[str]):
+        """排队下载（立即返回）"""
+        urls = [url.strip() for url in urls if url and url.strip().startswith('http')]
+        if urls and self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self._enqueue, urls)
+
+    def wrap(self, insert: Callable[[Dict], None]) -> Callable[[Dict], None]:
+        """包装写入回调：写入后把该条记录的图片交给下载阶段"""
+        def insert_and_download(data: Dict):
+            insert(data)
+            self.add(data.get('images') or [])
+        return insert_and_download
+
+    def close(self):
+        """等队列中的图片下载完，停止下载线程"""
+        if self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.stopping.set)
+            self.thread.join()
+        self.logger.info(self.summary())
+
+    def summary(self) -> str:
+        elapsed = time.time() - self.started
+        return (f"图片下载：新下载 {self.downloaded} 张 / {self.bytes / 1048576:.1f}MB，命中索引 {self.hits}，"
+                f"内容重复 {self.duplicates}，失败 {self.failed}，新建连接 {self.client.connects} / "
+                f"复用 {self.client.reused}，用时 {elapsed:.0f}s")
+
+    # ---- 下载线程 ----
+    def _run(self):
+        try:
+            asyncio.run(self._main())
+        except Exception as e:
+            self.logger.error(f"图片下载线程异常退出: {str(e)}")
+        finally:
+            self.ready.set()  # 启动失败时不阻塞构造函数
+
+    async def _main(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.stopping = asyncio.Event()
+        self.cache = ImageCache(self.root, self.thumb_size, self.logger)
+        self.executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix='xhs-images-http')
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self.ready.set()
+        try:
+            await self.stopping.wait()
+            await self.queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            self.executor.shutdown()
+            self.client.close()
+            self.logger.info(self.cache.summary())
+            self.cache.close()
+
+    def _enqueue(self, urls: List[str]):
+        for url in urls:
+            if url in self.queued:
+                continue
+            self.queued.add(url)
+            if self.cache.digest(url):
+                self.hits += 1
+                continue
+            self.queue.put_nowait(url)
+
+    async def _worker(self):
+        while True:
+            url = await self.queue.get()
+            try:
+                await self._download(url)
+            except Exception as e:
+                self.failed += 1
+                self.logger.warning(f"图片下载失败 {url}: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    async def _download(self, url: str):
+        status, content_type, body = await self.loop.run_in_executor(self.executor, self.client.get, url)
+        if status != 200:
+            raise ValueError(f"HTTP {status}")
+        ext = image_ext(body, content_type)
+        if not ext:
+            raise ValueError(f"不是图片（{content_type or '未知类型'}）")
+        digest = hashlib.sha256(body).hexdigest()
+        if self.cache.has_object(digest):
+            self.duplicates += 1
+        else:
+            thumb = await self.loop.run_in_executor(self.executor, self.cache.write_object, digest, ext, body)
+            self.cache.add_object(digest, ext, len(body), thumb)
+            self.downloaded += 1
+            self.bytes += len(body)
+        self.cache.add_url(url, digest)
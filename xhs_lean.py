@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+精简浏览器模式与流量统计
+- 只需要图片地址，不需要图片本身：精简模式下无头运行，关闭图片加载，
+  并通过 CDP Network.setBlockedURLs 拦截 xhscdn 图片、视频流和字体
+- setBlockedURLs 只对发出命令的标签页生效：主窗口创建后拦截一次，详情标签页切换过去时再拦截；
+  标签页切换前已发出的请求中图片由 --blink-settings=imagesEnabled=false 兜底
+- 卡片首图、详情图片都取自 img 的 src 属性，不依赖图片下载完成，提取结果不变
+- 流量统计：从 performance 日志的 Network 事件累计每个品牌的传输字节、请求数、被拦截的请求数，
+  连同主页加载和详情等待耗时写入统计文件（按 常规/精简 模式分别保存每个品牌最近一次的数据），
+  精简模式下与同一品牌常规模式的数据对比，输出节省的流量和加载时间
+
+无头模式无法手动登录，精简模式需已有可用的 Cookie（先用常规模式登录一次）
+用法：python xhs.py --lean / python artis_rednote_spd.py --lean；GUI 勾选“精简模式”
+流量统计默认关闭（会开启 performance 日志），命令行用 --traffic xhs_traffic.json 开启，
+先不加 --lean 跑一次作为基线；GUI 只在精简模式下统计
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterable, Optional
+
+# 为采集调整的 Chrome 参数（精简模式）
+LEAN_ARGS = (
+    '--headless=new',
+    '--window-size=1366,900',  # 无头默认 800x600，保持与有界面时相近的每屏卡片数
+    '--disable-gpu',
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+    '--blink-settings=imagesEnabled=false',
+    '--mute-audio',
+    '--autoplay-policy=user-gesture-required',
+    '--disable-extensions',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--no-first-run',
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-features=Translate,MediaRouter,OptimizationHints',
+    # 多标签模式下后台标签页不降频
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding',
+)
+
+# Network.setBlockedURLs 的 URL 通配规则：图片、视频流、字体
+BLOCKED_URLS = [
+    '*sns-webpic*.xhscdn.com*', '*sns-img*.xhscdn.com*', '*sns-avatar*.xhscdn.com*', '*ci.xiaohongshu.com*',
+    '*.jpg*', '*.jpeg*', '*.png*', '*.gif*', '*.webp*', '*.avif*', '*.heic*',
+    '*sns-video*.xhscdn.com*', '*.mp4*', '*.m3u8*', '*.flv*',
+    '*.woff*', '*.ttf*', '*.otf*',
+]
+
+
+def apply_lean_options(options):
+    """在 ChromeOptions 上加精简模式参数，须在创建 driver 前调用"""
+    for arg in LEAN_ARGS:
+        options.add_argument(arg)
+
+
+class LeanMode:
+    """按标签页启用 URL 拦截"""
+
+    def __init__(self, driver, logger: Optional[logging.Logger] = None, patterns: Iterable[str] = BLOCKED_URLS):
+        self.driver = driver
+        self.logger = logger or logging.getLogger(__name__)
+        self.patterns = list(patterns)
+        self.covered = set()
+        self.warned = False
+
+    def cover(self):
+        """对当前标签页启用拦截（每个标签页只执行一次）"""
+        try:
+            handle = self.driver.current_window_handle
+            if handle in self.covered:
+                return
+            self.driver.execute_cdp_cmd('Network.enable', {})
+            self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.patterns})
+            self.covered.add(handle)
+        except Exception as e:
+            if not self.warned:
+                self.warned = True
+                self.logger.warning(f"启用资源拦截失败: {str(e)}")
+
+
+def _mb(n: float) -> str:
+    return f"{n / 1048576:.1f}MB"
+
+
+class TrafficMeter:
+    """按品牌统计网络传输，精简模式下与常规模式的基线对比"""
+
+    def __init__(self, driver, path: str, lean: bool, capture=None, logger: Optional[logging.Logger] = None):
+        """capture: 已启用的 NetworkCapture；两者读取同一份 performance 日志，此时由 capture 读取后转交"""
+        self.driver = driver
+        self.path = path
+        self.mode = 'lean' if lean else 'full'
+        self.capture = capture
+        if capture is not None:
+            capture.meter = self
+        self.logger = logger or logging.getLogger(__name__)
+        self._reset()
+        self.total_bytes = 0
+        self.total_blocked = 0
+        self.saved_bytes = 0.0
+        self.saved_seconds = 0.0
+        self.brands = 0
+
+    def _reset(self):
+        self.bytes = 0
+        self.requests = 0
+        self.blocked = 0
+        self.documents = 0
+
+    def feed(self, method: str, params: Dict):
+        if method == 'Network.loadingFinished':
+            self.bytes += int(params.get('encodedDataLength') or 0)
+            self.requests += 1
+        elif method == 'Network.loadingFailed':
+            if params.get('blockedReason'):
+                self.blocked += 1
+        elif method == 'Network.responseReceived' and params.get('type') == 'Document':
+            self.documents += 1
+
+    def poll(self):
+        if self.capture is not None:
+            self.capture.poll()
+            return
+        try:
+            entries = self.driver.get_log('performance')
+        except Exception as e:
+            self.logger.warning(f"读取 performance 日志失败: {str(e)}")
+            return
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            self.feed(message.get('method'), message.get('params') or {})
+
+    # ---- 品牌 ----
+    def begin_brand(self):
+        """丢弃品牌开始前（登录、上一个品牌收尾）的流量"""
+        self.poll()
+        self._reset()
+
+    def end_brand(self, metrics):
+        """metrics: 本品牌的 xhs_metrics.Metrics（取主页加载、滚动、详情等待的次数和耗时）"""
+        name = metrics.brand
+        if name is None:
+            return
+        self.poll()
+        phases = metrics.brands.get(name, {})
+
+        def phase(key):
+            hist = phases.get(key)
+            return (hist.sum, hist.count) if hist else (0.0, 0)
+
+        page_load, page_loads = phase('page_load')
+        detail_wait, details = phase('detail_wait')
+        entry = {
+            'bytes': self.bytes,
+            'requests': self.requests,
+            'blocked': self.blocked,
+            'views': self.documents + phase('scroll_wait')[1],  # 打开的页面数 + 滚动次数
+            'page_load': round(page_load, 3),
+            'page_loads': page_loads,
+            'detail_wait': round(detail_wait, 3),
+            'details': details,
+            'time': int(time.time()),
+        }
+        self.brands += 1
+        self.total_bytes += self.bytes
+        self.total_blocked += self.blocked
+        line = (f"流量[{name}]（{'精简' if self.mode == 'lean' else '常规'}模式）：传输 {_mb(self.bytes)}，"
+                f"请求 {self.requests} 个，拦截 {self.blocked} 个，页面/滚动 {entry['views']} 次")
+        data = self._load()
+        if self.mode == 'lean':
+            line += self._compare(entry, (data.get('full') or {}).get(name))
+        self.logger.info(line)
+        data.setdefault(self.mode, {})[name] = entry
+        self._save(data)
+        self._reset()
+
+    def _compare(self, entry: Dict, base: Optional[Dict]) -> str:
+        if not base or not base.get('views') or not entry['views']:
+            return "；暂无该品牌常规模式的数据，不加 --lean 采集一轮后可对比"
+        saved = base['bytes'] / base['views'] * entry['views'] - entry['bytes']
+        seconds = 0.0
+        for total, count in (('page_load', 'page_loads'), ('detail_wait', 'details')):
+            if base.get(count) and entry[count]:
+                seconds += (base[total] / base[count] - entry[total] / entry[count]) * entry[count]
+        self.saved_bytes += saved
+        self.saved_seconds += seconds
+        expected = saved + entry['bytes']
+        percent = saved / expected * 100 if expected > 0 else 0.0
+        return f"；相比常规模式约节省 {_mb(saved)}（{percent:.0f}%），主页加载和详情等待节省 {seconds:.1f}s"
+
+    # ---- 文件 ----
+    def _load(self) -> Dict:
+        if not self.path:
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            self.logger.warning(f"流量统计文件读取失败 {self.path}: {str(e)}")
+            return {}
+
+    def _save(self, data: Dict):
+        """每个品牌结束时读-改-写，多个工作进程共用一个文件时只覆盖自己的品牌"""
+        if not self.path:
+            return
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            self.logger.error(f"保存流量统计失败 {self.path}: {str(e)}")
+
+    def summary(self) -> str:
+        text = f"流量统计：{self.brands} 个品牌，传输 {_mb(self.total_bytes)}，拦截请求 {self.total_blocked} 个"
+        if self.mode == 'lean':
+            text += f"，相比常规模式约节省 {_mb(self.saved_bytes)} / {self.saved_seconds:.0f}s"
+        return text
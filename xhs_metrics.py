@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+采集各阶段耗时统计
+- 在登录、打开主页、滚动、详情、提取、去重、写入、等待等位置记录耗时（time.perf_counter），按阶段汇总成直方图
+- 同时按品牌和整次运行汇总；每个品牌结束时输出一行耗时分布
+- 运行结束时导出：.prom 为 Prometheus 文本格式，其余为 JSON
+- 每次记录只是一次计时加一次分桶计数，可常开
+
+阶段（外层阶段包含内层，如 detail 包含 detail_wait 和 extract）：
+  login / page_load / scroll / scroll_wait / detail / detail_batch / detail_wait / extract / dedup / insert / sleep
+另有 browser_start（启动或附着浏览器）和 first_brand（从爬虫创建到第一个品牌开始，含浏览器启动和登录）
+"""
+
+import functools
+import json
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # 最后一格为 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """按分桶估算分位数（取所在桶的上界，最后一桶取最大值）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'max': round(self.max, 6),
+            'buckets': {str(le): n for le, n in zip(BUCKETS + ('+Inf',), self.counts)},
+        }
+
+
+def _label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    def __init__(self, run: str, logger: Optional[logging.Logger] = None):
+        """run: 运行名称（brand / artist / gui / unified），作为导出时的标签"""
+        self.run = run
+        self.logger = logger or logging.getLogger(__name__)
+        self.started = time.time()
+        self.phases: Dict[str, Histogram] = {}
+        self.brands: Dict[str, Dict[str, Histogram]] = {}
+        self.brand: Optional[str] = None
+        self.brand_started = 0.0
+        self.startup = ''  # 浏览器启动方式：cold / profile / attach（xhs_browser）
+
+    def observe(self, phase: str, seconds: float):
+        hist = self.phases.get(phase)
+        if hist is None:
+            hist = self.phases[phase] = Histogram()
+        hist.observe(seconds)
+        if self.brand is not None:
+            per_brand = self.brands[self.brand]
+            hist = per_brand.get(phase)
+            if hist is None:
+                hist = per_brand[phase] = Histogram()
+            hist.observe(seconds)
+
+    @contextmanager
+    def span(self, phase: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - start)
+
+    # ---- 品牌 ----
+    def begin_brand(self, name: str):
+        if 'first_brand' not in self.phases:
+            elapsed = time.time() - self.started
+            self.observe('first_brand', elapsed)
+            self.logger.info(f"启动到第一个品牌用时 {elapsed:.1f}s（{self.startup or '未知'}）")
+        self.brand = name
+        self.brands.setdefault(name, {})
+        self.brand_started = time.perf_counter()
+
+    def end_brand(self):
+        if self.brand is None:
+            return
+        self.observe('brand', time.perf_counter() - self.brand_started)
+        self.logger.info(self.brand_summary(self.brand))
+        self.brand = None
+
+    def brand_summary(self, name: str) -> str:
+        phases = self.brands.get(name, {})
+        total = phases['brand'].sum if 'brand' in phases else 0.0
+        parts = [f"{phase} {hist.count}次/{hist.sum:.1f}s" for phase, hist in phases.items() if phase != 'brand']
+        return f"阶段耗时[{name}] 共 {total:.1f}s：" + ('，'.join(parts) or '无')
+
+    # ---- 汇总与导出 ----
+    def summary(self) -> str:
+        if not self.phases:
+            return "阶段耗时统计：无"
+        startup = f"，启动方式 {self.startup}" if self.startup else ''
+        lines = [f"阶段耗时统计（{self.run}，运行 {time.time() - self.started:.0f}s{startup}）："]
+        for phase, hist in self.phases.items():
+            lines.append(f"  {phase}: {hist.count} 次，共 {hist.sum:.1f}s，平均 {hist.sum / hist.count:.2f}s "
+                         f"(p50 ≤{hist.quantile(0.5):.2f}s / p90 ≤{hist.quantile(0.9):.2f}s / 最大 {hist.max:.2f}s)")
+        return '\n'.join(lines)
+
+    def to_json(self) -> Dict:
+        return {
+            'run': self.run,
+            'startup': self.startup,
+            'started': int(self.started),
+            'elapsed': round(time.time() - self.started, 3),
+            'phases': {phase: hist.to_dict() for phase, hist in self.phases.items()},
+            'brands': {name: {phase: hist.to_dict() for phase, hist in phases.items()}
+                       for name, phases in self.brands.items()},
+        }
+
+    def to_prometheus(self) -> str:
+        run = f'run="{_label(self.run)}",startup="{_label(self.startup)}"'
+        lines = [
+            '# HELP xhs_phase_seconds 采集各阶段耗时（整次运行）',
+            '# TYPE xhs_phase_seconds histogram',
+        ]
+        for phase, hist in self.phases.items():
+            labels = f'{run},phase="{_label(phase)}"'
+            cumulative = 0
+            for le, n in zip(BUCKETS + ('+Inf',), hist.counts):
+                cumulative += n
+                lines.append(f'xhs_phase_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'xhs_phase_seconds_sum{{{labels}}} {hist.sum:.6f}')
+            lines.append(f'xhs_phase_seconds_count{{{labels}}} {hist.count}')
+        # 按品牌只导出总耗时和次数，避免标签组合过多
+        lines += [
+            '# HELP xhs_brand_phase_seconds 各品牌各阶段耗时',
+            '# TYPE xhs_brand_phase_seconds summary',
+        ]
+        for name, phases in self.brands.items():
+            for phase, hist in phases.items():
+                labels = f'{run},brand="{_label(name)}",phase="{_label(phase)}"'
+                lines.append(f'xhs_brand_phase_seconds_sum{{{labels}}} {hist.sum:.6f}')
+                lines.append(f'xhs_brand_phase_seconds_count{{{labels}}} {hist.count}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path: str):
+        """写出统计文件：.prom 为 Prometheus 文本格式，其余为 JSON"""
+        if not path:
+            return
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                if path.endswith('.prom'):
+                    f.write(self.to_prometheus())
+                else:
+                    json.dump(self.to_json(), f, ensure_ascii=False, indent=2)
+            self.logger.info(f"阶段耗时已导出: {path}")
+        except Exception as e:
+            self.logger.error(f"阶段耗时导出失败 {path}: {str(e)}")
+
+
+def timed(phase: str):
+    """方法装饰器：把方法耗时记入 self.metrics 的 phase 阶段"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.span(phase):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def worker_path(path: str, worker_id: int) -> str:
+    """进程池中每个工作进程各写一份：xhs_metrics.json -> xhs_metrics.worker-0.json"""
+    if not path:
+        return path
+    stem, dot, ext = path.rpartition('.')
+    return f"{stem}.worker-{worker_id}.{ext}" if dot else f"{path}.worker-{worker_id}"
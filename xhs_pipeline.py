@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+分阶段流水线采集（asyncio）：列表发现 → 详情抓取 → 入库
+- 发现：一个浏览器逐个品牌打开主页、smart_scroll 收集链接和去重，待抓取的详情链接放入详情队列
+- 详情：若干个浏览器各自从详情队列取链接，process_single_note（或多标签 process_notes_batch）抓取详情
+- 入库：从入库队列取结果写入（insert_callback），一个品牌的笔记全部处理完后更新采集时间
+- 阶段之间是有界队列：详情跟不上时发现阶段在 put 处等待，不会无限堆积；
+  详情阶段处理当前品牌的同时，发现阶段已在滚动下一个品牌
+- Selenium 调用是阻塞的，每个浏览器的调用经 asyncio.to_thread 放到线程中执行，同一浏览器同一时刻只有一个调用
+- 每 report_interval 秒输出一次各队列深度和各阶段利用率（忙碌时间 / 墙钟时间 / 工作者数）
+
+用法：python xhs.py --pipeline 2 [--queue-size 40]（1 个发现浏览器 + 2 个详情浏览器）
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from xhs_browser import browser_options
+from xhs_metrics import worker_path
+
+FINISH = object()  # 入库队列中的品牌结束标记（没有待写入的笔记时使用）
+
+
+class StageStats:
+    """单个阶段的忙碌时间，多个工作者累加；进行中的任务按报告区间切分计入"""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.busy = 0.0
+        self.items = 0
+        self.reported = 0.0
+        self.active = {}  # 进行中的任务 -> 开始（或上次报告）时刻
+        self.seq = 0
+
+    @contextmanager
+    def timing(self, items: int = 1):
+        self.seq += 1
+        token = self.seq
+        self.active[token] = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.busy += time.perf_counter() - self.active.pop(token)
+            self.items += items
+
+    def utilization(self, elapsed: float) -> float:
+        """距上次报告以来的利用率"""
+        now = time.perf_counter()
+        for token, start in self.active.items():
+            self.busy += now - start
+            self.active[token] = now
+        busy, self.reported = self.busy - self.reported, self.busy
+        return busy / (elapsed * self.workers) if elapsed > 0 else 0.0
+
+
+class BrandJob:
+    """一个品牌在流水线中的进度：remaining 为尚未入库（或确认失败）的笔记数"""
+
+    def __init__(self, brand: Dict):
+        self.brand = brand
+        self.remaining = 0
+        self.written = 0
+        self.failed = 0
+        self.started = time.time()
+
+
+class Pipeline:
+    def __init__(self, discovery, detail_crawlers: List, insert_callback: Callable,
+                 finish_callback: Optional[Callable] = None, queue_size: int = 40,
+                 report_interval: float = 30.0):
+        """
+        discovery: 负责主页滚动的 XHSCrawler；detail_crawlers: 负责详情页的 XHSCrawler 列表（各自一个浏览器）
+        insert_callback: 写入一条笔记；finish_callback(brand): 品牌全部处理完成（如更新采集时间）
+        """
+        self.discovery = discovery
+        self.detail_crawlers = detail_crawlers
+        self.insert_callback = insert_callback
+        self.finish_callback = finish_callback
+        self.queue_size = queue_size
+        self.report_interval = report_interval
+        self.stats = {
+            'discover': StageStats('发现', 1),
+            'detail': StageStats('详情', len(detail_crawlers)),
+            'persist': StageStats('入库', 1),
+        }
+        self.done = 0
+        self.failed = 0
+        # 发现失败或收尾失败的品牌，运行断点不会记为完成，--resume 时重试
+        self.failed_brands: List[Dict] = []
+        # 已走完流水线的品牌数，详情浏览器据此在批次之间清理各自的品牌缓存
+        self.finished = 0
+
+    async def run(self, brands: List[Dict]):
+        self.detail_q = asyncio.Queue(self.queue_size)
+        self.persist_q = asyncio.Queue(self.queue_size)
+        start = time.time()
+        monitor = asyncio.create_task(self._monitor())
+        details = [asyncio.create_task(self._detail_worker(crawler)) for crawler in self.detail_crawlers]
+        persist = asyncio.create_task(self._persist())
+        try:
+            await self._discover(brands)
+            for _ in details:
+                await self.detail_q.put(None)
+            await asyncio.gather(*details)
+            await self.persist_q.put(None)
+            await persist
+        finally:
+            monitor.cancel()
+            for task in details + [persist]:
+                task.cancel()
+        self._report()
+        logging.info(f"流水线采集结束：成功 {self.done}，失败 {self.failed}，用时 {time.time() - start:.0f}s")
+        if self.failed_brands:
+            logging.warning("未完成的品牌: " + '，'.join(brand['brand_name'] for brand in self.failed_brands))
+
+    # ---- 发现 ----
+    def _discover_brand(self, brand: Dict):
+        """在线程中执行：返回 (采集模式, 待抓取的详情链接, 快速模式数据)"""
+        crawler = self.discovery
+        crawler.metrics.begin_brand(brand['brand_name'])
+        if crawler.traffic:
+            crawler.traffic.begin_brand()
+        try:
+            spd_setting = brand.get('rednote_spd_setting', 1)
+            logging.info(f"品牌[{brand['brand_name']}]采集配置: {spd_setting}")
+            if spd_setting == 3:
+                logging.info(f"品牌[{brand['brand_name']}]配置不采集，跳过")
+                return spd_setting, [], []
+            pending = crawler.discover(brand, spd_setting)
+            quick = list(crawler.collected_quick_data) if spd_setting == 2 else []
+            return spd_setting, pending, quick
+        finally:
+            crawler.reset_brand()
+            if crawler.traffic:
+                crawler.traffic.end_brand(crawler.metrics)
+            crawler.metrics.end_brand()
+            crawler.keeper.tick(crawler.driver)
+
+    async def _discover(self, brands: List[Dict]):
+        for brand in brands:
+            try:
+                with self.stats['discover'].timing():
+                    spd_setting, pending, quick = await asyncio.to_thread(self._discover_brand, brand)
+            except Exception as e:
+                logging.error(f"作者采集失败 {brand['rednote_url']}: {str(e)}")
+                self.failed += 1
+                self.failed_brands.append(brand)
+                continue
+            job = BrandJob(brand)
+            job.remaining = len(pending) + len(quick)
+            logging.info(f"品牌[{brand['brand_name']}]发现完成：待抓取详情 {len(pending)}，快速采集 {len(quick)}，"
+                         f"详情队列 {self.detail_q.qsize()}/{self.queue_size}")
+            if not job.remaining:
+                await self.persist_q.put((job, FINISH))
+            for quick_data in quick:
+                quick_data.update({'brand_id': brand['id'], 'brand_name': brand['brand_name'], 'auth_time': 0})
+                await self.persist_q.put((job, quick_data))
+            for note_url in pending:
+                # 队列已满时在这里等待详情阶段
+                await self.detail_q.put((job, note_url))
+
+    # ---- 详情 ----
+    @staticmethod
+    def _fetch(crawler, urls: List[str]) -> List[Optional[Dict]]:
+        try:
+            if len(urls) == 1:
+                return [crawler.process_single_note(urls[0])]
+            return crawler.process_notes_batch(urls)
+        except Exception as e:
+            logging.error(f"详情抓取失败: {str(e)}")
+            return [None] * len(urls)
+
+    async def _detail_worker(self, crawler):
+        stopping = False
+        reset_at = 0
+        while not stopping:
+            item = await self.detail_q.get()
+            if item is None:
+                break
+            # 多标签模式下把队列中已有的链接凑成一批
+            batch = [item]
+            while len(batch) < crawler.detail_tabs and not self.detail_q.empty():
+                item = self.detail_q.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            with self.stats['detail'].timing(len(batch)):
+                details = await asyncio.to_thread(self._fetch, crawler, [url for _, url in batch])
+            for (job, _), detail in zip(batch, details):
+                if detail:
+                    detail.update({'brand_id': job.brand['id'], 'brand_name': job.brand['brand_name']})
+                await self.persist_q.put((job, detail))
+            # 有品牌完成时清理接口缓存等品牌级状态（两批之间没有进行中的详情页）
+            if reset_at != self.finished:
+                reset_at = self.finished
+                crawler.reset_brand()
+
+    # ---- 入库 ----
+    async def _persist(self):
+        while True:
+            item = await self.persist_q.get()
+            if item is None:
+                break
+            job, record = item
+            if record is not FINISH:
+                job.remaining -= 1
+                if record:
+                    with self.stats['persist'].timing():
+                        try:
+                            self.insert_callback(record)
+                            job.written += 1
+                        except Exception as e:
+                            job.failed += 1
+                            logging.error(f"数据库插入失败: {str(e)}")
+                else:
+                    job.failed += 1
+            if job.remaining <= 0:
+                await self._finish(job)
+
+    async def _finish(self, job: BrandJob):
+        brand = job.brand
+        self.finished += 1
+        logging.info(f"品牌[{brand['brand_name']}]完成：写入 {job.written}，失败 {job.failed}，"
+                     f"从发现到入库 {time.time() - job.started:.0f}s")
+        if self.finish_callback:
+            try:
+                # 收尾要等数据库线程提交，放到线程里执行，不阻塞其他阶段
+                await asyncio.to_thread(self.finish_callback, brand)
+            except Exception as e:
+                logging.error(f"品牌收尾失败 {brand['brand_name']}: {str(e)}")
+                self.failed += 1
+                self.failed_brands.append(brand)
+                return
+        self.done += 1
+
+    # ---- 监控 ----
+    def _report(self, elapsed: float = 0.0):
+        utilization = '，'.join(f"{stats.name} {stats.utilization(elapsed) * 100:.0f}%（{stats.items}）"
+                                for stats in self.stats.values()) if elapsed else ''
+        logging.info(f"流水线：详情队列 {self.detail_q.qsize()}/{self.queue_size}，"
+                     f"入库队列 {self.persist_q.qsize()}/{self.queue_size}，已完成品牌 {self.done}"
+                     + (f"；利用率 {utilization}" if utilization else ''))
+
+    async def _monitor(self):
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(self.report_interval)
+            now = time.perf_counter()
+            self._report(now - last)
+            last = now
+
+
+def run_pipeline(crawler_cls, db, brands: List[Dict], detail_workers: int, crawler_options: Dict,
+                 queue_size: int = 40, checkpoint=None, metrics_out: str = '', report_interval: float = 30.0,
+                 image_stage=None):
+    """启动 1 个发现浏览器和 detail_workers 个详情浏览器，跑完 brands 后关闭浏览器
+
+    db 需提供 is_url_exists / existing_urls / insert_one / update_last_gather_time（如 xhs.DatabaseManager），
+    checkpoint 为 xhs_checkpoint.Checkpoint 时记录已完成的品牌；
+    crawler_options 中的 governor 为全部浏览器共用的限速器（xhs_governor），未传入时各浏览器各自限速；
+    image_stage 为 xhs_images.ImageStage 时，写入后把记录中的图片交给它下载（由调用方关闭）。
+    """
+    insert = image_stage.wrap(db.insert_one) if image_stage else db.insert_one
+    crawlers = []
+    try:
+        for i in range(1 + max(1, detail_workers)):
+            # 每个浏览器一个用户目录/附着地址；流量按品牌统计，只在发现浏览器上记录
+            options = browser_options(crawler_options, i)
+            if i:
+                options['traffic'] = ''
+            crawler = crawler_cls(url_checker=db.is_url_exists, insert_callback=insert,
+                                  batch_url_checker=db.existing_urls, flush_callback=db.flush, **options)
+            crawlers.append(crawler)
+            crawler.login()
+
+        def finish(brand: Dict):
+            # 缓冲中的笔记提交后才更新采集时间、记入运行断点，提交失败按品牌失败处理
+            if not db.flush():
+                raise RuntimeError('缓冲笔记提交失败')
+            db.update_last_gather_time(brand['id'])
+            logging.info(f"已更新采集时间: {brand['brand_name']}")
+            if checkpoint:
+                checkpoint.brand_done(brand['id'])
+
+        pipeline = Pipeline(crawlers[0], crawlers[1:], insert, finish,
+                            queue_size=queue_size, report_interval=report_interval)
+        asyncio.run(pipeline.run(brands))
+        # 有品牌失败时保留断点，--resume 只重跑这些品牌
+        if checkpoint and not pipeline.failed_brands:
+            checkpoint.finish()
+        elif checkpoint:
+            logging.info(f"本轮有 {len(pipeline.failed_brands)} 个品牌失败，保留断点，可用 --resume 继续")
+    finally:
+        if crawlers:
+            logging.info(crawlers[0].governor.summary())
+        for name, crawler in zip(['discovery'] + [f'detail-{i}' for i in range(len(crawlers) - 1)], crawlers):
+            logging.info(f"[{name}] {crawler.waiter.summary()}")
+            logging.info(crawler.metrics.summary())
+            if crawler.traffic:
+                logging.info(crawler.traffic.summary())
+            crawler.metrics.export(worker_path(metrics_out, name))
+            try:
+                crawler.driver.quit()
+            except Exception:
+                pass
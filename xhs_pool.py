@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+多浏览器进程池采集
+- 主进程持有唯一的数据库连接：负责下发品牌队列、去重查询、缓冲写入和更新采集时间
+- 每个工作进程各自启动一个 Chrome，串行采集从共享队列领取的品牌
+- 工作进程之间互不影响：浏览器失效时在进程内重建，进程崩溃时由主进程补起新进程
+
+用法：python xhs.py --workers 3 / python artis_rednote_spd.py --workers 3
+"""
+
+import importlib
+import logging
+import multiprocessing as mp
+import multiprocessing.connection as mp_connection
+import sys
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from xhs_checkpoint import Checkpoint
+from xhs_metrics import worker_path
+from xhs_browser import browser_options
+
+
+class PoolKind:
+    """一种采集流水线（品牌/艺术家）在进程池中的接入方式"""
+
+    def __init__(self, module: str, db_class: str, fetch: str, crawler_class: str,
+                 crawl: str, insert: str, log_file: str):
+        self.module = module
+        self.db_class = db_class
+        self.fetch = fetch
+        self.crawler_class = crawler_class
+        self.crawl = crawl
+        self.insert = insert
+        self.log_file = log_file
+
+
+POOL_KINDS = {
+    'brand': PoolKind('xhs', 'DatabaseManager', 'fetch_brand_urls',
+                      'XHSCrawler', 'crawl_author', 'insert_one', 'xhs_crawler.log'),
+    'artist': PoolKind('artis_rednote_spd', 'ArtistDatabaseManager', 'fetch_artists',
+                       'ArtistXHSCrawler', 'crawl_artist', 'insert_artist_data', 'artist_crawler.log'),
+}
+
+# ===================== 工作进程 =====================
+
+class DBProxy:
+    """工作进程内的数据库代理，所有操作经管道转发给主进程"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def _call(self, op: str, arg):
+        self.conn.send((op, arg))
+        return self.conn.recv()
+
+    def is_url_exists(self, url: str) -> bool:
+        return bool(self._call('check', [url]))
+
+    def existing_urls(self, urls) -> set:
+        return self._call('check', list(urls))
+
+    def count_collected(self, brand_id: int) -> int:
+        return self._call('count', brand_id)
+
+    def insert(self, data: Dict):
+        self.conn.send(('insert', data))
+
+    def flush(self) -> bool:
+        """等主进程提交此前发出的全部写入（管道按顺序处理，之前的 insert 已入缓冲）"""
+        return self._call('flush', None)
+
+    def next_brand(self) -> Optional[Dict]:
+        return self._call('next', None)
+
+    def brand_done(self, brand: Dict, ok: bool):
+        self.conn.send(('done', (brand, ok)))
+
+
+def _driver_alive(crawler) -> bool:
+    try:
+        crawler.driver.window_handles
+        return True
+    except Exception:
+        return False
+
+
+def _start_crawler(crawler_cls, db: DBProxy, crawler_options: Dict, metrics=None):
+    crawler = crawler_cls(url_checker=db.is_url_exists, insert_callback=db.insert,
+                          batch_url_checker=db.existing_urls, flush_callback=db.flush, **crawler_options)
+    if metrics is not None:
+        # 浏览器重建后沿用原来的统计，进程内只导出一份
+        crawler.metrics = crawler.waiter.metrics = metrics
+    crawler.login()
+    return crawler
+
+
+def _worker_main(kind_name: str, worker_id: int, conn, crawler_options: Dict, metrics_out: str):
+    kind = POOL_KINDS[kind_name]
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s - %(levelname)s - [worker-{worker_id}] %(message)s',
+        handlers=[
+            logging.FileHandler(kind.log_file, encoding='utf-8'),
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+    module = importlib.import_module(kind.module)
+    crawler_cls = getattr(module, kind.crawler_class)
+    db = DBProxy(conn)
+    crawler = None
+    try:
+        crawler = _start_crawler(crawler_cls, db, crawler_options)
+        while True:
+            brand = db.next_brand()
+            if brand is None:
+                break
+            ok = False
+            try:
+                ok = getattr(crawler, kind.crawl)(brand)
+            except Exception as e:
+                logging.error(f"品牌处理异常 {brand['brand_name']}: {str(e)}")
+            finally:
+                # 失败的品牌同样清掉已收集的链接和去重缓存，不混入下一个品牌
+                crawler.reset_brand()
+            db.brand_done(brand, ok)
+
+            # 浏览器失效时在本进程内重建，不影响其他工作进程
+            if not ok and not _driver_alive(crawler):
+                logging.warning("浏览器已失效，重新启动")
+                try:
+                    crawler.driver.quit()
+                except Exception:
+                    pass
+                metrics, crawler = crawler.metrics, None
+                crawler = _start_crawler(crawler_cls, db, crawler_options, metrics)
+    except Exception as e:
+        # 浏览器启动/重建失败：本进程退出，由主进程补起新进程接手剩余品牌
+        logging.error(f"浏览器启动失败，工作进程退出: {str(e)}")
+    finally:
+        if crawler is None:
+            return
+        logging.info(crawler.waiter.summary())
+        if crawler.capture:
+            logging.info(crawler.capture.summary())
+        if crawler.traffic:
+            logging.info(crawler.traffic.summary())
+        logging.info(crawler.metrics.summary())
+        crawler.metrics.export(worker_path(metrics_out, worker_id))
+        try:
+            crawler.driver.quit()
+        except Exception:
+            pass
+
+
+# ===================== 主进程 =====================
+
+class _Worker:
+    """主进程侧的工作进程句柄：每个进程一条独立管道，互不共享锁"""
+
+    def __init__(self, ctx, kind_name: str, worker_id: int, crawler_options: Dict, metrics_out: str):
+        self.worker_id = worker_id
+        self.conn, child_conn = ctx.Pipe()
+        self.crawler_options = crawler_options  # 崩溃后补起的进程沿用同一用户目录/附着地址
+        self.brand = None  # 已派发、尚未完成的品牌
+        self.exited = False
+        self.process = ctx.Process(target=_worker_main, name=f'xhs-worker-{worker_id}',
+                                   args=(kind_name, worker_id, child_conn, crawler_options, metrics_out))
+        self.process.start()
+        child_conn.close()
+
+
+def run_pool(kind_name: str, workers: int, crawler_options: Optional[Dict] = None, scheduler=None,
+             metrics_out: str = '', checkpoint: str = '', resume: bool = False, image_stage=None):
+    """以 workers 个浏览器进程并行采集，阻塞直到全部品牌处理完毕
+
+    crawler_options 传给每个工作进程的爬虫构造函数（如 detail_tabs / capture），
+    其中 user_data_dir / attach 按进程序号分配（xhs_browser.browser_options），governor 为全部进程共用的限速器；
+    scheduler 为 BrandScheduler 时按其排期顺序派发，推迟的品牌本轮不采集；
+    metrics_out 非空时每个工作进程各导出一份阶段耗时（文件名加 .worker-N）；
+    checkpoint 非空时主进程记录品牌完成情况，工作进程记录各自品牌的断点，resume 为真时从断点继续；
+    image_stage 为 xhs_images.ImageStage 时，主进程写入后把记录中的图片交给它下载（由调用方关闭）。
+    """
+    crawler_options = dict(crawler_options or {}, checkpoint=checkpoint)
+    # 每个浏览器一个用户目录/附着地址（xhs_browser），地址不足时在连接数据库之前报错
+    slots = [browser_options(crawler_options, i) for i in range(workers)]
+    kind = POOL_KINDS[kind_name]
+    module = importlib.import_module(kind.module)
+    db = getattr(module, kind.db_class)()
+    insert = getattr(db, kind.insert)
+    if image_stage:
+        insert = image_stage.wrap(insert)
+
+    brands = getattr(db, kind.fetch)()
+    run_checkpoint = Checkpoint(checkpoint)
+    resumed = run_checkpoint.resume(brands) if resume else None
+    if resumed is not None:
+        brands = resumed
+    else:
+        if scheduler:
+            brands = scheduler.schedule(db.connection, brands)
+        run_checkpoint.start(brands)
+    pending = deque(brands)
+    workers = max(1, min(workers, len(pending)))
+    logging.info(f"进程池采集：{len(pending)} 个品牌，{workers} 个浏览器进程")
+
+    ctx = mp.get_context('spawn')
+    pool = {}
+    for worker_id in range(workers):
+        pool[worker_id] = _Worker(ctx, kind_name, worker_id, slots[worker_id], metrics_out)
+    next_id = workers
+    restarts_left = workers * 2
+    retried = set()  # 因进程崩溃重新排队过的品牌，只重试一次
+    done = failed = 0
+    start_ts = time.time()
+
+    def handle(worker: _Worker, op: str, arg):
+        nonlocal done, failed
+        if op == 'next':
+            worker.brand = pending.popleft() if pending else None
+            if worker.brand:
+                logging.info(f"[worker-{worker.worker_id}] 处理品牌: {worker.brand['brand_name']}"
+                             f"（剩余 {len(pending)}）")
+            worker.conn.send(worker.brand)
+        elif op == 'check':
+            try:
+                result = db.existing_urls(arg)
+            except Exception as e:
+                logging.error(f"批量去重查询失败: {str(e)}")
+                result = set()
+            worker.conn.send(result)
+        elif op == 'count':
+            try:
+                result = db.count_collected(arg)
+            except Exception as e:
+                logging.error(f"查询已采集数量失败: {str(e)}")
+                result = 0
+            worker.conn.send(result)
+        elif op == 'insert':
+            try:
+                insert(arg)
+            except Exception as e:
+                logging.error(f"数据库插入失败: {str(e)}")
+        elif op == 'flush':
+            try:
+                result = db.flush()
+            except Exception as e:
+                logging.error(f"提交缓冲写入失败: {str(e)}")
+                result = False
+            worker.conn.send(result)
+        elif op == 'done':
+            brand, ok = arg
+            worker.brand = None
+            if ok:
+                done += 1
+                try:
+                    # 缓冲中的笔记提交后才更新采集时间、记入运行断点
+                    if db.flush():
+                        db.update_last_gather_time(brand['id'])
+                        logging.info(f"已更新采集时间: {brand['brand_name']}")
+                        run_checkpoint.brand_done(brand['id'])
+                    else:
+                        logging.error(f"缓冲笔记提交失败，不更新采集时间: {brand['brand_name']}")
+                except Exception as e:
+                    logging.error(f"更新采集时间失败 {brand['brand_name']}: {str(e)}")
+            else:
+                failed += 1
+
+    def reap(worker: _Worker):
+        """工作进程结束：正常领完任务退出，或中途崩溃（中断的品牌放回队首，补起新进程接手剩余品牌）"""
+        nonlocal failed, next_id, restarts_left
+        worker.exited = True
+        worker.process.join(timeout=10)
+        if worker.brand is not None:
+            brand, worker.brand = worker.brand, None
+            logging.error(f"[worker-{worker.worker_id}] 进程异常退出 (exitcode={worker.process.exitcode})，"
+                          f"品牌采集中断: {brand['brand_name']}")
+            if brand['id'] in retried:
+                failed += 1
+                logging.error(f"品牌已重试过一次，本轮放弃: {brand['brand_name']}")
+            else:
+                retried.add(brand['id'])
+                pending.appendleft(brand)
+                logging.info(f"品牌重新排队: {brand['brand_name']}")
+        elif pending:
+            # 未领到品牌就退出（如浏览器启动失败），队列中还有品牌时同样补起新进程
+            logging.error(f"[worker-{worker.worker_id}] 进程提前退出 (exitcode={worker.process.exitcode})，"
+                          f"剩余 {len(pending)} 个品牌")
+        if pending and restarts_left > 0:
+            restarts_left -= 1
+            pool[next_id] = _Worker(ctx, kind_name, next_id, worker.crawler_options, metrics_out)
+            logging.info(f"已补起 worker-{next_id}")
+            next_id += 1
+
+    try:
+        while True:
+            alive = {w.conn: w for w in pool.values() if not w.exited}
+            if not alive:
+                break
+            for conn in mp_connection.wait(list(alive), timeout=1):
+                worker = alive[conn]
+                try:
+                    op, arg = conn.recv()
+                except (EOFError, OSError):
+                    reap(worker)
+                    continue
+                handle(worker, op, arg)
+        run_checkpoint.finish()
+    except KeyboardInterrupt:
+        logging.info("收到中断，停止全部工作进程")
+        for worker in pool.values():
+            if worker.process.is_alive():
+                worker.process.terminate()
+    finally:
+        for worker in pool.values():
+            worker.process.join(timeout=10)
+        db.flush()
+        logging.info(db.note_index.summary())
+        if crawler_options.get('governor'):
+            # 限速器状态在共享内存中，主进程读到的是全部工作进程的合计
+            logging.info(crawler_options['governor'].summary())
+        logging.info(f"进程池采集结束：成功 {done}，失败 {failed}，未处理 {len(pending)}，"
+                     f"用时 {time.time() - start_ts:.0f}s")
+        db.close()
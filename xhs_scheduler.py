@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+按发帖频率安排采集顺序
+- 从 spider_log / artist_spider_log 的历史笔记时间估算每个品牌的发帖速率（篇/天）
+- 预计新笔记数 = 发帖速率 × 距上次采集的天数；按 预计新笔记 / 采集成本 从高到低访问
+- 预计新笔记不足 min_expected 的品牌本轮推迟；距上次采集超过 max_stale_days 天的品牌强制采集
+- 从未采集过的品牌排在最前；spider_index 仅作为同分时的次序
+
+用法：python xhs.py --dry-run 只输出计划顺序不启动浏览器
+"""
+
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+DAY = 86400
+
+
+class BrandPlan:
+    """单个品牌的排期结果"""
+
+    def __init__(self, brand: Dict, rate: float, stale_days: Optional[float], expected: float,
+                 score: float, reason: str):
+        self.brand = brand
+        self.rate = rate                # 发帖速率（篇/天）
+        self.stale_days = stale_days    # 距上次采集天数，None 为从未采集
+        self.expected = expected        # 预计新笔记数
+        self.score = score              # 预计新笔记 / 采集成本
+        self.reason = reason
+
+
+class BrandScheduler:
+    def __init__(self, table: str, setting_key: str, window_days: int = 180, min_span_days: int = 30,
+                 max_stale_days: float = 14, min_expected: float = 0.5, detail_cost: float = 0.3,
+                 logger: Optional[logging.Logger] = None):
+        """
+        table: 历史笔记表（artist_spider_log 的艺术家ID同样存在 brand_id 列）
+        setting_key: 品牌行中采集模式字段（1 全量 / 2 快速 / 3 不采集）
+        window_days: 估算发帖速率使用的历史窗口
+        min_span_days: 历史不足该天数时按该天数计算速率，避免新品牌速率虚高
+        detail_cost: 全量模式下每条新笔记的详情页成本（以一次主页加载+滚动为 1）
+        """
+        self.table = table
+        self.setting_key = setting_key
+        self.window_days = window_days
+        self.min_span_days = min_span_days
+        self.max_stale_days = max_stale_days
+        self.min_expected = min_expected
+        self.detail_cost = detail_cost
+        self.logger = logger or logging.getLogger(__name__)
+
+    def load_history(self, connection, brand_ids: List[int], now: float) -> Dict[int, Dict]:
+        """窗口内每个品牌的笔记数与最早时间；快速模式没有发布时间，用入库时间代替"""
+        if not brand_ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(brand_ids))
+        sql = f"""
+            SELECT brand_id, COUNT(*) AS n, MIN(IF(auth_time > 0, auth_time, created_at)) AS first_ts
+            FROM {self.table}
+            WHERE brand_id IN ({placeholders})
+              AND IF(auth_time > 0, auth_time, created_at) >= %s
+            GROUP BY brand_id
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, list(brand_ids) + [int(now - self.window_days * DAY)])
+            return {row['brand_id']: row for row in cursor.fetchall()}
+
+    def plan(self, connection, brands: List[Dict], now: Optional[float] = None) -> Tuple[List[BrandPlan], List[BrandPlan]]:
+        """返回 (本轮采集顺序, 推迟的品牌)"""
+        now = now or time.time()
+        try:
+            history = self.load_history(connection, [b['id'] for b in brands], now)
+        except Exception as e:
+            self.logger.error(f"读取发帖历史失败，按原顺序采集: {str(e)}")
+            return [BrandPlan(b, 0.0, None, 0.0, 0.0, '原顺序') for b in brands], []
+
+        scheduled, skipped, deferred = [], [], []
+        for brand in brands:
+            setting = brand.get(self.setting_key, 1)
+            if setting == 3:
+                # 配置不采集的品牌不加载页面，放在最后
+                skipped.append(BrandPlan(brand, 0.0, None, 0.0, 0.0, '不采集'))
+                continue
+
+            row = history.get(brand['id'])
+            if row:
+                span = min(self.window_days, max(self.min_span_days, (now - float(row['first_ts'])) / DAY))
+                rate = row['n'] / span
+            else:
+                rate = 0.0
+
+            last = brand.get('last_gather_time')
+            if last is None:
+                scheduled.append(BrandPlan(brand, rate, None, float('inf'), float('inf'), '从未采集'))
+                continue
+            if isinstance(last, datetime):
+                last = last.timestamp()
+            stale_days = max(0.0, (now - float(last)) / DAY)
+            expected = rate * stale_days
+            cost = 1 + (self.detail_cost * expected if setting == 1 else 0)
+            plan = BrandPlan(brand, rate, stale_days, expected, expected / cost, '')
+
+            if stale_days >= self.max_stale_days:
+                plan.reason = '超过最长间隔'
+                scheduled.append(plan)
+            elif expected < self.min_expected:
+                plan.reason = '预计无新笔记'
+                deferred.append(plan)
+            else:
+                scheduled.append(plan)
+
+        scheduled.sort(key=lambda p: (-p.score, -(p.brand.get('spider_index') or 0)))
+        return scheduled + skipped, deferred
+
+    def schedule(self, connection, brands: List[Dict]) -> List[Dict]:
+        """排期并输出计划，返回本轮要采集的品牌（按顺序）"""
+        scheduled, deferred = self.plan(connection, brands)
+        self.logger.info(format_plan(scheduled, deferred))
+        return [p.brand for p in scheduled]
+
+
+def format_plan(scheduled: List[BrandPlan], deferred: List[BrandPlan]) -> str:
+    def line(index, plan: BrandPlan) -> str:
+        stale = '-' if plan.stale_days is None else f"{plan.stale_days:.1f}"
+        expected = '∞' if plan.expected == float('inf') else f"{plan.expected:.1f}"
+        return (f"{index:>4} {plan.brand['brand_name'][:20]:<20} {plan.rate:>8.2f} {stale:>8} "
+                f"{expected:>8}  {plan.reason}")
+
+    header = f"{'序号':>4} {'名称':<20} {'篇/天':>8} {'间隔天':>8} {'预计新':>8}  备注"
+    lines = [f"采集计划：本轮 {len(scheduled)} 个，推迟 {len(deferred)} 个", header]
+    lines += [line(i, p) for i, p in enumerate(scheduled, start=1)]
+    if deferred:
+        lines.append("推迟：")
+        lines += [line('-', p) for p in deferred]
+    return '\n'.join(lines)
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+登录会话存储（代替直接 pickle.load 的 Cookie 文件）
+- 每个账号一条记录：Cookie、登录态 Cookie 的最早过期时间、保存时间、最近一次确认已登录的时间
+- 启动浏览器前离线判断：登录态 Cookie 已过期/被判定失效时不再注入 Cookie、刷新、等 15 秒侧边栏，直接进入手动登录；
+  无头模式（精简模式）无法手动登录，此时在启动前就报错退出
+- 采集过程中站点会续期 Cookie：每个品牌结束后检查一次（SessionKeeper），快过期或距上次确认已久时，
+  从浏览器读回当前 Cookie 写入存储，下次启动用的是最新的登录态。
+  Selenium 的 driver 不能跨线程使用，这一步在采集线程的品牌间隙执行，只有到期时才多一次 get_cookies
+- 首次使用时从原来的 xhs_cookie.pkl / xhs_artist_cookie.pkl / weidian_cookie.pkl 导入，之后只写 xhs_sessions.json
+- 多个进程共用一个文件：保存时读-改-写，只覆盖自己的账号
+
+账号：xhs（品牌采集、GUI、合并采集）、xhs_artist（艺术家采集）、weidian
+"""
+
+import json
+import logging
+import os
+import pickle
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+SESSION_FILE = 'xhs_sessions.json'
+
+
+class Account:
+    def __init__(self, name: str, legacy: str, auth_cookies: tuple):
+        """legacy: 原 pickle 文件；auth_cookies: 代表登录态的 Cookie，其过期时间即会话过期时间"""
+        self.name = name
+        self.legacy = legacy
+        self.auth_cookies = auth_cookies
+
+
+ACCOUNTS = {
+    'xhs': Account('xhs', 'xhs_cookie.pkl', ('web_session',)),
+    'xhs_artist': Account('xhs_artist', 'xhs_artist_cookie.pkl', ('web_session',)),
+    'weidian': Account('weidian', 'weidian_cookie.pkl', ('login_token', 'uid')),
+}
+
+# 会话状态
+MISSING = 'missing'        # 没有保存的 Cookie 或缺少登录态 Cookie
+EXPIRED = 'expired'        # 登录态 Cookie 已过期
+INVALID = 'invalid'        # 上次注入后没能登录
+UNVERIFIED = 'unverified'  # 未过期，但很久没有确认过
+FRESH = 'fresh'
+
+USABLE = (FRESH, UNVERIFIED)  # 值得注入 Cookie 尝试的状态
+
+
+def _fmt(ts: Optional[float]) -> str:
+    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M') if ts else '无'
+
+
+class SessionStore:
+    def __init__(self, path: str = SESSION_FILE, logger: Optional[logging.Logger] = None,
+                 refresh_margin: float = 3 * 86400, refresh_interval: float = 6 * 3600,
+                 max_unverified: float = 7 * 86400):
+        """refresh_margin: 距过期不足该秒数时续存；refresh_interval: 距上次确认超过该秒数时续存；
+        max_unverified: 超过该秒数未确认的会话标记为 unverified（仍会尝试）"""
+        self.path = path
+        self.logger = logger or logging.getLogger(__name__)
+        self.refresh_margin = refresh_margin
+        self.refresh_interval = refresh_interval
+        self.max_unverified = max_unverified
+
+    # ---- 文件 ----
+    def _read(self) -> Dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            self.logger.warning(f"会话文件读取失败 {self.path}: {str(e)}")
+            return {}
+
+    def _write(self, name: str, record: Optional[Dict]):
+        data = self._read()
+        if record is None:
+            data.pop(name, None)
+        else:
+            data[name] = record
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            self.logger.error(f"保存会话失败 {self.path}: {str(e)}")
+
+    def _import_legacy(self, name: str) -> Optional[Dict]:
+        account = ACCOUNTS.get(name)
+        if not account or not os.path.exists(account.legacy) or not os.path.getsize(account.legacy):
+            return None
+        try:
+            with open(account.legacy, 'rb') as f:
+                cookies = pickle.load(f)
+        except Exception as e:
+            self.logger.warning(f"导入旧 Cookie 文件失败 {account.legacy}: {str(e)}")
+            return None
+        self.logger.info(f"已从 {account.legacy} 导入账号 {name} 的 Cookie")
+        # 旧文件没有确认时间，按文件修改时间算
+        return self.save(name, cookies, validated=False, saved=os.path.getmtime(account.legacy))
+
+    # ---- 读取 ----
+    def get(self, name: str) -> Optional[Dict]:
+        record = self._read().get(name)
+        if record is None:
+            record = self._import_legacy(name)
+        return record
+
+    def cookies(self, name: str) -> List[Dict]:
+        record = self.get(name)
+        return list(record['cookies']) if record else []
+
+    def status(self, name: str, record: Optional[Dict] = None) -> str:
+        record = record or self.get(name)
+        if not record or not record.get('cookies'):
+            return MISSING
+        if record.get('invalid'):
+            return INVALID
+        now = time.time()
+        expires = record.get('expires')
+        if expires is not None and expires <= now:
+            return EXPIRED
+        if not record.get('has_auth', True):
+            return MISSING
+        if now - (record.get('validated') or 0) > self.max_unverified:
+            return UNVERIFIED
+        return FRESH
+
+    def describe(self, name: str) -> str:
+        record = self.get(name)
+        status = self.status(name, record)
+        if not record:
+            return f"会话[{name}]：{status}（没有保存的 Cookie）"
+        return (f"会话[{name}]：{status}，登录态有效期至 {_fmt(record.get('expires'))}，"
+                f"最近确认 {_fmt(record.get('validated'))}")
+
+    def due(self, name: str) -> bool:
+        """是否该从浏览器续存（快过期或距上次确认已久）"""
+        record = self.get(name)
+        if not record:
+            return True
+        now = time.time()
+        expires = record.get('expires')
+        return ((expires is not None and expires - now < self.refresh_margin)
+                or now - (record.get('validated') or 0) > self.refresh_interval)
+
+    # ---- 写入 ----
+    def save(self, name: str, cookies: List[Dict], validated: bool = True, saved: Optional[float] = None) -> Dict:
+        """保存 Cookie；validated 表示此刻已确认处于登录状态"""
+        account = ACCOUNTS.get(name)
+        auth = [c for c in cookies if account and c.get('name') in account.auth_cookies]
+        expiries = [c['expiry'] for c in auth if c.get('expiry')]
+        now = time.time()
+        previous = self._read().get(name) or {}
+        record = {
+            'cookies': cookies,
+            'expires': min(expiries) if expiries else None,
+            'has_auth': bool(auth) or not account,
+            'saved': int(saved or now),
+            'validated': int(now) if validated else previous.get('validated', 0),
+            'invalid': False,
+        }
+        self._write(name, record)
+        return record
+
+    def invalidate(self, name: str):
+        """注入 Cookie 后仍未登录：下次启动不再尝试，直接手动登录"""
+        record = self._read().get(name)
+        if record:
+            record['invalid'] = True
+            self._write(name, record)
+            self.logger.warning(f"会话[{name}]已失效，下次启动将直接进入手动登录")
+
+
+def preflight(store: SessionStore, name: str, interactive: bool = True,
+              logger: Optional[logging.Logger] = None) -> bool:
+    """启动浏览器前检查会话；需要手动登录但浏览器不可见（无头）时返回 False"""
+    logger = logger or logging.getLogger(__name__)
+    logger.info(store.describe(name))
+    if store.status(name) in USABLE:
+        return True
+    if not interactive:
+        logger.error(f"会话[{name}]不可用，无头模式下无法手动登录：请先用有界面模式登录一次")
+        return False
+    logger.info(f"会话[{name}]不可用，启动后直接进入手动登录")
+    return True
+
+
+class SessionKeeper:
+    """采集过程中把浏览器里已被站点续期的 Cookie 写回存储"""
+
+    def __init__(self, store: SessionStore, name: str, logged_in: Optional[Callable] = None,
+                 check_interval: float = 600, logger: Optional[logging.Logger] = None):
+        """logged_in(driver): 确认当前页面处于登录状态，为空时不检查；check_interval: 两次检查的最短间隔（秒）"""
+        self.store = store
+        self.name = name
+        self.logged_in = logged_in
+        self.check_interval = check_interval
+        self.logger = logger or logging.getLogger(__name__)
+        self.last_check = time.time()
+        self.refreshed = 0
+
+    def tick(self, driver):
+        now = time.time()
+        if now - self.last_check < self.check_interval:
+            return
+        self.last_check = now
+        try:
+            if not self.store.due(self.name):
+                return
+            if self.logged_in and not self.logged_in(driver):
+                self.logger.warning(f"会话[{self.name}]当前页面未处于登录状态，暂不续存")
+                return
+            record = self.store.save(self.name, driver.get_cookies())
+            self.refreshed += 1
+            self.logger.info(f"会话[{self.name}]已续存，登录态有效期至 {_fmt(record['expires'])}")
+        except Exception as e:
+            self.logger.warning(f"会话续存失败: {str(e)}")
@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+"""
+本地模拟小红书站点（压测用）
+- /user/profile/<用户ID>：主页，首屏服务端渲染，滚动到底时请求 /api/sns/web/v1/user_posted 追加卡片（无限滚动）
+- /explore/<笔记ID>、/user/profile/<用户ID>/<笔记ID>：详情页，图文/视频按比例生成，
+  同时输出 window.__INITIAL_STATE__，--capture 模式可直接解析
+- 页面结构和类名与爬虫使用的选择器一致；图片地址带 xhscdn.com 以匹配卡片首图选择器，由本站返回 1x1 GIF
+- 主页数、每个主页的笔记数、每页卡片数、响应延迟、视频比例、每篇图片数、页面填充大小均可配置
+- 数据按 seed 确定性生成，多次运行结果一致
+
+用法：python xhs_sim_site.py [--port 8800] [--profiles 3] [--notes 60] [--latency-ms 50]
+端到端压测见 bench_crawl.py
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import logging
+import random
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from xhs_capture import FEED_API
+
+PIXEL_GIF = (b'GIF89a\x01\x00\x01\x00\x80\x00\x00\xff\xff\xff\x00\x00\x00!\xf9\x04\x01\x00\x00\x00\x00'
+             b',\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;')
+IMAGE_HOST = 'sns-webpic-qc.xhscdn.com'
+LOCATIONS = ['广东', '上海', '浙江', '北京', '四川', '江苏']
+
+
+def pixel_gif(tag: str) -> bytes:
+    """1x1 GIF，带 tag 作为注释扩展块：每个图片地址的内容不同（图片缓存按内容寻址）"""
+    comment = tag.encode('utf-8')[-255:]
+    return PIXEL_GIF[:-1] + b'\x21\xfe' + bytes([len(comment)]) + comment + b'\x00' + PIXEL_GIF[-1:]
+
+
+class SimConfig:
+    def __init__(self, profiles: int = 3, notes: int = 60, page_size: int = 20, latency_ms: float = 50,
+                 jitter_ms: float = 0, video_ratio: float = 0.2, images: int = 4, padding_kb: int = 0,
+                 interval_hours: float = 20, seed: int = 1):
+        """
+        notes: 每个主页的笔记数；page_size: 首屏及每次滚动加载的卡片数
+        latency_ms / jitter_ms: 页面和接口响应的固定延迟与随机抖动（图片不加延迟）
+        video_ratio: 视频笔记比例；images: 图文笔记的图片数
+        padding_kb: 每个页面附加的隐藏填充内容大小，模拟真实页面体积
+        interval_hours: 相邻两篇笔记的发布间隔
+        """
+        self.profiles = profiles
+        self.notes = notes
+        self.page_size = max(1, page_size)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.video_ratio = video_ratio
+        self.images = max(1, images)
+        self.padding_kb = padding_kb
+        self.interval_hours = interval_hours
+        self.seed = seed
+
+
+def _hex_id(*parts) -> str:
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()[:24]
+
+
+def display_time(ts: datetime, now: datetime) -> str:
+    """按页面规则渲染发布时间"""
+    age = now - ts
+    if age < timedelta(hours=1):
+        return f"{max(1, age.seconds // 60)}分钟前"
+    if age < timedelta(days=1):
+        return f"{age.seconds // 3600}小时前"
+    if age < timedelta(days=2):
+        return ts.strftime('昨天 %H:%M')
+    if age < timedelta(days=7):
+        return f"{age.days}天前"
+    if ts.year == now.year:
+        return ts.strftime('%m-%d')
+    return ts.strftime('%Y-%m-%d')
+
+
+def display_like(count: int) -> str:
+    if count == 0:
+        return '赞'
+    if count >= 10000:
+        return f"{count / 10000:.1f}万"
+    return str(count)
+
+
+class SimSite:
+    """确定性生成主页与笔记数据，并渲染成页面"""
+
+    def __init__(self, config: SimConfig):
+        self.config = config
+        self.base_url = ''  # 由 start_server 设置；详情页图片须为 http 开头的绝对地址
+        self.started = datetime.now().replace(microsecond=0)
+        self.user_ids = [_hex_id(config.seed, 'user', i) for i in range(config.profiles)]
+        # 笔记ID -> (用户ID, 序号)，序号 0 为最新
+        self.note_owner: Dict[str, Tuple[str, int]] = {}
+        self.profile_notes: Dict[str, List[str]] = {}
+        for user_id in self.user_ids:
+            ids = [_hex_id(config.seed, user_id, i) for i in range(config.notes)]
+            self.profile_notes[user_id] = ids
+            for index, note_id in enumerate(ids):
+                self.note_owner[note_id] = (user_id, index)
+
+    # ---- 数据 ----
+    def note(self, note_id: str) -> Optional[Dict]:
+        owner = self.note_owner.get(note_id)
+        if owner is None:
+            return None
+        user_id, index = owner
+        rnd = random.Random(note_id)
+        is_video = rnd.random() < self.config.video_ratio
+        count = 1 if is_video else self.config.images
+        published = self.started - timedelta(hours=self.config.interval_hours * index + rnd.random())
+        return {
+            'note_id': note_id,
+            'user_id': user_id,
+            'index': index,
+            'type': 'video' if is_video else 'normal',
+            'title': f"模拟笔记 {user_id[:6]}-{index}",
+            'desc': f"第 {index} 篇模拟笔记正文，用于本地压测。\n#模拟 #压测",
+            'published': published,
+            'likes': rnd.choice([0, rnd.randint(1, 9999), rnd.randint(10000, 99999)]),
+            'images': [self.image_url(note_id, k) for k in range(count)],
+            'xsec_token': 'AB' + hashlib.md5(f"token:{note_id}".encode()).hexdigest()[:12],
+            'location': LOCATIONS[index % len(LOCATIONS)],
+        }
+
+    def image_url(self, note_id: str, k: int) -> str:
+        return f"{self.base_url}/img/{IMAGE_HOST}/{note_id}-{k}.gif"
+
+    def profile_path(self, user_id: str) -> str:
+        return f"/user/profile/{user_id}"
+
+    def feed_page(self, user_id: str, cursor: int) -> Tuple[List[Dict], int, bool]:
+        ids = self.profile_notes.get(user_id, [])
+        end = cursor + self.config.page_size
+        return [self.note(note_id) for note_id in ids[cursor:end]], end, end < len(ids)
+
+    # ---- 渲染 ----
+    def _padding(self) -> str:
+        if not self.config.padding_kb:
+            return ''
+        return f'<div class="sim-padding" style="display:none">{"x" * (self.config.padding_kb * 1024)}</div>'
+
+    def render_card(self, note: Dict) -> str:
+        href = html.escape(f"{self.profile_path(note['user_id'])}/{note['note_id']}"
+                           f"?xsec_token={note['xsec_token']}&xsec_source=pc_user")
+        play = '<span class="play-icon"></span>' if note['type'] == 'video' else ''
+        return (
+            f'<section class="note-item" data-index="{note["index"]}">'
+            f'<div><a href="/explore/{note["note_id"]}" style="display: none;"></a>'
+            f'<a class="cover mask ld" target="_self" href="{href}">'
+            f'<img src="{note["images"][0]}" data-xhs-img=""><div class="top-wrapper">{play}</div></a>'
+            f'<div class="footer"><a class="title" href="{href}"><span>{html.escape(note["title"])}</span></a>'
+            f'<div class="card-bottom-wrapper"><span class="like-wrapper like-active">'
+            f'<span class="count">{display_like(note["likes"])}</span></span></div></div></div></section>'
+        )
+
+    def render_profile(self, user_id: str) -> str:
+        notes, cursor, has_more = self.feed_page(user_id, 0)
+        cards = ''.join(self.render_card(note) for note in notes)
+        return f"""<!DOCTYPE html>
+<html lang="zh-CN"><head><meta charset="utf-8"><title>模拟主页 {user_id[:6]} - 小红书</title>
+<style>.feeds-container{{width:240px}} .note-item{{display:block;height:320px}}</style></head>
+<body><div id="app"><div class="user-page"><div class="feeds-container" id="userPostedFeeds">{cards}</div></div></div>
+{self._padding()}
+<script>
+(function () {{
+    var cursor = {cursor}, hasMore = {'true' if has_more else 'false'}, loading = false;
+    var container = document.getElementById('userPostedFeeds');
+    function loadMore() {{
+        if (loading || !hasMore) {{ return; }}
+        if (window.innerHeight + window.scrollY < document.body.scrollHeight - 400) {{ return; }}
+        loading = true;
+        fetch('{FEED_API}?num={self.config.page_size}&cursor=' + cursor + '&user_id={user_id}')
+            .then(function (r) {{ return r.json(); }})
+            .then(function (d) {{
+                container.insertAdjacentHTML('beforeend', d.data.html);
+                cursor = d.data.cursor;
+                hasMore = d.data.has_more;
+                loading = false;
+            }})
+            .catch(function () {{ loading = false; }});
+    }}
+    window.addEventListener('scroll', loadMore);
+}})();
+</script></body></html>"""
+
+    def render_feed(self, user_id: str, cursor: int) -> Dict:
+        """与 user_posted 接口同结构；html 为模拟站专用字段，卡片标记只在 render_card 一处生成"""
+        notes, next_cursor, has_more = self.feed_page(user_id, cursor)
+        return {
+            'code': 0,
+            'success': True,
+            'data': {
+                'cursor': str(next_cursor),
+                'has_more': has_more,
+                'notes': [{
+                    'note_id': note['note_id'],
+                    'type': note['type'],
+                    'display_title': note['title'],
+                    'xsec_token': note['xsec_token'],
+                    'cover': {'url_default': note['images'][0]},
+                    'interact_info': {'liked_count': str(note['likes'])},
+                } for note in notes],
+                'html': ''.join(self.render_card(note) for note in notes),
+            },
+        }
+
+    def render_detail(self, note: Dict) -> str:
+        title = html.escape(note['title'])
+        desc = html.escape(note['desc']).replace('\n', '<br>')
+        date = f"{display_time(note['published'], self.started)} {note['location']}"
+        if note['type'] == 'video':
+            media = (f'<div class="player-container"><xg-poster class="xgplayer-poster" '
+                     f'style="background-image: url(&quot;{note["images"][0]}&quot;);"></xg-poster></div>')
+        else:
+            slides = ''.join(f'<div class="swiper-slide"><img class="note-slider-img" src="{url}"></div>'
+                             for url in note['images'])
+            media = f'<div class="swiper"><div class="swiper-wrapper">{slides}</div></div>'
+        state = {'note': {'noteDetailMap': {note['note_id']: {'note': {
+            'noteId': note['note_id'],
+            'type': note['type'],
+            'title': note['title'],
+            'desc': note['desc'],
+            'time': int(note['published'].timestamp() * 1000),
+            'imageList': [{'urlDefault': url} for url in note['images']],
+            'interactInfo': {'likedCount': str(note['likes'])},
+        }}}}}
+        state_js = json.dumps(state, ensure_ascii=False).replace('</', '<\\/')
+        return f"""<!DOCTYPE html>
+<html lang="zh-CN"><head><meta charset="utf-8"><title>{title} - 小红书</title></head>
+<body><div id="app"><div id="noteContainer" class="note-container">
+<div class="media-container">{media}</div>
+<div class="interaction-container"><div class="note-scroller"><div class="note-content">
+<div id="detail-title" class="title">{title}</div>
+<div id="detail-desc" class="desc"><span class="note-text">{desc}</span></div>
+<div class="bottom-container"><span class="date">{date}</span></div>
+</div></div>
+<div class="interactions engage-bar"><div class="interact-container"><div class="left">
+<span class="like-wrapper like-active"><span class="count">{display_like(note['likes'])}</span></span>
+</div></div></div></div>
+</div></div>
+{self._padding()}
+<script>window.__INITIAL_STATE__ = {state_js};</script>
+</body></html>"""
+
+    def index_page(self) -> str:
+        links = ''.join(f'<li><a href="{self.profile_path(uid)}">{uid}</a></li>' for uid in self.user_ids)
+        return f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>模拟站点</title></head><body><ul>{links}</ul></body></html>'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    site: SimSite = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logging.debug(f"模拟站点 {self.address_string()} {format % args}")
+
+    def _delay(self):
+        config = self.site.config
+        delay = config.latency_ms + (random.uniform(0, config.jitter_ms) if config.jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parsed = urllib.parse.urlparse(self.path)
+        parts = [p for p in parsed.path.split('/') if p]
+        site = self.site
+
+        if parts[:1] == ['img']:
+            self._send(200, pixel_gif(parsed.path), 'image/gif')
+            return
+        if parsed.path == '/favicon.ico':
+            self._send(204, b'', 'image/x-icon')
+            return
+
+        self._delay()
+        if parsed.path == FEED_API:
+            query = urllib.parse.parse_qs(parsed.query)
+            user_id = query.get('user_id', [''])[0]
+            cursor = int(query.get('cursor', ['0'])[0] or 0)
+            body = json.dumps(site.render_feed(user_id, cursor), ensure_ascii=False)
+            self._send(200, body.encode('utf-8'), 'application/json; charset=utf-8')
+            return
+
+        page = None
+        if len(parts) == 2 and parts[0] == 'explore':
+            note = site.note(parts[1])
+            page = site.render_detail(note) if note else None
+        elif len(parts) == 3 and parts[:2] == ['user', 'profile']:
+            if parts[2] in site.profile_notes:
+                page = site.render_profile(parts[2])
+        elif len(parts) == 4 and parts[:2] == ['user', 'profile']:
+            note = site.note(parts[3])
+            page = site.render_detail(note) if note else None
+        elif not parts or parts == ['explore']:
+            page = site.index_page()
+
+        if page is None:
+            self._send(404, '<html><body>404</body></html>'.encode('utf-8'), 'text/html; charset=utf-8')
+        else:
+            self._send(200, page.encode('utf-8'), 'text/html; charset=utf-8')
+
+
+def start_server(config: SimConfig, host: str = '127.0.0.1', port: int = 0):
+    """在后台线程启动站点，返回 (server, site, base_url)；port 为 0 时自动分配"""
+    site = SimSite(config)
+    handler = type('SimHandler', (_Handler,), {'site': site})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    site.base_url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, site, site.base_url
+
+
+def add_site_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--profiles', type=int, default=3, help="主页数")
+    parser.add_argument('--notes', type=int, default=60, help="每个主页的笔记数")
+    parser.add_argument('--page-size', type=int, default=20, help="首屏及每次滚动加载的卡片数")
+    parser.add_argument('--latency-ms', type=float, default=50, help="页面/接口响应延迟（毫秒）")
+    parser.add_argument('--jitter-ms', type=float, default=0, help="响应延迟的随机抖动上限（毫秒）")
+    parser.add_argument('--video-ratio', type=float, default=0.2, help="视频笔记比例")
+    parser.add_argument('--images', type=int, default=4, help="图文笔记的图片数")
+    parser.add_argument('--padding-kb', type=int, default=0, help="每个页面附加的填充大小（KB）")
+    parser.add_argument('--interval-hours', type=float, default=20, help="相邻笔记的发布间隔（小时）")
+    parser.add_argument('--seed', type=int, default=1, help="数据生成种子")
+
+
+def config_from_args(args) -> SimConfig:
+    return SimConfig(profiles=args.profiles, notes=args.notes, page_size=args.page_size,
+                     latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, video_ratio=args.video_ratio,
+                     images=args.images, padding_kb=args.padding_kb, interval_hours=args.interval_hours,
+                     seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟小红书站点")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    add_site_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        stream=sys.stdout)
+
+    server, site, base_url = start_server(config_from_args(args), args.host, args.port)
+    print(f"模拟站点已启动: {base_url}")
+    for user_id in site.user_ids:
+        print(f"  {base_url}{site.profile_path(user_id)}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+小红书文本归一化
+- 笔记 URL 转换（/user/profile/<用户ID>/<笔记ID> -> /explore/<笔记ID>）、笔记ID提取
+- 笔记ID的 12 字节紧凑键（note_key），采集过程中的集合都以它为键，不保存带 xsec_token 的完整 URL
+- 发布时间解析（分钟前/小时前/天前/昨天/今天/MM-DD/YYYY-MM-DD HH:MM，可带“编辑于”前缀和地区后缀）
+- 点赞数解析（1.2万 / 3.4k / 纯数字）
+- 正则全部预编译；批量接口对一批字符串使用同一个参考时间
+
+基准：python bench_text.py
+"""
+
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+# ===================== URL =====================
+
+# 笔记ID为 24 位十六进制；主页链接形如 /user/profile/<用户ID>/<笔记ID>，取路径中最后一个
+NOTE_ID_RE = re.compile(r'/([0-9a-f]{24})(?=/|$)')
+EXPLORE_URL = 'https://www.xiaohongshu.com/explore/'
+# scheme://host 之后紧跟 /user/profile/<用户ID>/<笔记ID>
+_PROFILE_NOTE_RE = re.compile(r'([^:/?#]+://[^/?#]*)/user/profile/[^/?#]*/([^/?#]*)')
+
+
+def note_id_of(url: str) -> str:
+    """从笔记 URL（/explore/ 或 /user/profile/ 形式）中取出笔记ID，取不到返回空串"""
+    path = (url or '').split('?', 1)[0].split('#', 1)[0]
+    ids = NOTE_ID_RE.findall(path)
+    return ids[-1] if ids else ''
+
+
+def convert_xhs_url(original_url: str) -> str:
+    """主页内的笔记链接转换为 /explore/<笔记ID>，查询参数中的 &amp; 还原为 &"""
+    rest, _, fragment = original_url.partition('#')
+    path, _, query = rest.partition('?')
+    match = _PROFILE_NOTE_RE.match(path)
+    if match:
+        path = f"{match.group(1)}/explore/{match.group(2)}"
+    url = path
+    if query:
+        url += '?' + query.replace('&amp;', '&')
+    if fragment:
+        url += '#' + fragment
+    return url
+
+
+def note_key(url: str) -> bytes:
+    """笔记ID的 12 字节紧凑形式，用作去重集合的键；取不到笔记ID返回 b''"""
+    note_id = note_id_of(url)
+    return bytes.fromhex(note_id) if note_id else b''
+
+
+def explore_url(key: bytes) -> str:
+    """由 note_key 还原去掉查询参数的 /explore/ 笔记地址（入库和去重使用的形式）"""
+    return EXPLORE_URL + key.hex()
+
+
+def note_base_url(original_url: str) -> str:
+    """去掉查询参数的 /explore/ 笔记地址，等价于 convert_xhs_url(url).split('?')[0]"""
+    path = original_url.partition('#')[0].partition('?')[0]
+    match = _PROFILE_NOTE_RE.match(path)
+    if match:
+        return f"{match.group(1)}/explore/{match.group(2)}"
+    return path
+
+
+def note_base_urls(urls: Iterable[str]) -> List[str]:
+    return [note_base_url(url) for url in urls]
+
+
+# ===================== 发布时间 =====================
+
+_LOCATION_RE = re.compile(r'\s+(?=[\u4e00-\u9fa5]{2,5}$)')  # 结尾的地区，如“ 广东”
+_NUMBER_RE = re.compile(r'\d+')
+_MD_HM_RE = re.compile(r'(\d{1,2})-(\d{1,2}) (\d{1,2}):(\d{2})')
+_YMD_HM_RE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2}) (\d{1,2}):(\d{2})')
+_MD_RE = re.compile(r'(\d{1,2})-(\d{1,2})')
+
+
+def _parse_time(time_str: str, now: datetime) -> int:
+    clean_str = time_str.replace('编辑于 ', '').strip()
+    time_part = _LOCATION_RE.split(clean_str, 1)[0]
+
+    try:
+        if '天前' in time_part:
+            days = int(_NUMBER_RE.search(time_part).group())
+            return int((now - timedelta(days=days)).timestamp())
+        if '昨天' in time_part:
+            time_part = time_part.replace('昨天', (now - timedelta(days=1)).strftime('%Y-%m-%d'))
+        elif '今天' in time_part:
+            time_part = time_part.replace('今天', now.strftime('%Y-%m-%d'))
+        elif '分钟前' in time_part:
+            minutes = int(_NUMBER_RE.search(time_part).group())
+            return int((now - timedelta(minutes=minutes)).timestamp())
+        elif '小时前' in time_part:
+            hours = int(_NUMBER_RE.search(time_part).group())
+            return int((now - timedelta(hours=hours)).timestamp())
+
+        match = _MD_HM_RE.fullmatch(time_part)
+        if match:
+            month, day, hour, minute = map(int, match.groups())
+            return _without_year(now, month, day, hour, minute)
+        match = _YMD_HM_RE.fullmatch(time_part)
+        if match:
+            return int(datetime(*map(int, match.groups())).timestamp())
+        match = _MD_RE.fullmatch(time_part)
+        if match:
+            month, day = map(int, match.groups())
+            return _without_year(now, month, day, 0, 0)
+        # 以日期开头但带多余内容，按格式错误处理
+        if _MD_RE.match(time_part) or _YMD_HM_RE.match(time_part):
+            raise ValueError(f"无法识别的时间格式: {time_part}")
+        return 0
+    except Exception as e:
+        logging.warning(f"时间解析失败: {clean_str} ({str(e)})")
+        return 0
+
+
+def _without_year(now: datetime, month: int, day: int, hour: int, minute: int) -> int:
+    """没有年份的日期补当前年份；比参考时间晚 60 天以上的视为去年（跨年）"""
+    dt = datetime(now.year, month, day, hour, minute)
+    if dt > now + timedelta(days=60):
+        dt = dt.replace(year=now.year - 1)
+    return int(dt.timestamp())
+
+
+def parse_xhs_time(time_str: str, now: Optional[datetime] = None) -> int:
+    """解析小红书时间文本为时间戳，无法解析返回 0"""
+    return _parse_time(time_str, now or datetime.now())
+
+
+def parse_xhs_times(time_strs: Iterable[str], now: Optional[datetime] = None) -> List[int]:
+    """批量解析，所有相对时间共用同一个参考时间"""
+    now = now or datetime.now()
+    return [_parse_time(s, now) for s in time_strs]
+
+
+# ===================== 点赞数 =====================
+
+def parse_like_count(like_text: str) -> int:
+    """解析点赞数：支持 "1.2万" / "3.4k" / 纯数字，其余（如“赞”“10+”）返回 0"""
+    like_text = (like_text or '').strip()
+    try:
+        if '万' in like_text:
+            return int(float(like_text.replace('万', '')) * 10000)
+        if 'k' in like_text.lower():
+            return int(float(like_text.lower().replace('k', '')) * 1000)
+    except ValueError:
+        return 0
+    return int(like_text) if like_text.isdigit() else 0
+
+
+def parse_like_counts(like_texts: Iterable[str]) -> List[int]:
+    return [parse_like_count(text) for text in like_texts]
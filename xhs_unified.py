@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+品牌 + 艺术家合并采集
+- 一次读取 brand 表中 is_brand=1 或 is_bjd_artist=1 的全部主页，每个主页只加载、滚动、去重一次
+- 按行的标记和 rednote_spd_setting / rednote_spd_setting_for_artist 把笔记分别写入
+  spider_log、artist_spider_log 或两者
+- 任一路为全量采集时按全量打开详情页，快速采集的一路只取首图和标题
+- 结束时输出相对分别运行 xhs.py / artis_rednote_spd.py 节省的主页和详情页加载次数
+
+用法：python xhs_unified.py [--tabs 2] [--capture] [--resume]
+"""
+
+import argparse
+import logging
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from artis_rednote_spd import GOVERNOR_TIMEOUTS as ARTIST_GOVERNOR_TIMEOUTS
+from xhs import XHSCrawler, SESSION_ACCOUNT
+from xhs_checkpoint import Checkpoint
+from xhs_images import ImageStage
+from xhs_session import SessionStore, preflight
+from xhs_db import ConnectionPool, DBService, DB_CONFIG
+from xhs_dedup import NoteIndex, query_existing_urls
+from xhs_writer import BufferedWriter, TableSchema, SPIDER_LOG, ARTIST_SPIDER_LOG
+
+FULL, QUICK, SKIP = 1, 2, 3
+
+
+class Route:
+    """一条流水线（品牌/艺术家）的落库目标"""
+
+    def __init__(self, name: str, flag: str, setting_key: str, service: DBService, schema: TableSchema):
+        self.name = name
+        self.flag = flag
+        self.setting_key = setting_key
+        self.service = service
+        self.connection = service.connection  # 数据库线程的连接，只在 service 中使用
+        self.table = schema.table
+        self.index = NoteIndex(schema.table)
+        self.writer = BufferedWriter(self.connection, schema)
+        service.on_idle(self.writer.flush_due)
+        self.inserted = 0
+
+    def setting(self, row: Dict) -> int:
+        """该行在本路的采集模式，未打标记视为不采集"""
+        if not row.get(self.flag):
+            return SKIP
+        return row.get(self.setting_key) or SKIP
+
+    def existing_urls(self, urls) -> set:
+        existing, unknown = self.index.split_known(urls)
+        if unknown:
+            existing.update(self.service.call(query_existing_urls, self.connection, self.table, unknown, retry=True))
+        return existing
+
+    def count_collected(self, brand_id: int) -> int:
+        return self.service.call(self._count_collected, brand_id, retry=True)
+
+    def _count_collected(self, brand_id: int) -> int:
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) AS count FROM {self.table} WHERE brand_id = %s", (brand_id,))
+            result = cursor.fetchone()
+            return result['count'] if result else 0
+
+    def exists(self, url: str) -> bool:
+        known = self.index.lookup(url)
+        if known is None:
+            known = bool(self.service.call(query_existing_urls, self.connection, self.table, [url], retry=True))
+        return known
+
+    def add(self, row: Dict):
+        """入队即返回，数据库线程中进入缓冲区"""
+        self.index.add(row['url'])
+        self.service.post(self.writer.add, row)
+        self.inserted += 1
+
+    def shape(self, data: Dict, setting: int, effective: int) -> Dict:
+        row = dict(data)
+        if setting == QUICK and effective == FULL:
+            # 全量详情写入快速采集的一路时，与快速模式保持一致：只留首图和标题
+            row.update({'images': row.get('images', [])[:1], 'content': '', 'auth_time': 0})
+        if self.name == 'artist':
+            row.update({'artist_id': data['brand_id'], 'artist_name': data['brand_name'], 'full_get': 0})
+        return row
+
+
+class UnifiedDatabase:
+    def __init__(self):
+        # 连接池 + 数据库线程：两路的写入和回查都在同一个数据库线程执行，断线自动重连
+        self.pool = ConnectionPool(**DB_CONFIG)
+        self.connection = self.pool.acquire()  # 主线程：启动时读取主页、加载索引
+        self.service = DBService(self.pool)
+        self.routes = [
+            Route('brand', 'is_brand', 'rednote_spd_setting', self.service, SPIDER_LOG),
+            Route('artist', 'is_bjd_artist', 'rednote_spd_setting_for_artist', self.service, ARTIST_SPIDER_LOG),
+        ]
+        for route in self.routes:
+            route.index.load(self.connection)
+
+    def fetch_profiles(self) -> list:
+        with self.connection.cursor() as cursor:
+            sql = """
+                SELECT id, brand_name, rednote_url, is_brand, is_bjd_artist,
+                       rednote_spd_setting, rednote_spd_setting_for_artist, spider_index, last_gather_time
+                FROM brand
+                WHERE rednote_url != '' AND is_delete = 0 AND (is_brand = 1 OR is_bjd_artist = 1)
+                ORDER BY spider_index DESC, last_gather_time ASC
+            """
+            cursor.execute(sql)
+            return cursor.fetchall()
+
+    def update_last_gather_time(self, brand_id: int):
+        """入队即返回：数据库线程先提交两路缓冲，全部提交后才更新采集时间"""
+        self.service.post(self._update_last_gather_time, brand_id, retry=True)
+
+    def _update_last_gather_time(self, brand_id: int):
+        if not self._flush():
+            raise RuntimeError("缓冲中的记录未能提交，不更新采集时间")
+        with self.service.connection.cursor() as cursor:
+            sql = "UPDATE brand SET last_gather_time = NOW() WHERE id = %s"
+            cursor.execute(sql, (brand_id,))
+            self.service.connection.commit()
+
+    def flush(self) -> bool:
+        """等待队列中的写入完成并提交两路缓冲，全部提交时返回 True"""
+        return self.service.call(self._flush)
+
+    def _flush(self) -> bool:
+        return all([route.writer.commit() for route in self.routes])
+
+    def close(self):
+        self.service.close()
+        logging.info(self.service.summary())
+        self.pool.release(self.connection)
+        self.pool.close()
+
+    def summary(self) -> str:
+        return '\n'.join(route.index.summary() for route in self.routes)
+
+
+class UnifiedEngine:
+    """按当前主页的启用路由提供去重/写入回调，爬虫本身沿用 XHSCrawler"""
+
+    def __init__(self, db: UnifiedDatabase):
+        self.db = db
+        self.active: List[Tuple[Route, int]] = []
+        self.effective = FULL  # 本主页实际使用的采集模式
+        self.crawler: Optional[XHSCrawler] = None
+        self.governors: Tuple = ()  # (品牌, 艺术家) 等待上限的限速器，共用令牌桶
+        self.profiles = 0
+        self.loads_saved = 0    # 两路共用的主页加载
+        self.details_saved = 0  # 两路都需要全量详情、只打开一次的详情页
+
+    # ---- 提供给 XHSCrawler 的回调 ----
+    def is_url_exists(self, url: str) -> bool:
+        return bool(self.existing_urls([url]))
+
+    def existing_urls(self, urls) -> set:
+        """只有在所有启用的路中都已存在的笔记才算已采集"""
+        existing = None
+        for route, _ in self.active:
+            found = route.existing_urls(urls)
+            existing = found if existing is None else existing & found
+        return existing or set()
+
+    def count_collected(self, brand_id: int) -> int:
+        return min((route.count_collected(brand_id) for route, _ in self.active), default=0)
+
+    def insert(self, data: Dict):
+        written = []
+        for route, setting in self.active:
+            if route.exists(data['url']):
+                continue
+            route.add(route.shape(data, setting, self.effective))
+            written.append(setting)
+        if written.count(FULL) == 2:
+            self.details_saved += 1
+
+    # ---- 采集 ----
+    def crawl(self, row: Dict) -> bool:
+        self.active = [(route, route.setting(row)) for route in self.db.routes
+                       if route.setting(row) in (FULL, QUICK)]
+        if not self.active:
+            logging.info(f"[{row['brand_name']}]品牌/艺术家均配置不采集，跳过")
+            return True
+
+        self.profiles += 1
+        if len(self.active) > 1:
+            self.loads_saved += 1
+        names = '+'.join(f"{route.name}:{setting}" for route, setting in self.active)
+        logging.info(f"[{row['brand_name']}]采集路由: {names}")
+
+        settings = [setting for _, setting in self.active]
+        self.effective = FULL if FULL in settings else QUICK
+        # 只有艺术家一路时沿用艺术家采集的单次滚动和等待上限
+        artist_only = all(route.name == 'artist' for route, _ in self.active)
+        max_scroll = 1 if artist_only else None
+        if self.governors:
+            self.crawler.governor = self.governors[artist_only]
+        return self.crawler.crawl_author(dict(row, rednote_spd_setting=self.effective), max_scroll=max_scroll)
+
+    def summary(self) -> str:
+        inserted = '，'.join(f"{route.table} {route.inserted} 条" for route in self.db.routes)
+        return (f"合并采集：加载主页 {self.profiles} 个，写入 {inserted}；"
+                f"节省主页加载 {self.loads_saved} 次，节省详情页加载 {self.details_saved} 次")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="小红书品牌+艺术家合并采集")
+    parser.add_argument('--tabs', type=int, default=1, help="同时加载的详情标签页数")
+    parser.add_argument('--wait-floor', type=float, default=0.5, help="就绪等待的最短秒数")
+    parser.add_argument('--known-stop', type=int, default=10,
+                        help="滚动中连续遇到多少条已采集笔记即停止滚动，0 为不提前停止")
+    parser.add_argument('--capture', action='store_true', help="从网络接口响应中解析笔记数据（取不到时仍走页面提取）")
+    parser.add_argument('--metrics-out', default='xhs_unified_metrics.json',
+                        help="阶段耗时导出文件，.prom 为 Prometheus 文本格式，其余为 JSON；为空不导出")
+    parser.add_argument('--checkpoint', default='xhs_unified_checkpoint.json', help="采集断点文件，为空不记录断点")
+    parser.add_argument('--resume', action='store_true', help="从上次中断的位置继续（跳过已完成的主页和已处理的笔记）")
+    parser.add_argument('--lean', action='store_true', help="精简模式：无头运行，拦截图片/视频/字体（需已保存 Cookie）")
+    parser.add_argument('--traffic', default='',
+                        help="按主页记录网络流量和加载耗时到指定文件（如 xhs_unified_traffic.json），用于精简模式与常规模式对比；默认不统计")
+    parser.add_argument('--user-data-dir', default='',
+                        help="持久化浏览器用户目录（如 xhs_unified_profile），保留登录状态和缓存，重启后跳过 Cookie 登录")
+    parser.add_argument('--attach', default='',
+                        help="附着到已运行的调试端口 Chrome（如 127.0.0.1:9222）")
+    parser.add_argument('--image-cache', default='',
+                        help="写入后把笔记图片下载到该目录（按内容寻址，如 xhs_images），为空不下载")
+    parser.add_argument('--image-concurrency', type=int, default=8, help="图片同时下载数")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('xhs_unified.log', encoding='utf-8'),
+            logging.StreamHandler(stream=open(sys.stdout.fileno(), 'w', encoding='utf-8', errors='replace'))
+        ]
+    )
+
+    # 启动浏览器前离线检查登录会话：无头且需要手动登录时直接退出
+    if not preflight(SessionStore(), SESSION_ACCOUNT, not args.lean or bool(args.user_data_dir or args.attach)):
+        return
+
+    print("初始化DB")
+    db = UnifiedDatabase()
+    engine = UnifiedEngine(db)
+    # 可选：写入后在后台下载笔记图片到本地缓存（xhs_images）
+    images = ImageStage(args.image_cache, args.image_concurrency) if args.image_cache else None
+    crawler = XHSCrawler(url_checker=engine.is_url_exists,
+                         insert_callback=images.wrap(engine.insert) if images else engine.insert,
+                         batch_url_checker=engine.existing_urls, flush_callback=db.flush, detail_tabs=args.tabs,
+                         wait_floor=args.wait_floor, capture=args.capture, known_stop=args.known_stop,
+                         checkpoint=args.checkpoint, lean=args.lean, traffic=args.traffic,
+                         user_data_dir=args.user_data_dir, attach=args.attach.split(',')[0].strip())
+    engine.crawler = crawler
+    engine.governors = (crawler.governor, crawler.governor.with_timeouts(**ARTIST_GOVERNOR_TIMEOUTS))
+    crawler.metrics.run = 'unified'
+
+    try:
+        print("准备登录")
+        crawler.login()
+
+        profiles = db.fetch_profiles()
+        logging.info(f"找到 {len(profiles)} 个主页（品牌/艺术家）")
+        checkpoint = Checkpoint(args.checkpoint)
+        resumed = checkpoint.resume(profiles) if args.resume else None
+        if resumed is not None:
+            profiles = resumed
+        else:
+            checkpoint.start(profiles)
+        for row in profiles:
+            try:
+                logging.info(f"处理主页: {row['brand_name']}")
+                # 两路缓冲提交后才更新采集时间、记入运行断点
+                if engine.crawl(row) and db.flush():
+                    db.update_last_gather_time(row['id'])
+                    logging.info(f"已更新采集时间: {row['brand_name']}")
+                    checkpoint.brand_done(row['id'])
+                crawler.all_links.clear()
+            except Exception as e:
+                logging.error(f"主页处理异常 {row['brand_name']}: {str(e)}")
+                continue
+        checkpoint.finish()
+    finally:
+        if images:
+            images.close()
+        db.flush()
+        logging.info(crawler.waiter.summary())
+        logging.info(crawler.governor.summary())
+        if crawler.capture:
+            logging.info(crawler.capture.summary())
+        if crawler.traffic:
+            logging.info(crawler.traffic.summary())
+        logging.info(crawler.metrics.summary())
+        crawler.metrics.export(args.metrics_out)
+        crawler.driver.quit()
+        logging.info(db.summary())
+        logging.info(engine.summary())
+        db.close()
+        logging.info("合并采集任务结束")
+
+
+if __name__ == "__main__":
+    main()
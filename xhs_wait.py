@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+基于页面就绪状态的等待
+- 代替固定 sleep：条件满足立即返回，否则最多等到 timeout（即原来的固定等待时长）
+- floor 为最短等待，保留基本的访问节奏
+- 每次等待的实际耗时按阶段记录，结束时汇总相对固定等待节省的时间
+"""
+
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+FEED_PROBE_JS = "return [document.querySelectorAll('.note-item').length, document.body.scrollHeight];"
+
+DETAIL_READY_JS = r"""
+if (!document.querySelector('.note-container')) { return false; }
+var date = document.querySelector('.bottom-container .date');
+var media = document.querySelector('.swiper-wrapper img[src^="http"]')
+    || document.querySelector('xg-poster.xgplayer-poster[style*="url("]');
+return !!(date && date.innerText.trim() && media);
+"""
+
+
+class FeedLoaded:
+    """列表页就绪：.note-item 数量比滚动前增加，且 scrollHeight 持续 stable_ms 毫秒不变
+
+    需要在触发滚动之前创建，以记录滚动前的卡片数
+    """
+
+    def __init__(self, driver, stable_ms: int = 800):
+        self.driver = driver
+        self.stable_ms = stable_ms
+        self.base_count, self.last_height = driver.execute_script(FEED_PROBE_JS)
+        self.stable_since = time.monotonic()
+
+    def __call__(self) -> bool:
+        count, height = self.driver.execute_script(FEED_PROBE_JS)
+        now = time.monotonic()
+        if height != self.last_height:
+            self.last_height = height
+            self.stable_since = now
+        return count > self.base_count and (now - self.stable_since) * 1000 >= self.stable_ms
+
+
+class DetailReady:
+    """详情页就绪：时间和图片/视频封面都已渲染"""
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __call__(self) -> bool:
+        return bool(self.driver.execute_script(DETAIL_READY_JS))
+
+
+class ReadyWaiter:
+    def __init__(self, floor: float = 0.5, poll: float = 0.25, metrics=None):
+        """metrics: 可选的 xhs_metrics.Metrics，每次等待记入 <phase>_wait 阶段"""
+        self.floor = floor
+        self.poll = poll
+        self.metrics = metrics
+        self.stats: Dict[str, List[Tuple[float, float, bool]]] = {}  # 阶段 -> [(实际等待, 上限, 是否就绪)]
+
+    def wait(self, phase: str, predicate: Callable[[], bool], timeout: float,
+             floor: Optional[float] = None,
+             on_tick: Optional[Callable[[float, float], None]] = None) -> bool:
+        """等待 predicate 成立，返回是否在超时前就绪
+
+        on_tick(elapsed, timeout) 每次轮询时回调，可用于进度显示或在其中抛出停止信号
+        """
+        floor = self.floor if floor is None else floor
+        deadline = max(timeout, floor)
+        start = time.monotonic()
+        ready = False
+        while True:
+            elapsed = time.monotonic() - start
+            if on_tick:
+                on_tick(elapsed, deadline)
+            if elapsed >= floor:
+                try:
+                    ready = bool(predicate())
+                except Exception:
+                    ready = False
+                if ready or elapsed >= deadline:
+                    break
+            next_check = floor if elapsed < floor else deadline
+            time.sleep(max(0.0, min(self.poll, next_check - elapsed)))
+        waited = time.monotonic() - start
+        if on_tick:
+            on_tick(deadline, deadline)
+        self.stats.setdefault(phase, []).append((waited, max(0.0, timeout), ready))
+        if self.metrics:
+            self.metrics.observe(f"{phase}_wait", waited)
+        return ready
+
+    def summary(self) -> str:
+        if not self.stats:
+            return "就绪等待统计：无"
+        lines = ["就绪等待统计："]
+        for phase, records in self.stats.items():
+            waited = sorted(r[0] for r in records)
+            total_waited = sum(waited)
+            budget = sum(r[1] for r in records)
+            timeouts = sum(1 for r in records if not r[2])
+            p50 = waited[len(waited) // 2]
+            p90 = waited[min(len(waited) - 1, int(len(waited) * 0.9))]
+            lines.append(
+                f"  {phase}: {len(records)} 次，平均 {total_waited / len(records):.2f}s "
+                f"(p50 {p50:.2f}s / p90 {p90:.2f}s)，超时 {timeouts} 次，"
+                f"实际 {total_waited:.0f}s / 固定等待 {budget:.0f}s，节省 {budget - total_waited:.0f}s"
+            )
+        return '\n'.join(lines)
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+采集结果缓冲写入
+- 行数达到 max_rows 或最早一行等待超过 max_age 秒时，用 executemany 一次提交
+- 品牌切换（update_last_gather_time）和程序退出/停止时由调用方主动 flush
+- 连接断开时原地重连后整批重试；重连失败则保留在缓冲区等下次提交，不逐行丢弃
+- 断开可能发生在服务端已提交、客户端还没收到确认时：重连后先按 url 查出已入库的行，只重试其余的行，
+  不依赖表上的唯一键（线上 spider_log 的 url 没有唯一索引）
+- 同时支持 spider_log（品牌）和 artist_spider_log（艺术家）两套字段
+"""
+
+import logging
+import time
+from typing import Callable, Dict, List, Optional
+
+from xhs_db import is_disconnect, reconnect
+from xhs_dedup import query_existing_urls
+
+
+def spider_log_row(data: Dict, now: int) -> tuple:
+    return (
+        0, 0, 'xhs',
+        data.get('title', ''),
+        data.get('content', ''),
+        data.get('url', ''),
+        ','.join(data.get('images', [])),
+        data.get('brand_id', 0),
+        data.get('brand_name', ''),
+        data.get('auth_time', 0),
+        now,
+        now,
+        data.get('like_count', 0),
+    )
+
+
+def artist_spider_log_row(data: Dict, now: int) -> tuple:
+    return (
+        0, 0, 'xhs',
+        data.get('title', ''),
+        data.get('content', ''),
+        data.get('url', ''),
+        ','.join(data.get('images', [])),
+        data.get('artist_id', 0),
+        data.get('artist_name', ''),
+        now,
+        now,
+        data.get('full_get', 0),
+        data.get('auth_time', 0),
+        data.get('like_count', 0),
+    )
+
+
+class TableSchema:
+    def __init__(self, table: str, columns: List[str], row_builder: Callable[[Dict, int], tuple]):
+        self.table = table
+        self.columns = columns
+        self.row_builder = row_builder
+        self.sql = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                    f"VALUES ({', '.join(['%s'] * len(columns))})")
+        self.url_index = columns.index('url')
+
+
+SPIDER_LOG = TableSchema('spider_log', [
+    'msg_type', 'status', 'origin_type', 'title',
+    'content', 'url', 'images', 'brand_id',
+    'brand_name', 'auth_time', 'created_at', 'updated_at', 'likes',
+], spider_log_row)
+
+ARTIST_SPIDER_LOG = TableSchema('artist_spider_log', [
+    'msg_type', 'status', 'origin_type', 'title',
+    'content', 'url', 'images', 'brand_id',
+    'brand_name', 'created_at', 'updated_at',
+    'full_get', 'auth_time', 'likes',
+], artist_spider_log_row)
+
+
+class BufferedWriter:
+    """write-behind 缓冲写入器"""
+
+    def __init__(self, connection, schema: TableSchema, max_rows: int = 20, max_age: float = 60.0,
+                 logger: Optional[logging.Logger] = None):
+        self.connection = connection
+        self.schema = schema
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self.logger = logger or logging.getLogger(__name__)
+        self.rows = []
+        self.first_ts = None
+        self.written = 0
+
+    def add(self, data: Dict):
+        """加入一行（created_at/updated_at 取入队时间），达到阈值时自动 flush"""
+        if not self.rows:
+            self.first_ts = time.time()
+        self.rows.append(self.schema.row_builder(data, int(time.time())))
+        if len(self.rows) >= self.max_rows or time.time() - self.first_ts >= self.max_age:
+            self.flush()
+
+    def flush_due(self) -> int:
+        """最早一行已等待超过 max_age 秒时提交（供空闲时定时调用）"""
+        if self.rows and time.time() - self.first_ts >= self.max_age:
+            return self.flush()
+        return 0
+
+    def commit(self) -> bool:
+        """提交缓冲区，返回是否已全部提交（重连失败时行留在缓冲区，返回 False）"""
+        self.flush()
+        return not self.rows
+
+    def _write_batch(self, rows: list):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(self.schema.sql, rows)
+        self.connection.commit()
+
+    def flush(self) -> int:
+        """提交缓冲区全部行，返回成功写入的行数"""
+        if not self.rows:
+            return 0
+        rows, self.rows, self.first_ts = self.rows, [], None
+        try:
+            self._write_batch(rows)
+            written = len(rows)
+        except Exception as e:
+            if is_disconnect(e) and not reconnect(self.connection, self.logger):
+                # 重连失败：放回缓冲区，下次提交时重试
+                self.rows, self.first_ts = rows + self.rows, time.time()
+                self.logger.error(f"写入 {self.schema.table} 失败，{len(rows)} 条保留在缓冲区: {str(e)}")
+                return 0
+            written = self._retry(rows, e)
+        self.written += written
+        self.logger.info(f"写入 {self.schema.table}: {written}/{len(rows)} 条")
+        return written
+
+    def _committed(self, rows: list) -> set:
+        """重连后调用：返回 rows 中已经入库的 url（断开前服务端已提交、客户端未收到确认）"""
+        return set(query_existing_urls(self.connection, self.schema.table,
+                                       [row[self.schema.url_index] for row in rows]))
+
+    def _rollback(self):
+        """回滚未提交的事务；连接已断开时回滚本身会失败，改为原地重连（服务端已丢弃未提交的事务）"""
+        try:
+            self.connection.rollback()
+        except Exception as e:
+            if is_disconnect(e):
+                reconnect(self.connection, self.logger)
+            else:
+                self.logger.error(f"回滚失败: {str(e)}")
+
+    def _retry(self, rows: list, error: Exception) -> int:
+        written = 0
+        if is_disconnect(error):
+            # 已重连：先去掉断开前已提交的行，其余整批重试
+            try:
+                done_urls = self._committed(rows)
+                if done_urls:
+                    url_index = self.schema.url_index
+                    pending = [row for row in rows if row[url_index] not in done_urls]
+                    written = len(rows) - len(pending)
+                    self.logger.warning(f"写入 {self.schema.table}: 断开前已提交 {written} 条，不再重复写入")
+                    rows = pending
+                if rows:
+                    self._write_batch(rows)
+                return written + len(rows)
+            except Exception as e:
+                error = e
+        # 整批失败时回滚并逐行重试，只丢弃出错的行
+        self.logger.error(f"批量写入 {self.schema.table} 失败，改为逐行写入: {str(error)}")
+        self._rollback()
+        for i, row in enumerate(rows):
+            try:
+                with self.connection.cursor() as cursor:
+                    cursor.execute(self.schema.sql, row)
+                self.connection.commit()
+                written += 1
+            except Exception as row_e:
+                if is_disconnect(row_e):
+                    if not reconnect(self.connection, self.logger):
+                        # 重连失败：剩余的行放回缓冲区，下次提交时重试
+                        self.rows, self.first_ts = rows[i:] + self.rows, time.time()
+                        self.logger.error(f"写入 {self.schema.table} 失败，{len(rows) - i} 条保留在缓冲区: "
+                                          f"{str(row_e)}")
+                        break
+                    # 已重连：这一行已提交则计入，否则放回缓冲区下次提交
+                    try:
+                        if self._committed([row]):
+                            written += 1
+                            continue
+                    except Exception:
+                        pass
+                    self.rows.append(row)
+                    self.first_ts = self.first_ts or time.time()
+                    continue
+                self._rollback()
+                self.logger.error(f"写入 {self.schema.table} 失败，丢弃: "
+                                  f"url={row[self.schema.url_index]} ({str(row_e)})")
+        return written